@@ -0,0 +1,242 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Caches used by the dispersion calculator to avoid re-evaluating material dispersion
+and re-propagating pulses.
+"""
+
+import numpy as np
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+
+class WavenumberCache(object):
+    """
+    Least recently used cache of evaluated wavenumber vectors k(w). The entries are keyed on
+    (material name, N, t_span, l_0), which together determine the frequency grid, so an entry
+    is valid as long as the material itself is unchanged.
+
+    The cache is bounded by the total number of bytes of the stored arrays. When a new entry
+    does not fit, the least recently used entries are evicted. The stored arrays are made
+    read-only since they are shared between callers.
+
+    Statistics are kept in the hits, misses and evictions counters.
+    """
+    def __init__(self, max_bytes=128e6):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        Retrieve a cached array and mark it as most recently used.
+
+        :param key: Tuple (name, N, t_span, l_0)
+        :return: Cached array or None if not found
+        """
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Store an array in the cache, evicting least recently used entries if needed.
+        Arrays larger than the cache size are not stored.
+
+        :param key: Tuple (name, N, t_span, l_0)
+        :param value: Numpy array to store
+        :return: The stored (read-only) array
+        """
+        value.setflags(write=False)
+        if value.nbytes > self.max_bytes:
+            logger.debug("Array of {0} bytes does not fit in cache".format(value.nbytes))
+            return value
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key).nbytes
+        while self._entries and self.nbytes + value.nbytes > self.max_bytes:
+            old_key, old_value = self._entries.popitem(last=False)
+            self.nbytes -= old_value.nbytes
+            self.evictions += 1
+            logger.debug("Evicted {0}".format(old_key))
+        self._entries[key] = value
+        self.nbytes += value.nbytes
+        return value
+
+    def invalidate(self, name=None, grid=None):
+        """
+        Remove entries for a material and/or a frequency grid. With no arguments
+        the whole cache is cleared.
+
+        :param name: Material name to remove entries for
+        :param grid: Tuple (N, t_span, l_0) to remove entries for
+        :return: Number of removed entries
+        """
+        removed = 0
+        for key in list(self._entries.keys()):
+            if name is not None and key[0] != name:
+                continue
+            if grid is not None and tuple(key[1:len(grid) + 1]) != tuple(grid):
+                continue
+            self.nbytes -= self._entries.pop(key).nbytes
+            removed += 1
+        logger.debug("Invalidated {0} entries for name {1}, grid {2}".format(removed, name, grid))
+        return removed
+
+    def clear(self):
+        """
+        Remove all entries. The statistics counters are kept.
+
+        :return:
+        """
+        self._entries.clear()
+        self.nbytes = 0
+
+    def get_stats(self):
+        """
+        Cache statistics.
+
+        :return: Dict with hits, misses, evictions, entries and nbytes
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "nbytes": self.nbytes}
+
+
+def content_key(*parts):
+    """
+    Create a content address (sha1 hex digest) from json serializable parts, e.g. pulse parameters
+    and a list of materials with thicknesses and coefficient fingerprints.
+
+    :param parts: json serializable objects
+    :return: Hex digest string
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class DiskCache(object):
+    """
+    Persistent cache of numpy arrays in a directory, for results that should survive between
+    sessions. Each entry is stored as an npz file named by its content key (see content_key),
+    compressed unless compress is False. The total size of the directory is bounded by
+    max_bytes, evicting the least recently used entries first. The file modification time is
+    used as access time, since atime is often disabled.
+
+    Files are written to a temporary name and renamed, so several processes can share a cache
+    directory.
+    """
+    def __init__(self, path, max_bytes=1e9, compress=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self.nbytes = sum([os.path.getsize(f) for f in self._list_files()])
+
+    def _list_files(self):
+        return [os.path.join(self.path, f) for f in os.listdir(self.path) if f.endswith(".npz")]
+
+    def _filename(self, key):
+        return os.path.join(self.path, "{0}.npz".format(key))
+
+    def get(self, key):
+        """
+        Load an entry from the cache.
+
+        :param key: Content key string
+        :return: Dict of name: array, or None if not found
+        """
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as data:
+                arrays = dict((name, data[name]) for name in data.files)
+            os.utime(filename, None)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.debug("Disk cache hit {0}".format(key))
+        return arrays
+
+    def put(self, key, **arrays):
+        """
+        Store arrays in the cache under a key, then evict old entries if the cache is too large.
+
+        :param key: Content key string
+        :param arrays: Named arrays to store
+        :return:
+        """
+        filename = self._filename(key)
+        tmp_filename = "{0}.{1}.tmp".format(filename, os.getpid())
+        with open(tmp_filename, "wb") as f:
+            if self.compress is True:
+                np.savez_compressed(f, **arrays)
+            else:
+                np.savez(f, **arrays)
+        if os.path.isfile(filename):
+            self.nbytes -= os.path.getsize(filename)
+        os.replace(tmp_filename, filename)
+        self.nbytes += os.path.getsize(filename)
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is within max_bytes.
+
+        :return:
+        """
+        files = sorted(self._list_files(), key=os.path.getmtime)
+        self.nbytes = sum([os.path.getsize(f) for f in files])
+        while files and self.nbytes > self.max_bytes:
+            filename = files.pop(0)
+            try:
+                size = os.path.getsize(filename)
+                os.remove(filename)
+            except OSError:
+                continue
+            self.nbytes -= size
+            self.evictions += 1
+            logger.debug("Evicted {0}".format(filename))
+
+    def clear(self):
+        """
+        Remove all entries.
+
+        :return:
+        """
+        for filename in self._list_files():
+            os.remove(filename)
+        self.nbytes = 0
+
+    def get_stats(self):
+        """
+        Cache statistics.
+
+        :return: Dict with hits, misses, evictions, entries and nbytes
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._list_files()), "nbytes": self.nbytes}
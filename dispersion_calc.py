@@ -5,11 +5,23 @@ Created on 29 Mar 2017
 """
 
 import numpy as np
-from scipy.interpolate import interp1d
-from xml.etree import cElementTree as ElementTree
-import os
+from scipy.fft import next_fast_len
+from scipy.special import erfc
+from scipy.optimize import minimize, OptimizeResult
+from scipy.signal import czt
+from dispersion_cache import WavenumberCache, content_key
+from dispersion_fft import get_fft_backend
+from dispersion_instrumentation import InstrumentationStats, InstrumentedFFTBackend
+from dispersion_metrics import get_fwhm, get_pulse_metrics, get_rms_duration_spectral
+from dispersion_spectra import resample_spectrum, spectrum_key
+from dispersion_materials import SellmeierMaterial, AirMaterial, BBOMaterial, TabulatedMaterial, MaterialRegistry
+from dispersion_materials import DispersionTable
+from dispersion_materials import read_material_file
+from collections import Counter
+import itertools
 import logging
 import warnings
+import os
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.CRITICAL)
@@ -19,13 +31,38 @@ logger.setLevel(logging.CRITICAL)
 warnings.filterwarnings('ignore')
 
 
+def unwrap_phase(ph, threshold=5.0, axis=-1):
+    """
+    Remove 2*pi jumps from a phase vector. We need to sample often enough that the difference
+    in phase is less than threshold, a larger jump is taken as a 2*pi phase jump.
+
+    All jumps are corrected in a single cumulative sum, so the cost does not grow with
+    the number of jumps. Stacks of phase vectors can be unwrapped along any axis.
+
+    :param ph: Phase array (rad)
+    :param threshold: Phase difference between samples that is taken as a 2*pi jump
+    :param axis: Axis to unwrap along
+    :return: Unwrapped phase array, same shape as ph
+    """
+    ph = np.moveaxis(np.array(ph, dtype=np.double), axis, -1)
+    ph_diff = np.diff(ph, axis=-1)
+    jumps = (ph_diff < -threshold).astype(np.double)
+    jumps -= ph_diff > threshold
+    jumps *= 2 * np.pi
+    ph[..., 1:] += np.cumsum(jumps, axis=-1)
+    return np.moveaxis(ph, -1, axis)
+
+
 class DispersionCalculator(object):
     """
     Calculation of linear dispersion through materials. The materials are specified with their
     Sellmeier coefficients and stored in a dictionary. At creation an internal set of materials
-    is generated (air, fused silica (fs), bbo, sapphire, MgF2) and a materials directory (./materials)
-    is scanned for XML files for additional materials.
+    is generated (air, fused silica (fs), bbo, sapphire, MgF2) and a materials directory (materials_path,
+    default the materials directory next to this module) is scanned for XML files for additional materials.
     The XML files contain a sellmeier element and a list of tags A, B, and C with the coefficients.
+    The files are only indexed at creation and parsed the first time the material is used.
+    They are compiled to a binary catalogue (materials/catalogue.npy) that is loaded memory-mapped
+    and rebuilt automatically when an xml file is newer than it.
 
     To calculate the dispersion, first generate a gaussian pulse with desired pulse duration or
     spectral width. The time span for the electric field vector and number of points are also
@@ -33,11 +70,67 @@ class DispersionCalculator(object):
     method. Additional materials can be propagated in turn by subsequent calls to this method.
     To start over call reset_propagation or generate a new gaussian pulse.
 
+    With lazy_propagation enabled, propagate_material only accumulates the spectral phase
+    sum(k_i(w) * L_i) in phase_w_out. The output fields E_w_out and E_t_out are then calculated
+    (one complex exponential and one inverse FFT) the first time they are read, e.g. by the
+    get_temporal_xxx methods.
+
+    Evaluated k(w) vectors are kept in an LRU cache (k_cache) bounded to k_cache_size bytes,
+    so repeated propagation through the same material on the same grid skips the
+    refractive index evaluation.
+
+    An optional DiskCache (disk_cache) stores the results of propagate_stack and
+    get_spectral_phase_expansion between sessions. The entries are addressed by the pulse
+    parameters, the ordered list of propagated materials and thicknesses, and the material
+    coefficients.
+
+    With workspace enabled the calculator owns fixed buffers for the propagated fields, the
+    accumulated phase and the transfer function, and propagate_material works in place in them
+    without allocating. The arrays E_w_out, E_t_out and phase_w_out are then overwritten by
+    the next propagation. The memory use is fixed at about 121*N bytes (t, w, E_t, E_w,
+    E_t_out, E_w_out, phase_w_out and the workspace) plus the k cache, or about 89*N bytes
+    with single precision fields. This assumes a real E_t as from generate_pulse, a complex
+    E_t from set_pulse_spectrum makes it 129*N (93*N single precision) bytes.
+
+    The fields are complex128 by default. With dtype=np.complex64 the pulse, the fields, the
+    transfer functions, the FFTs and the intensities are single precision, halving the memory
+    and bandwidth. The wavenumbers k(w) and the accumulated spectral phase phase_w_out are kept
+    in double precision, since k*L reaches 1e6 rad for thick materials, and are reduced modulo
+    2*pi before the single precision exponential.
+
+    The FFTs are done by a selectable backend (fft_backend): 'numpy', 'scipy' (multithreaded
+    with workers) or 'pyfftw' (cached plans, multithreaded), see dispersion_fft.
+
+    With support_threshold set, the calculation is restricted to the spectral support of the
+    pulse, the contiguous frequency range where the spectral intensity is above support_threshold
+    times its peak. The spectrum outside the support is set to zero when the pulse is generated.
+    The k(w) evaluation, the phase accumulation, the transfer functions and the spectral phase
+    fits then only run on the support, which for a narrowband pulse on a large grid is a small
+    fraction of the N points. Full length arrays (phase_w_out, the fields, get_k_w) are zero or
+    NaN outside the support.
+
+    get_temporal_field_zoom evaluates the propagated temporal field on an arbitrary time window
+    and resolution with a chirp-z transform of E_w_out, so short pulses can be viewed with fine
+    time resolution without increasing N.
+
+    enable_instrumentation records call counts, wall times and array sizes of the calculation
+    stages (material evaluation, phase multiply, FFTs, phase unwrapping and polynomial fits) in
+    the stats object, see dispersion_instrumentation. It is off by default and then adds no
+    timing overhead.
+
     Analysing the dispersed pulse is done through the get_xxx methods. The phase expansion requires
     a pulse spectral width of more than 3 nm to be reliable it seems.
     """
-    def __init__(self, t_fwhm=50e-15, l_0=800e-9, t_span=2e-12):
-        self.materials_path = "./materials"
+    # Methods timed by enable_instrumentation, and their stage names
+    instrumented_methods = {"evaluate_material": "material", "get_transfer_function": "phase",
+                            "_workspace_transfer_function": "phase", "unwrap": "unwrap", "polyfit": "polyfit"}
+
+    def __init__(self, t_fwhm=50e-15, l_0=800e-9, t_span=2e-12, lazy_propagation=False, k_cache_size=128e6,
+                 disk_cache=None, fft_backend="numpy", workspace=False, dtype=np.complex128, support_threshold=None,
+                 materials_path=None, **fft_kwargs):
+        if materials_path is None:
+            materials_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "materials")
+        self.materials_path = materials_path
         self.c = 299792458.0
         self.l_mat = np.linspace(200e-9, 2000e-9, 1000)
         self.phase_thr = 0.01
@@ -46,20 +139,39 @@ class DispersionCalculator(object):
         self.w_0 = 2 * np.pi * self.c / self.l_0
         self.N = 8192
         self.dt = self.t_span / self.N
-        self.t = np.linspace(-self.t_span / 2, self.t_span / 2, self.N)
+        self.t = (np.arange(self.N) - self.N // 2) * self.dt
         self.w = np.fft.fftshift((2*np.pi*np.fft.fftfreq(self.N, d=self.dt)))
+        self.lazy_propagation = lazy_propagation
+        self.k_cache = WavenumberCache(k_cache_size)
+        self.disk_cache = disk_cache
+        self.fft_backend = get_fft_backend(fft_backend, **fft_kwargs)
+        self.use_workspace = workspace
+        self.workspace = None
+        self.dtype = None
+        self.real_dtype = None
+        self.set_dtype(dtype)
+        self.support_threshold = support_threshold
+        self.support = slice(None)
+        self._grid = None
+        self.pulse_parameters = {}
+        self.propagation_list = []
+        self.stack_list = []
+        self.stack_phase_w = None
+        self.stack_nan_count = None
+        self.stats = None
 
         self.E_t = np.array([])
         self.E_w = np.array([])
-        self.E_t_out = np.array([])
-        self.E_w_out = np.array([])
+        self._E_t_out = np.array([])
+        self._E_w_out = np.array([])
+        self.phase_w_out = np.array([])
 
         self.generate_pulse(t_fwhm, l_0, t_span)
 
-        self.materials = {}
+        self.materials = MaterialRegistry()
         self.generate_materials_dict()
 
-    def generate_pulse(self, fwhm, l_0, t_span=2e-12, n=None, duration_domain='temporal'):
+    def generate_pulse(self, fwhm, l_0, t_span=2e-12, n=None, duration_domain='temporal', dtype=None):
         """
         Generate a gaussian pulse with fwhm parameter in time or spectrum (wavelength).
         Use SI units.
@@ -71,82 +183,454 @@ class DispersionCalculator(object):
                        the dispersed pulse
         :param n: Number of points in the generated field vector
         :param duration_domain: 'temporal' or 'spectral'
+        :param dtype: Complex dtype of the fields, np.complex128 or np.complex64.
+                      If None the current dtype is kept.
         :return:
         """
+        if n is None:
+            n = int(self.N)
+        if dtype is not None:
+            self.set_dtype(dtype)
+        self._set_grid(l_0, t_span, n)
+        ph = 0.0
+        tau = self.get_tau(fwhm, l_0, duration_domain)
+        logger.debug("tau {0}".format(tau))
+        self.E_t = np.exp(-self.t ** 2 / tau ** 2 + ph).astype(self.real_dtype)
+        self.E_w = np.fft.fftshift(self.fft_backend.fft_real(self.E_t)).astype(self.dtype, copy=False)
+        logger.debug("FFTShift done")
+        self.pulse_parameters = {"fwhm": fwhm, "l_0": l_0, "t_span": t_span, "N": int(n),
+                                 "duration_domain": duration_domain, "dtype": self.dtype.name}
+        self._init_pulse()
+        logger.debug("copy done")
+
+    def _set_grid(self, l_0, t_span, n):
+        """
+        Set up the time and frequency vectors.
+        """
+        grid = (n, t_span, l_0)
+        if self._grid is not None and self._grid != grid:
+            self.k_cache.invalidate(grid=self._grid)
+        self._grid = grid
         self.l_0 = l_0
         self.w_0 = 2 * np.pi * self.c / self.l_0
         self.t_span = t_span
-        if n is None:
-            n = np.int(self.N)
         self.N = n
         self.dt = self.t_span / n
-        self.t = np.linspace(-self.t_span / 2, self.t_span / 2, np.int(n))
+        # Same spacing dt as the frequency vector, with t = 0 at the center sample as w = 0
+        self.t = (np.arange(int(n)) - int(n) // 2) * self.dt
         logger.debug("FFTShift")
-        self.w = np.fft.fftshift((2 * np.pi * np.fft.fftfreq(np.int(n), d=self.dt)))
-        ph = 0.0
+        self.w = np.fft.fftshift((2 * np.pi * np.fft.fftfreq(int(n), d=self.dt)))
+
+    def _init_pulse(self):
+        """
+        Prepare propagation of a new input pulse E_t, E_w: find the spectral support, allocate
+        the workspace and reset the propagation.
+        """
+        self.support = self.get_spectral_support(self.support_threshold)
+        # The support changes the propagated fields, so it is part of the cache key
+        self.pulse_parameters["support"] = [self.support.start, self.support.stop]
+        if self.support != slice(None):
+            E_w = np.zeros_like(self.E_w)
+            E_w[self.support] = self.E_w[self.support]
+            self.E_w = E_w
+        if self.use_workspace is True:
+            if self.workspace is None or self.workspace["E_w_out"].shape[0] != self.N \
+                    or self.workspace["E_w_out"].dtype != self.dtype:
+                self.allocate_workspace()
+        else:
+            self.workspace = None
+        self.reset_propagation()
+
+    def set_pulse_spectrum(self, l, I_l, phase=None, l_0=None, t_span=None, n=None, dtype=None):
+        """
+        Use a measured spectrum as input pulse instead of a gaussian. The spectrum is resampled
+        onto the frequency grid with the Jacobian l**2 / (2*pi*c) converting intensity per
+        wavelength to intensity per angular frequency, see dispersion_spectra.resample_spectrum.
+        Without phase the pulse is transform limited. The temporal field is scaled to a peak
+        amplitude of 1, as for generate_pulse.
+
+        :param l: Wavelength vector (m)
+        :param I_l: Spectral intensity per unit wavelength, same size as l
+        :param phase: Spectral phase (rad) versus wavelength. Optional.
+        :param l_0: Central wavelength of the grid. Default the current l_0.
+        :param t_span: Time span of the grid. Default the current t_span.
+        :param n: Number of points of the grid. Default the current N.
+        :param dtype: Complex dtype of the fields. If None the current dtype is kept.
+        :return:
+        """
+        logger.debug("Entering set_pulse_spectrum")
+        if dtype is not None:
+            self.set_dtype(dtype)
+        grid = (self.N if n is None else n, self.t_span if t_span is None else t_span,
+                self.l_0 if l_0 is None else l_0)
+        if grid != self._grid:
+            self._set_grid(grid[2], grid[1], grid[0])
+        E_w = resample_spectrum(l, I_l, self.w + self.w_0, phase)
+        E_t = self.fft_backend.ifft(np.fft.fftshift(E_w))
+        scale = np.abs(E_t).max()
+        if scale == 0:
+            raise ValueError("The spectrum does not overlap the frequency grid")
+        self.E_w = (E_w / scale).astype(self.dtype)
+        self.E_t = (E_t / scale).astype(self.dtype)
+        self.pulse_parameters = {"spectrum": spectrum_key(l, I_l, phase),
+                                 "l_0": self.l_0, "t_span": self.t_span, "N": int(self.N),
+                                 "dtype": self.dtype.name}
+        self._init_pulse()
+
+    def propagate_spectra(self, l, spectra, material_list=None, phases=None):
+        """
+        Propagate a sequence of measured spectra through a material stack, one at a time, on the
+        current grid. spectra can be a generator (see dispersion_spectra.iter_spectra_csv and
+        iter_spectra_binary), so a file with many acquisitions is never loaded as a whole.
+        The phase of the stack is kept between spectra while the spectral support is unchanged,
+        so each spectrum costs one complex exponential and two inverse FFTs (one to scale the
+        input pulse, see set_pulse_spectrum, and one for E_t_out).
+
+        :param l: Wavelength vector (m) of the spectra
+        :param spectra: Iterable of intensity arrays
+        :param material_list: List of (name, thickness) tuples. Default the materials propagated so far.
+        :param phases: Iterable of spectral phase arrays, one per spectrum. Optional.
+        :return: Generator of dicts with index, duration and bandwidth (FWHM, see get_pulse_duration)
+                 and the fields E_t_out and E_w_out (copies)
+        """
+        logger.debug("Entering propagate_spectra")
+        if material_list is None:
+            material_list = list(self.propagation_list)
+        if phases is None:
+            phases = itertools.repeat(None)
+        for ind, (I_l, phase) in enumerate(zip(spectra, phases)):
+            stack = (self.support, self.stack_list, self.stack_phase_w, self.stack_nan_count)
+            self.set_pulse_spectrum(l, I_l, phase)
+            # The grid is unchanged, so the stack phase is still valid on the same support
+            if stack[2] is not None and stack[0] == self.support:
+                self.stack_list = stack[1]
+                self.propagation_list = list(stack[1])
+                self.stack_phase_w = stack[2]
+                self.stack_nan_count = stack[3]
+            self.set_stack(material_list)
+            yield {"index": ind, "duration": self.get_pulse_duration("temporal"),
+                   "bandwidth": self.get_pulse_duration("spectral"),
+                   "E_t_out": self.E_t_out.copy(), "E_w_out": self.E_w_out.copy()}
+
+    def get_spectral_support(self, threshold=None):
+        """
+        Frequency range where the spectral intensity of the generated pulse is above threshold
+        times the peak intensity.
+
+        :param threshold: Relative intensity threshold, e.g. 1e-10. None for the full grid.
+        :return: Slice of the frequency vector, from the first to the last point above the threshold
+        :raises ValueError: If the spectrum has no point above the threshold
+        """
+        if threshold is None:
+            return slice(None)
+        I_w = np.abs(self.E_w)**2
+        I_max = I_w.max()
+        ind = np.flatnonzero(I_w >= threshold * I_max)
+        # An all zero (or NaN) spectrum has no support, slicing it would hide the bad pulse
+        if ind.shape[0] == 0 or not I_max > 0:
+            raise ValueError("The spectrum has no point above threshold {0}".format(threshold))
+        logger.debug("Spectral support {0} of {1} points".format(ind[-1] + 1 - ind[0], I_w.shape[0]))
+        return slice(int(ind[0]), int(ind[-1]) + 1)
+
+    def allocate_workspace(self):
+        """
+        Allocate the fixed buffers used for in-place propagation on the current grid:
+        E_w_out, E_t_out and H_w (complex), phase_w_out and ph_w (real), nan_w (bool), and
+        shift_t, the factor that replaces the fftshift before the inverse transform. For single
+        precision fields ph_r (double) and ph_s (single) hold the phase reduced modulo 2*pi.
+
+        :return:
+        """
+        n = self.w.shape[0]
+        logger.debug("Allocating workspace for N={0}".format(n))
+        self.workspace = {"E_w_out": np.zeros(n, dtype=self.dtype),
+                          "E_t_out": np.zeros(n, dtype=self.dtype),
+                          "H_w": np.zeros(n, dtype=self.dtype),
+                          "phase_w_out": np.zeros(n),
+                          "ph_w": np.zeros(n),
+                          "nan_w": np.zeros(n, dtype=bool),
+                          # ifft(fftshift(x))[m] = exp(2j*pi*(n//2)*m/n) * ifft(x)[m]
+                          "shift_t": np.exp(2j * np.pi * (n // 2) * np.arange(n) / n).astype(self.dtype)}
+        if self.dtype == np.complex64:
+            self.workspace["ph_r"] = np.zeros(n)
+            self.workspace["ph_s"] = np.zeros(n, dtype=self.real_dtype)
+
+    def _workspace_transfer_function(self, ph_w):
+        """
+        Calculate exp(-1j*ph_w) into the workspace, with zeros where the phase is NaN.
+        The phase may be shorter than the grid (the spectral support), then the start of the
+        buffers is used.
+
+        :param ph_w: Spectral phase vector
+        :return: Transfer function (workspace H_w buffer)
+        """
+        m = ph_w.shape[0]
+        H_w = self.workspace["H_w"][:m]
+        nan_w = self.workspace["nan_w"][:m]
+        np.isnan(ph_w, out=nan_w)
+        if self.dtype == np.complex64:
+            ph_r = self.workspace["ph_r"][:m]
+            np.multiply(ph_w, 1 / (2 * np.pi), out=ph_r)
+            np.floor(ph_r, out=ph_r)
+            ph_r *= 2 * np.pi
+            np.subtract(ph_w, ph_r, out=ph_r)
+            ph_w = self.workspace["ph_s"][:m]
+            np.copyto(ph_w, ph_r, casting="same_kind")
+        np.cos(ph_w, out=H_w.real)
+        np.sin(ph_w, out=H_w.imag)
+        np.negative(H_w.imag, out=H_w.imag)
+        np.copyto(H_w, 0, where=nan_w)
+        return H_w
+
+    def _workspace_ifft(self, E_w):
+        """
+        Inverse transform a centered spectrum into the workspace E_t_out buffer.
+
+        :param E_w: Spectral field (fftshifted, as E_w_out)
+        :return: Temporal field (workspace E_t_out buffer)
+        """
+        E_t_out = self.workspace["E_t_out"]
+        self.fft_backend.ifft(E_w, out=E_t_out)
+        E_t_out *= self.workspace["shift_t"]
+        return E_t_out
+
+    def set_dtype(self, dtype):
+        """
+        Set the complex dtype of the fields. Takes effect at the next generate_pulse.
+
+        :param dtype: np.complex128 or np.complex64
+        :return:
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.dtype(np.complex128), np.dtype(np.complex64)):
+            raise ValueError("Unsupported dtype {0}, use complex128 or complex64".format(dtype))
+        self.dtype = dtype
+        self.real_dtype = np.finfo(dtype).dtype
+
+    def get_transfer_function(self, ph_w):
+        """
+        Transfer function exp(-1j*ph_w) in the field dtype, with zeros where the phase is NaN
+        (outside the range where a material is defined). For single precision the phase is
+        reduced modulo 2*pi in double precision first.
+
+        :param ph_w: Spectral phase array (rad), double precision
+        :return: Complex transfer function array
+        """
+        if self.dtype == np.complex64:
+            ph_w = (ph_w - 2 * np.pi * np.floor(ph_w / (2 * np.pi))).astype(self.real_dtype)
+        H_w = np.empty(ph_w.shape, dtype=self.dtype)
+        np.cos(ph_w, out=H_w.real)
+        np.sin(ph_w, out=H_w.imag)
+        np.negative(H_w.imag, out=H_w.imag)
+        H_w[np.isnan(ph_w)] = 0
+        return H_w
+
+    def set_fft_backend(self, fft_backend="numpy", **fft_kwargs):
+        """
+        Select the FFT backend for this calculator.
+
+        :param fft_backend: 'numpy', 'scipy', 'pyfftw' or an FFTBackend instance
+        :param fft_kwargs: Backend arguments, e.g. workers=4 for scipy or threads=4 for pyfftw
+        :return:
+        """
+        self.fft_backend = get_fft_backend(fft_backend, **fft_kwargs)
+        if self.stats is not None:
+            self.fft_backend = InstrumentedFFTBackend(self.fft_backend, self.stats)
+
+    def enable_instrumentation(self, hook=None):
+        """
+        Start recording the calculation stages in self.stats. Timed wrappers are installed on the
+        instance for the methods in instrumented_methods and around the FFT backend.
+
+        :param hook: Function called as hook(stage, elapsed, size) for each recorded call, e.g. to
+                     export the timings. Optional.
+        :return: InstrumentationStats object
+        """
+        logger.debug("Entering enable_instrumentation")
+        if self.stats is not None:
+            self.stats.hook = hook
+            return self.stats
+        self.stats = InstrumentationStats(hook)
+        for name, stage in self.instrumented_methods.items():
+            setattr(self, name, self.stats.wrap(stage, getattr(self, name)))
+        self.fft_backend = InstrumentedFFTBackend(self.fft_backend, self.stats)
+        return self.stats
+
+    def disable_instrumentation(self):
+        """
+        Stop recording and remove the timed wrappers.
+
+        :return: The InstrumentationStats object with the recorded statistics, or None
+        """
+        logger.debug("Entering disable_instrumentation")
+        stats = self.stats
+        if stats is not None:
+            for name in self.instrumented_methods:
+                delattr(self, name)
+            self.fft_backend = self.fft_backend.backend
+            self.stats = None
+        return stats
+
+    def get_tau(self, fwhm, l_0, duration_domain='temporal'):
+        """
+        Gaussian width parameter tau of the field exp(-t**2 / tau**2) for a pulse specified as
+        in generate_pulse.
+
+        :param fwhm: Pulse width in time or spectrum
+        :param l_0:  Central wavelength
+        :param duration_domain: 'temporal' or 'spectral'
+        :return: tau (s)
+        """
         if duration_domain == 'temporal':
             tau = fwhm / np.sqrt(2 * np.log(2))
         else:
             tau = 0.441 * l_0**2 / (fwhm * self.c)
-        logger.debug("tau {0}".format(tau))
-        self.E_t = np.exp(-self.t ** 2 / tau ** 2 + ph)
-        self.E_w = np.fft.fftshift(np.fft.fft(self.E_t))
-        logger.debug("FFTShift done")
-        self.E_t_out = self.E_t.copy()
-        self.E_w_out = self.E_w.copy()
-        logger.debug("copy done")
+        return tau
+
+    def get_auto_grid(self, fwhm, l_0, material_list, duration_domain='temporal', tolerance=1e-6,
+                      samples_per_fwhm=16):
+        """
+        Find the smallest time span and number of points that hold a gaussian pulse propagated
+        through a material stack without aliasing. The output pulse is estimated from the stack
+        GDD, TOD and FOD (see get_dispersion): each frequency component within the spectral
+        support (intensity above tolerance) arrives at its group delay, broadened by the transform
+        limited envelope. The time span covers this and also keeps the phase step between
+        frequency samples below the unwrapping threshold. The time step samples the intensity
+        (twice the field bandwidth) of the spectral support without aliasing and gives at least
+        samples_per_fwhm samples across the estimated output FWHM, and the number of points is
+        rounded up to an FFT friendly size.
+
+        :param fwhm: Pulse width in time or spectrum
+        :param l_0:  Central wavelength
+        :param material_list: List of (name, thickness) tuples
+        :param duration_domain: 'temporal' or 'spectral'
+        :param tolerance: Relative intensity level that may be truncated
+        :param samples_per_fwhm: Minimum number of time samples across the output FWHM
+        :return: Dict with N, t_span, dt, estimated output duration (FWHM), bandwidth (FWHM, rad/s),
+                 estimated truncation_error (fraction of pulse energy outside the grid),
+                 sampling_error (worst case relative error of the sampled FWHM) and
+                 error (sum of the two)
+        """
+        logger.debug("Entering get_auto_grid")
+        tau = self.get_tau(fwhm, l_0, duration_domain)
+        t_fwhm = tau * np.sqrt(2 * np.log(2))
+        disp = self.get_dispersion(material_list, l_0, 4)
+        # Spectral intensity is exp(-w**2 * tau**2 / 2), temporal intensity exp(-2 * t**2 / tau**2)
+        w_support = np.sqrt(2 * np.log(1.0 / tolerance)) / tau
+        t_support = tau * np.sqrt(np.log(1.0 / tolerance) / 2)
+        dw = np.linspace(-w_support, w_support, 2001)
+        t_g = disp[1] * dw + disp[2] * dw**2 / 2 + disp[3] * dw**3 / 6
+        t_g_span = t_g.max() - t_g.min()
+        # Phase step between frequency samples 2*pi*t_g/t_span must stay below 5 rad for unwrapping
+        t_span = max(t_g_span + 2 * t_support, 2 * np.pi / 5.0 * t_g_span)
+        duration = t_fwhm * np.sqrt(1 + (4 * np.log(2) * disp[1] / t_fwhm**2)**2)
+        dt = min(np.pi / (2 * w_support), duration / samples_per_fwhm)
+        n = next_fast_len(int(np.ceil(t_span / dt)))
+        dt = t_span / n
+
+        spectral_error = erfc(np.pi / dt * tau / np.sqrt(2))
+        weight = np.exp(-dw**2 * tau**2 / 2)
+        edge_dist = t_span / 2 - np.abs(t_g - (t_g.max() + t_g.min()) / 2)
+        temporal_error = np.sum(weight * 0.5 * erfc(edge_dist * np.sqrt(2) / tau)) / np.sum(weight)
+        # The sampled peak is up to dt/2 off the true peak, which lowers the half maximum level
+        # and widens the interpolated FWHM of a gaussian by at most ln(2) * (dt / fwhm)**2
+        sampling_error = np.log(2) * (dt / duration)**2
+        truncation_error = spectral_error + temporal_error
+        grid = {"N": n, "t_span": t_span, "dt": dt, "duration": duration,
+                "bandwidth": 4 * np.log(2) / t_fwhm, "truncation_error": truncation_error,
+                "sampling_error": sampling_error, "error": truncation_error + sampling_error}
+        logger.debug("Auto grid {0}".format(grid))
+        return grid
+
+    def generate_pulse_auto_grid(self, fwhm, l_0, material_list, duration_domain='temporal', tolerance=1e-6,
+                                 samples_per_fwhm=16):
+        """
+        Generate a gaussian pulse on a grid chosen by get_auto_grid for propagation through
+        a material stack.
+
+        :param fwhm: Pulse width in time or spectrum
+        :param l_0:  Central wavelength
+        :param material_list: List of (name, thickness) tuples
+        :param duration_domain: 'temporal' or 'spectral'
+        :param tolerance: Relative intensity level that may be truncated
+        :param samples_per_fwhm: Minimum number of time samples across the output FWHM
+        :return: Dict describing the chosen grid, see get_auto_grid
+        """
+        grid = self.get_auto_grid(fwhm, l_0, material_list, duration_domain, tolerance, samples_per_fwhm)
+        self.generate_pulse(fwhm, l_0, grid["t_span"], grid["N"], duration_domain)
+        return grid
+
+    @property
+    def E_w_out(self):
+        """
+        Propagated spectral field. With lazy propagation it is calculated from the
+        accumulated spectral phase when first read after a propagation.
+        """
+        if self._E_w_out is None:
+            logger.debug("Applying accumulated spectral phase")
+            if self.workspace is not None:
+                self._E_w_out = np.multiply(self.E_w, self._workspace_transfer_function(self.phase_w_out),
+                                            out=self.workspace["E_w_out"])
+            elif self.support != slice(None):
+                s = self.support
+                self._E_w_out = np.zeros_like(self.E_w)
+                self._E_w_out[s] = self.get_transfer_function(self.phase_w_out[s]) * self.E_w[s]
+            else:
+                self._E_w_out = self.get_transfer_function(self.phase_w_out) * self.E_w
+        return self._E_w_out
+
+    @E_w_out.setter
+    def E_w_out(self, value):
+        if self.workspace is not None and value is not None:
+            np.copyto(self.workspace["E_w_out"], value)
+            value = self.workspace["E_w_out"]
+        self._E_w_out = value
+
+    @property
+    def E_t_out(self):
+        """
+        Propagated temporal field. With lazy propagation the inverse FFT is done when
+        first read after a propagation.
+        """
+        if self._E_t_out is None:
+            logger.debug("Transforming to time domain")
+            if self.workspace is not None:
+                self._E_t_out = self._workspace_ifft(self.E_w_out)
+            else:
+                self._E_t_out = self.fft_backend.ifft(np.fft.fftshift(self.E_w_out)).astype(self.dtype, copy=False)
+        return self._E_t_out
+
+    @E_t_out.setter
+    def E_t_out(self, value):
+        if self.workspace is not None and value is not None:
+            np.copyto(self.workspace["E_t_out"], value)
+            value = self.workspace["E_t_out"]
+        self._E_t_out = value
 
     def generate_materials_dict(self):
         """
         Generates the internal materials dict from a set of non-sellmeier materials (air, sapphire, bbo..)
-        and the files in the materials directory. The dict stores scipy interp1d interpolators that are
-        used to find the refractive index at specific angular frequencies later.
+        and the files in the materials directory. The dict stores material objects holding the
+        dispersion formula coefficients. They are called with a vector of angular frequencies
+        to evaluate the refractive index.
+
+        The files in the materials directory are only indexed here (from an index.json file if
+        present, otherwise from the filenames). Each file is parsed when the material is first used.
         :return:
         """
-        w_mat = 2 * np.pi * self.c / self.l_mat
-        l2_mat = (self.l_mat * 1e6) ** 2
-
-        n_air = 1 + 0.05792105 * l2_mat / (238.0185 * l2_mat - 1) + 0.00167917 * l2_mat / (57.362 * l2_mat - 1)
-        air_ip = interp1d(w_mat, n_air, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['air'] = air_ip
-
-        n_fs = np.sqrt(1 + 0.6961663 * l2_mat / (l2_mat - 0.0684043 ** 2) +
-                       0.4079426 * l2_mat / (l2_mat - 0.1162414 ** 2) +
-                       0.8974794 * l2_mat / (l2_mat - 9.896161 ** 2))
-        fs_ip = interp1d(w_mat, n_fs, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['fs'] = fs_ip
-
-        n_mgf2 = np.sqrt(1 + 0.48755108 * l2_mat / (l2_mat - 0.04338408 ** 2) +
-                         0.39875031 * l2_mat / (l2_mat - 0.09461442 ** 2) +
-                         2.3120353 * l2_mat / (l2_mat - 23.793604 ** 2))
-        mgf2_ip = interp1d(w_mat, n_mgf2, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['mgf2'] = mgf2_ip
-
-        n_sapphire_o = np.sqrt(1 + 1.4313493 * l2_mat / (l2_mat - 0.0726631 ** 2) +
-                               0.65054713 * l2_mat / (l2_mat - 0.1193242 ** 2) +
-                               5.3414021 * l2_mat / (l2_mat - 18.028251 ** 2))
-        sapphire_o_ip = interp1d(w_mat, n_sapphire_o, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['sapphire_o'] = sapphire_o_ip
-
-        n_sapphire_e = np.sqrt(1 + 1.5039759 * l2_mat / (l2_mat - 0.0740288 ** 2) +
-                               0.55069141 * l2_mat / (l2_mat - 0.1216529 ** 2) +
-                               6.5927379 * l2_mat / (l2_mat - 20.072248 ** 2))
-        sapphire_e_ip = interp1d(w_mat, n_sapphire_e, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['sapphire_e'] = sapphire_e_ip
-
-        n_bbo_o = np.sqrt(2.7405 + 0.0184 / (l2_mat - 0.0179) - 0.0155 * l2_mat)
-        bbo_o_ip = interp1d(w_mat, n_bbo_o, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['bbo_o'] = bbo_o_ip
-
-        n_bbo_e = np.sqrt(2.3730 + 0.0128 / (l2_mat - 0.0156) - 0.0044 * l2_mat)
-        bbo_e_ip = interp1d(w_mat, n_bbo_e, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials['bbo_e'] = bbo_e_ip
-
-        materials_files = os.listdir(self.materials_path)
-        logger.info("Found {0:d}".format(materials_files.__len__()))
-        for mat_file in materials_files:
-            logger.info(mat_file)
-            self.read_material(''.join((self.materials_path, '/', mat_file)))
+        self.materials['air'] = AirMaterial('air', [0.05792105, 0.00167917], [238.0185, 57.362])
+        self.materials['fs'] = SellmeierMaterial('fs', b_coeff=[0.6961663, 0.4079426, 0.8974794],
+                                                 c_coeff=[0.0684043 ** 2, 0.1162414 ** 2, 9.896161 ** 2])
+        self.materials['mgf2'] = SellmeierMaterial('mgf2', b_coeff=[0.48755108, 0.39875031, 2.3120353],
+                                                   c_coeff=[0.04338408 ** 2, 0.09461442 ** 2, 23.793604 ** 2])
+        self.materials['sapphire_o'] = SellmeierMaterial('sapphire_o', b_coeff=[1.4313493, 0.65054713, 5.3414021],
+                                                         c_coeff=[0.0726631 ** 2, 0.1193242 ** 2, 18.028251 ** 2])
+        self.materials['sapphire_e'] = SellmeierMaterial('sapphire_e', b_coeff=[1.5039759, 0.55069141, 6.5927379],
+                                                         c_coeff=[0.0740288 ** 2, 0.1216529 ** 2, 20.072248 ** 2])
+        self.materials['bbo_o'] = BBOMaterial('bbo_o', 2.7405, 0.0184, 0.0179, 0.0155)
+        self.materials['bbo_e'] = BBOMaterial('bbo_e', 2.3730, 0.0128, 0.0156, 0.0044)
+
+        self.materials.scan(self.materials_path)
 
     def add_material(self, name, b_coeff, c_coeff):
         """
@@ -155,27 +639,26 @@ class DispersionCalculator(object):
 
         The wavelengths are in um as customary in Sellmeier equations.
 
-        The dict stores scipy interp1d interpolators that are used to find the refractive index at
-        specific angular frequencies later.
-
         :param name: String containing the name of the material (used as key in the dict)
         :param b_coeff: Vector of B-coefficients for the Sellmeier equation (for lambda in um)
         :param c_coeff: Vector of C-coefficients for the Sellmeier equation (for lambda in um)
         :return:
         """
+        self.materials[name] = SellmeierMaterial(name, b_coeff=b_coeff, c_coeff=c_coeff)
+        self.material_changed(name)
+
+    def add_tabulated_material(self, name, l, n):
         """
+        Adds a material from a table of refractive index versus wavelength. The table is
+        interpolated, so use add_material when Sellmeier coefficients are available.
 
+        :param name: String containing the name of the material (used as key in the dict)
+        :param l: Wavelength vector (SI units)
+        :param n: Refractive index vector
         :return:
         """
-        l_mat = np.linspace(200e-9, 2000e-9, 5000)
-        w_mat = 2 * np.pi * self.c / l_mat
-        l2_mat = (l_mat * 1e6) ** 2
-        n_tmp = 0.0
-        for ind, b in enumerate(b_coeff):
-            n_tmp += b*l2_mat / (l2_mat - c_coeff[ind])
-        n = np.sqrt(1 + n_tmp)
-        n_ip = interp1d(w_mat, n, bounds_error=False, fill_value=np.nan, kind="quadratic")
-        self.materials[name] = n_ip
+        self.materials[name] = TabulatedMaterial(name, l, n)
+        self.material_changed(name)
 
     def read_material(self, filename):
         """
@@ -192,35 +675,20 @@ class DispersionCalculator(object):
         :param filename: String containing the filename
         :return:
         """
-        l_mat = np.linspace(200e-9, 2000e-9, 5000)
-        w_mat = 2 * np.pi * self.c / l_mat
-        l2_mat = (l_mat * 1e6) ** 2
-        n_tmp = 0.0
-
-        e = ElementTree.parse(filename)
-        mat = e.getroot()
-        name = mat.get('name')
-        sm = mat.findall('sellmeier')
-        for s in sm:
-            at = s.find('A')
-            if at is not None:
-                a = np.double(at.text)
-            else:
-                a = 0.0
-            bt = s.find('B')
-            if bt is not None:
-                b = np.double(bt.text)
-            else:
-                b = 0.0
-            ct = s.find('C')
-            if ct is not None:
-                c = np.double(ct.text)
-            else:
-                c = 0.0
-            n_tmp += a + b*l2_mat / (l2_mat - c)
-        n = np.sqrt(1 + n_tmp)
-        n_ip = interp1d(w_mat, n, bounds_error=False, fill_value=np.nan)
-        self.materials[name] = n_ip
+        mat = read_material_file(filename)
+        self.materials[mat.name] = mat
+        self.material_changed(mat.name)
+
+    def material_changed(self, name):
+        """
+        Drop cached results that depend on a material, after it has been added or replaced.
+
+        :param name: Material name
+        :return:
+        """
+        self.k_cache.invalidate(name=name)
+        if name in [row[0] for row in self.stack_list]:
+            self.stack_phase_w = None
 
     def propagate_material(self, name, thickness):
         """
@@ -228,19 +696,275 @@ class DispersionCalculator(object):
         in the fourier domain by spectral filtering. The pulse is then inverse transformed to
         the time domain.
 
+        With lazy_propagation the spectral phase is only added to phase_w_out and the fields are
+        calculated when they are needed.
+
         :param name: String containing the name of the material (to match a key in the materials dict)
         :param thickness: Thickness of the material (SI units)
         :return:
         """
         logger.debug("Entering propagate_material {0}, {1}".format(name, thickness))
         try:
-            k_w = (self.w + self.w_0) * self.materials[name](self.w + self.w_0) / self.c
+            k_w = self.get_k_w(name, compact=True)
         except KeyError:
             return
-        H_w = np.exp(-1j * k_w * thickness)
-        H_w[np.isnan(H_w)] = 0
-        self.E_w_out = H_w * self.E_w_out.copy()
-        self.E_t_out = np.fft.ifft(np.fft.fftshift(self.E_w_out))
+        s = self.support
+        if self.workspace is not None:
+            ph_w = np.multiply(k_w, thickness, out=self.workspace["ph_w"][:k_w.shape[0]])
+        else:
+            ph_w = k_w * thickness
+        if self.lazy_propagation is True:
+            self.phase_w_out[s] += ph_w
+            self.E_w_out = None
+            self.E_t_out = None
+        elif self.workspace is not None:
+            E_w_out = self.E_w_out
+            self.phase_w_out[s] += ph_w
+            np.multiply(E_w_out[s], self._workspace_transfer_function(ph_w), out=E_w_out[s])
+            self._E_t_out = self._workspace_ifft(E_w_out)
+        else:
+            E_w_in = self.E_w_out
+            self.phase_w_out[s] += ph_w
+            H_w = self.get_transfer_function(ph_w)
+            if s == slice(None):
+                self.E_w_out = H_w * E_w_in.copy()
+            else:
+                E_w_out = E_w_in.copy()
+                E_w_out[s] *= H_w
+                self.E_w_out = E_w_out
+            self.E_t_out = self.fft_backend.ifft(np.fft.fftshift(self.E_w_out)).astype(self.dtype, copy=False)
+        self.propagation_list.append((name, thickness))
+
+    def propagate_stack(self, material_list):
+        """
+        Propagate the current pulse through a list of materials in turn. If a disk cache is
+        set and the same pulse has been propagated through the same stack before, the
+        accumulated spectral phase is loaded from the cache instead. The fields are then
+        calculated from it when first read, as with lazy propagation.
+
+        :param material_list: List of (name, thickness) tuples. Unknown materials are skipped.
+        :return:
+        """
+        logger.debug("Entering propagate_stack {0}".format(material_list))
+        material_list = [(name, thickness) for name, thickness in material_list if name in self.materials]
+        key = None
+        if self.disk_cache is not None:
+            key = self.get_state_key(self.propagation_list + material_list)
+            data = self.disk_cache.get(key)
+            if data is not None:
+                self.phase_w_out[...] = data["phase_w_out"]
+                self.E_w_out = None
+                self.E_t_out = None
+                self.propagation_list.extend(material_list)
+                return
+        for name, thickness in material_list:
+            self.propagate_material(name, thickness)
+        if key is not None:
+            self.disk_cache.put(key, phase_w_out=self.phase_w_out)
+
+    def set_stack(self, material_list):
+        """
+        Propagate the initial pulse through a material stack, updating the result of the previous
+        set_stack call incrementally. The phase of the stack is the sum of the row contributions
+        k_i(w) * L_i, with k_i(w) from the k cache. Rows that were removed or changed since the
+        last call are subtracted from the sum and new or changed rows are added, so editing one
+        row costs one phase update regardless of the stack length. Reordering rows needs no
+        update at all. Frequencies where a material is undefined are tracked with a count of
+        NaN contributions per frequency, so they are unblocked again when the row is removed.
+
+        The stack replaces any earlier propagation. The fields are calculated (one complex
+        exponential and one inverse FFT) when they are first read.
+
+        :param material_list: List of (name, thickness) tuples. Unknown materials are skipped.
+        :return:
+        """
+        logger.debug("Entering set_stack {0}".format(material_list))
+        material_list = [(name, thickness) for name, thickness in material_list if name in self.materials]
+        if self.stack_phase_w is None or self.propagation_list != self.stack_list:
+            old_list = []
+            self.stack_phase_w = None
+        else:
+            old_list = self.stack_list
+        removed = Counter(old_list) - Counter(material_list)
+        added = Counter(material_list) - Counter(old_list)
+        # Rebuild when that is less work, which also clears accumulated rounding errors
+        if self.stack_phase_w is None or sum(removed.values()) + sum(added.values()) > len(material_list):
+            m = self.w[self.support].shape[0]
+            self.stack_phase_w = np.zeros(m)
+            self.stack_nan_count = np.zeros(m, dtype=np.int32)
+            removed = Counter()
+            added = Counter(material_list)
+        for (name, thickness), count in removed.items():
+            self._add_stack_row(name, thickness, -count)
+        for (name, thickness), count in added.items():
+            self._add_stack_row(name, thickness, count)
+        phase_w = self.phase_w_out[self.support]
+        np.copyto(phase_w, self.stack_phase_w)
+        phase_w[self.stack_nan_count > 0] = np.nan
+        self.E_w_out = None
+        self.E_t_out = None
+        self.propagation_list = list(material_list)
+        self.stack_list = list(material_list)
+
+    def _add_stack_row(self, name, thickness, count):
+        k_w = self.get_k_w(name, compact=True)
+        nan_w = np.isnan(k_w)
+        self.stack_phase_w += np.where(nan_w, 0.0, k_w) * (thickness * count)
+        self.stack_nan_count += nan_w * count
+
+    def get_state_key(self, material_list=None):
+        """
+        Content address of a propagation result: a hash of the pulse parameters and the ordered
+        list of materials, thicknesses and material coefficients.
+
+        :param material_list: List of (name, thickness) tuples. If None the materials propagated
+                              since the pulse was generated or reset are used.
+        :return: Hex digest string
+        """
+        if material_list is None:
+            material_list = self.propagation_list
+        stack = [[name, float(thickness), self.materials[name].fingerprint()] for name, thickness in material_list]
+        return content_key(self.pulse_parameters, stack)
+
+    def propagate_material_batch(self, names, thicknesses, chunk_size=None):
+        """
+        Propagate the current pulse through many material stacks in one vectorized call. Each row
+        of the thickness matrix is one stack configuration, each column the thickness of the
+        corresponding material in names. The spectral fields are built as 2-D arrays and
+        transformed to the time domain with batched inverse FFTs, chunk_size configurations
+        at a time.
+
+        The output field A_w * exp(1j * (phi_w - sum_i L_i * k_i(w))) of an input field
+        A_w * exp(1j * phi_w) is calculated from half of its phase, which is one matrix product
+        with the input phase as an extra material of unit thickness, and the half angle formulas
+        (see _half_angle_field). That needs one tangent per point instead of a complex
+        exponential and a complex multiply.
+
+        The current pulse is not modified, so this can be called repeatedly on the same
+        input pulse. The returned fields are 2 * n_configs * N complex values of the field dtype.
+        The temporaries are five chunk_size * N real arrays, so with a chunk_size much smaller
+        than n_configs the memory use is close to that of the result.
+
+        :param names: List of material names (n_materials), matching keys in the materials dict.
+                      Unknown materials are skipped as in propagate_material.
+        :param thicknesses: Array of thicknesses (n_configs x n_materials, SI units). A 1-D array
+                            is taken as a single configuration.
+        :param chunk_size: Number of configurations calculated at a time. Default chunks of about
+                           64k points, so the temporaries stay in the CPU cache.
+        :return: Tuple (E_t_out, E_w_out) of stacked fields, shape (n_configs x N)
+        """
+        logger.debug("Entering propagate_material_batch {0}".format(names))
+        thicknesses = np.atleast_2d(np.asarray(thicknesses, dtype=np.double))
+        if thicknesses.shape[1] != len(names):
+            raise ValueError("Thickness matrix has {0} columns, expected {1} (one per material)".format(
+                thicknesses.shape[1], len(names)))
+        n_configs = thicknesses.shape[0]
+        s = self.support
+        m = self.w[s].shape[0]
+        if chunk_size is None:
+            chunk_size = max(2**16 // m, 1)
+        k_mat = np.zeros((len(names), m))
+        used = np.zeros(len(names), dtype=bool)
+        for ind, name in enumerate(names):
+            try:
+                k_mat[ind, :] = self.get_k_w(name, compact=True)
+                used[ind] = True
+            except KeyError:
+                logger.debug("Material {0} not found, skipping".format(name))
+        # Frequencies where any material is undefined are blocked, as in propagate_material
+        nan_ind = np.isnan(k_mat).any(axis=0)
+        E_w_in = self.E_w_out[s]
+        A_w = np.abs(E_w_in).astype(self.real_dtype)
+        A_w[nan_ind] = 0.0
+        k_half = 0.5 * np.vstack((k_mat[used, :], -np.angle(E_w_in)))
+        k_half[:, nan_ind] = 0.0
+        l_half = np.hstack((thicknesses[:, used], np.ones((n_configs, 1))))
+        n = self.N
+        # ifft(fftshift(x))[m] = exp(2j*pi*(n//2)*m/n) * ifft(x)[m], as in the workspace
+        shift_t = np.exp(2j * np.pi * (n // 2) * np.arange(n) / n).astype(self.dtype)
+        E_w_out = np.zeros((n_configs, n), dtype=self.dtype)
+        E_t_out = np.empty((n_configs, n), dtype=self.dtype)
+        ph_half = np.empty((chunk_size, m))
+        buffers = [np.empty((chunk_size, m))] + [np.empty((chunk_size, m), dtype=self.real_dtype) for b in range(3)]
+        for ind in range(0, n_configs, chunk_size):
+            c = slice(ind, ind + chunk_size)
+            rows = l_half[c].shape[0]
+            np.dot(l_half[c], k_half, out=ph_half[:rows])
+            self._half_angle_field(ph_half[:rows], A_w, E_w_out[c, s], [b[:rows] for b in buffers])
+            self.fft_backend.ifft(E_w_out[c], out=E_t_out[c])
+            E_t_out[c] *= shift_t
+        return E_t_out, E_w_out
+
+    @staticmethod
+    def _half_angle_field(ph_half, A_w, out, buffers):
+        """
+        Calculate A_w * exp(-2j * ph_half) into out with the half angle formulas
+        cos(2h) = (1 - t**2) / (1 + t**2), sin(2h) = 2 * t / (1 + t**2), t = tan(h). The phase is
+        reduced modulo pi in double precision first (ph_half is overwritten), then t is calculated
+        in the real dtype of the buffers.
+
+        :param ph_half: Half phase array (rad), double precision
+        :param A_w: Amplitude vector, broadcast along the rows of ph_half
+        :param out: Complex output array, same shape as ph_half
+        :param buffers: Four arrays of the shape of ph_half, the first double precision and the
+                        others of the real dtype of out
+        :return:
+        """
+        ph_n, t, t2, r = buffers
+        np.multiply(ph_half, 1 / np.pi, out=ph_n)
+        np.rint(ph_n, out=ph_n)
+        ph_n *= np.pi
+        ph_half -= ph_n
+        np.tan(ph_half, out=t, casting="same_kind")
+        np.multiply(t, t, out=t2)
+        np.add(t2, 1.0, out=r)
+        np.divide(A_w, r, out=r)
+        np.multiply(t, r, out=t)
+        np.multiply(t, -2.0, out=out.imag)
+        np.subtract(1.0, t2, out=t2)
+        np.multiply(t2, r, out=out.real)
+
+    def get_k_w(self, name, compact=False):
+        """
+        Calculate the wavenumber k(w) of a material on the current frequency grid.
+        NaN is returned outside the range where the material is defined.
+
+        The result is cached in k_cache and returned as a read-only array. It is always double
+        precision, independent of the field dtype. With a spectral support set only the support
+        is evaluated and cached.
+
+        :param name: String containing the name of the material (to match a key in the materials dict)
+        :param compact: If True return k on the spectral support only (w[self.support]),
+                        otherwise on the full grid with NaN outside the support
+        :return: Wavenumber vector (rad/m)
+        """
+        s = self.support
+        key = (name, self.N, self.t_span, self.l_0, s.start, s.stop)
+        k_w = self.k_cache.get(key)
+        if k_w is None:
+            w = self.w[s] + self.w_0
+            k_w = self.k_cache.put(key, w * self.evaluate_material(name, w) / self.c)
+        if compact is False and s != slice(None):
+            k_full = np.full(self.N, np.nan)
+            k_full[s] = k_w
+            return k_full
+        return k_w
+
+    def evaluate_material(self, name, w):
+        """
+        Refractive index of a material.
+
+        :param name: Material name
+        :param w: Angular frequency vector (rad/s)
+        :return: Refractive index vector, NaN outside the range of the material
+        """
+        return self.materials[name](w)
+
+    def unwrap(self, ph):
+        return unwrap_phase(ph)
+
+    def polyfit(self, x, y, deg):
+        return np.polyfit(x, y, deg)
 
     def reset_propagation(self):
         """
@@ -249,15 +973,26 @@ class DispersionCalculator(object):
         :return:
         """
         logger.debug("Entering reset_propagation")
-        self.E_w_out = self.E_w.copy()
-        self.E_t_out = self.E_t.copy()
+        if self.workspace is not None:
+            self.E_w_out = self.E_w
+            self.E_t_out = self.E_t
+            self.phase_w_out = self.workspace["phase_w_out"]
+            self.phase_w_out.fill(0.0)
+        else:
+            self.E_w_out = self.E_w.copy()
+            self.E_t_out = self.E_t.copy()
+            self.phase_w_out = np.zeros(self.w.shape[0])
+        self.propagation_list = []
+        self.stack_list = []
+        self.stack_phase_w = None
+        self.stack_nan_count = None
 
     def get_temporal_intensity(self, norm=True):
         logger.debug("Entering get_temporal_intensity")
         if self.E_t_out.size != 0:
             # Center peak in time
             ind = np.argmax(np.abs(self.E_t_out))
-            shift = (self.E_t_out.shape[0] / 2 - ind).astype(np.int)
+            shift = (self.E_t_out.shape[0] / 2 - ind).astype(int)
             I_t = np.abs(np.roll(self.E_t_out, shift))**2
             if norm is True:
                 I_t /= I_t.max()
@@ -272,22 +1007,12 @@ class DispersionCalculator(object):
         if self.E_t_out.size != 0:
             # Center peak in time
             ind = np.argmax(abs(self.E_t_out))
-            shift = self.E_t_out.shape[0] / 2 - ind
+            shift = self.E_t_out.shape[0] // 2 - ind
             E_t = np.roll(self.E_t_out, shift)
 
             # Unravelling 2*pi phase jumps
-            ph0_ind = np.int(E_t.shape[0] / 2)  # Center index
-            ph = np.angle(E_t)
-            ph_diff = np.diff(ph)
-            # We need to sample often enough that the difference in phase is less than 5 rad
-            # A larger jump is taken as a 2*pi phase jump
-            ph_ind = np.where(np.abs(ph_diff) > 5.0)
-            # Loop through the 2*pi phase jumps
-            for ind in ph_ind[0]:
-                if ph_diff[ind] < 0:
-                    ph[ind + 1:] += 2 * np.pi
-                else:
-                    ph[ind + 1:] -= 2 * np.pi
+            ph0_ind = int(E_t.shape[0] / 2)  # Center index
+            ph = self.unwrap(np.angle(E_t))
 
             # Find relevant portion of the pulse (intensity above a threshold value)
             ph0 = ph[ph0_ind]
@@ -301,7 +1026,7 @@ class DispersionCalculator(object):
             if linear_comp is True:
                 idx = np.isfinite(ph)
                 x = np.arange(E_t.shape[0])
-                ph_poly = np.polyfit(x[idx], ph[idx], 1)
+                ph_poly = self.polyfit(x[idx], ph[idx], 1)
                 ph_out = ph - np.polyval(ph_poly, x)
             else:
                 ph_out = ph - ph0
@@ -309,12 +1034,69 @@ class DispersionCalculator(object):
             ph_out = None
         return ph_out
 
+    def get_temporal_center(self):
+        """
+        Center of the propagated pulse in time, calculated from E_w_out as the weighted circular
+        mean of the group delay, so no inverse FFT is needed.
+
+        :return: Time from the start of the time window (the first sample of E_t_out), 0 to t_span
+        """
+        s = self.support
+        E_w = self.E_w_out[s]
+        dw = self.w[1] - self.w[0]
+        z = np.sum(E_w[1:] * np.conj(E_w[:-1]))
+        return (-np.angle(z) / dw) % (2 * np.pi / dw)
+
+    def get_temporal_field_zoom(self, t_window=None, n=1024, t_center=None):
+        """
+        Propagated temporal field on n points over a time window of width t_window, calculated
+        from E_w_out with a chirp-z transform. The time resolution t_window / n is independent
+        of the grid, and the cost is a few FFTs of length n plus the number of spectral points
+        (the spectral support if set), instead of an inverse FFT of the full grid.
+
+        The field at time tau from the start of the time window is
+        E(tau) = sum_k E_w_out[k] * exp(1j * w_k * tau) / N, which equals E_t_out at the grid points.
+
+        :param t_window: Width of the time window (s). Default 8 times the RMS duration, at most t_span.
+        :param n: Number of points
+        :param t_center: Center of the window, time from the start of the time window (s).
+                         Default the pulse center, see get_temporal_center.
+        :return: Tuple (t, E_t), t relative to the window center
+        """
+        logger.debug("Entering get_temporal_field_zoom")
+        s = self.support
+        E_w = self.E_w_out[s]
+        w = self.w[s]
+        dw = self.w[1] - self.w[0]
+        if t_center is None:
+            t_center = self.get_temporal_center()
+        if t_window is None:
+            t_window = min(8 * get_rms_duration_spectral(E_w, w), self.t_span)
+        dt = t_window / n
+        t = (np.arange(n) - n // 2) * dt
+        tau = t_center + t
+        E_t = czt(E_w, n, np.exp(1j * dw * dt), np.exp(-1j * dw * tau[0]))
+        E_t *= np.exp(1j * w[0] * tau) / self.N
+        return t, E_t.astype(self.dtype, copy=False)
+
+    def get_temporal_intensity_zoom(self, t_window=None, n=1024, norm=True):
+        """
+        Temporal intensity on a zoomed time window, see get_temporal_field_zoom.
+
+        :return: Tuple (t, I_t), t relative to the pulse center
+        """
+        t, E_t = self.get_temporal_field_zoom(t_window, n)
+        I_t = np.abs(E_t)**2
+        if norm is True:
+            I_t /= I_t.max()
+        return t, I_t
+
     def get_spectral_intensity(self, norm=True):
         logger.debug("Entering get_spectral_intensity")
         if self.E_w_out.size != 0:
             # Center peak in time
             ind = np.argmax(abs(self.E_w_out))
-            shift = (self.E_w_out.shape[0] / 2 - ind).astype(np.int)
+            shift = (self.E_w_out.shape[0] / 2 - ind).astype(int)
             I_w = np.abs(np.roll(self.E_w_out, shift))**2
             if norm is True:
                 I_w /= I_w.max()
@@ -337,45 +1119,35 @@ class DispersionCalculator(object):
         # Check if there is a reconstructed field:
         if self.E_t_out is not None:
 
-            # Center peak in time
+            # Center peak in time. Rolling E_t_out by -ind is a linear spectral phase, applied
+            # directly to E_w_out on the spectral support instead of transforming E_t_out.
             ind = np.argmax(abs(self.E_t_out))
-            shift = - ind
-            E_t = np.roll(self.E_t_out, shift)
-            Ew = np.fft.fftshift(np.fft.fft(E_t))
+            s = self.support
+            w = self.w[s]
+            Ew = self.E_w_out[s] * np.exp(1j * w * (ind * self.dt))
 
             # Normalize
-            Ew /= abs(Ew).max()
+            Ew_mag = np.abs(Ew)
+            Ew_mag /= Ew_mag.max()
 
             # Unravelling 2*pi phase jumps
-            ph0_ind = np.argmax(abs(Ew))
-            ph = np.angle(Ew)
-            ph_diff = np.diff(ph)
-            # We need to sample often enough that the difference in phase is less than 5 rad
-            # A larger jump is taken as a 2*pi phase jump
-            ph_ind = np.where(np.abs(ph_diff) > 5.0)
-            # Loop through the 2*pi phase jumps
-            for ind in ph_ind[0]:
-                if ph_diff[ind] < 0:
-                    ph[ind + 1:] += 2 * np.pi
-                else:
-                    ph[ind + 1:] -= 2 * np.pi
+            ph0_ind = np.argmax(Ew_mag)
+            ph = self.unwrap(np.angle(Ew))
 
             # Find relevant portion of the pulse (intensity above a threshold value)
-            Ew_mag = np.abs(Ew)
-            low_ind = np.where(Ew_mag < eps)
-            ph[low_ind] = np.nan
+            ph[Ew_mag < eps] = np.nan
 
             # Here we could go through contiguous regions and make the phase connect at the edges...
 
             # Linear compensation is we have a frequency shift (remove 1st order phase)
             if linear_comp is True:
                 idx = np.isfinite(ph)
-                x = np.arange(Ew.shape[0])
-                ph_poly = np.polyfit(x[idx], ph[idx], 1)
-                ph_out = ph - np.polyval(ph_poly, x)
-            else:
-                ph_out = ph
-            ph_out -= ph_out[ph0_ind]
+                x = np.arange(self.N)[s]
+                ph_poly = self.polyfit(x[idx], ph[idx], 1)
+                ph -= np.polyval(ph_poly, x)
+            ph -= ph[ph0_ind]
+            ph_out = np.full(self.N, np.nan)
+            ph_out[s] = ph
         else:
             ph_out = None
         return ph_out
@@ -383,10 +1155,18 @@ class DispersionCalculator(object):
     def get_spectral_phase_expansion(self, orders=4, prefix=1e12):
         """
         Calculate a polynomial fit to the retrieved phase curve as function of angular frequency (spectral phase)
+        The result is stored in the disk cache if one is set.
+
         :param orders: Number of orders to include in the fit
         :param prefix: Factor that the angular frequency is scaled with before the fit (1e12 => Trad)
         :return: Polynomial coefficients, highest order first
         """
+        key = None
+        if self.disk_cache is not None:
+            key = content_key(self.get_state_key(), "spectral_phase_expansion", orders, prefix, self.phase_thr)
+            data = self.disk_cache.get(key)
+            if data is not None:
+                return data["ph_poly"]
         if self.E_t_out is not None:
             # w = self.w
             # w = self.w + self.w_0
@@ -395,37 +1175,302 @@ class DispersionCalculator(object):
             ph_ind = np.isfinite(ph)
             ph_good = ph[ph_ind]
             w_good = w[ph_ind] / prefix
-            ph_poly = np.polyfit(w_good, ph_good, orders)
+            ph_poly = self.polyfit(w_good, ph_good, orders)
+            if key is not None:
+                self.disk_cache.put(key, ph_poly=ph_poly)
         else:
             ph_poly = None
         return ph_poly
 
-    def get_pulse_duration(self, domain='temporal'):
+    def get_dispersion(self, material_list=None, l_0=None, orders=4, per_material=False, use_tables=True):
+        """
+        Calculate group delay and higher order dispersion of a material stack directly from the
+        derivatives of k(w) at the central frequency, times the thicknesses, summed over the stack.
+        No pulse is propagated, so the result is independent of N, t_span and phase_thr.
+
+        With use_tables the derivatives are looked up in the spline dispersion tables of the
+        material registry (see DispersionTable), built the first time a material is used.
+        Otherwise, or for orders above 4, they are evaluated from the dispersion formula.
+
+        The n:th element is d^n(k*L)/dw^n, i.e. GD (s), GDD (s^2), TOD (s^3), FOD (s^4) for
+        n = 1..4. The corresponding spectral phase expansion coefficient of the propagated pulse
+        is -d^n(k*L)/dw^n / n!.
+
+        :param material_list: List of (name, thickness) tuples. If None the materials propagated
+                              since the pulse was generated or reset are used. Unknown materials
+                              are skipped.
+        :param l_0: Central wavelength or vector of central wavelengths. If None the pulse central
+                    wavelength is used.
+        :param orders: Highest dispersion order
+        :param per_material: If True, return the contribution of each material instead of the sum
+        :param use_tables: If True use the dispersion tables for orders up to 4
+        :return: Array [GD, GDD, TOD, FOD, ..] of length orders. With a vector l_0 the shape is
+                 (len(l_0) x orders). With per_material a leading axis of length len(material_list)
+                 is added.
+        """
+        logger.debug("Entering get_dispersion")
+        if material_list is None:
+            material_list = self.propagation_list
+        if l_0 is None:
+            l_0 = self.l_0
+        w_0 = 2 * np.pi * self.c / np.atleast_1d(np.asarray(l_0, dtype=np.double))
+        disp = np.zeros((len(material_list), w_0.shape[0], orders))
+        for ind, (name, thickness) in enumerate(material_list):
+            if name not in self.materials:
+                logger.debug("Material {0} not found, skipping".format(name))
+                continue
+            disp[ind] = self.get_k_derivatives(name, w_0, orders, use_tables)[:, 1:] * thickness
+        if per_material is False:
+            disp = disp.sum(axis=0)
+        if np.ndim(l_0) == 0:
+            disp = disp[..., 0, :]
+        return disp
+
+    def _get_thickness_problem(self, material_list, fixed=None, bounds=None, max_total_thickness=None):
         """
-        Calculate pulse parameters such as intensity FWHM.
+        Split a material stack into free and fixed thicknesses for the thickness optimizers.
+
+        :param material_list: List of (name, thickness) tuples
+        :param fixed: Indices into material_list or material names that are kept at their thickness
+        :param bounds: List of (min, max) thickness per material, None for no limit. Thicknesses
+                       are never negative.
+        :param max_total_thickness: Upper limit of the total stack thickness, fixed materials included
+        :return: Tuple (material_list, free indices, start thicknesses, bounds, constraints) for
+                 the free materials, in mm
+        :raises ValueError: If a material is unknown or bounds does not have one entry per material
+        """
+        material_list = [(name, thickness) for name, thickness in material_list]
+        unknown = [name for name, thickness in material_list if name not in self.materials]
+        if len(unknown) > 0:
+            raise ValueError("Unknown materials {0}".format(unknown))
+        if bounds is not None and len(bounds) != len(material_list):
+            raise ValueError("{0} bounds for {1} materials".format(len(bounds), len(material_list)))
+        if fixed is None:
+            fixed = []
+        free_ind = [ind for ind, (name, thickness) in enumerate(material_list)
+                    if ind not in fixed and name not in fixed]
+        if bounds is None:
+            bounds = [(None, None)] * len(material_list)
+        free_bounds = []
+        for ind in free_ind:
+            l_min, l_max = bounds[ind]
+            l_min = 0.0 if l_min is None else max(l_min, 0.0) * 1e3
+            l_max = None if l_max is None else l_max * 1e3
+            free_bounds.append((l_min, l_max))
+        x0 = np.array([material_list[ind][1] * 1e3 for ind in free_ind])
+        x0 = np.clip(x0, [b[0] for b in free_bounds], [np.inf if b[1] is None else b[1] for b in free_bounds])
+        constraints = []
+        if max_total_thickness is not None:
+            budget = (max_total_thickness - sum([thickness for ind, (name, thickness) in enumerate(material_list)
+                                                 if ind not in free_ind])) * 1e3
+            constraints.append({"type": "ineq", "fun": lambda x: budget - np.sum(x),
+                                "jac": lambda x: -np.ones_like(x)})
+        return material_list, free_ind, x0, free_bounds, constraints
+
+    @staticmethod
+    def _minimize_quadratic(Q, c, v0, x0, bounds, constraints):
+        """
+        Minimize x.Q.x + 2*c.x + v0 with SLSQP using the analytic gradient.
+
+        :return: scipy OptimizeResult
+        """
+        def fun(x):
+            return np.dot(x, np.dot(Q, x)) + 2 * np.dot(c, x) + v0
+
+        def jac(x):
+            return 2 * (np.dot(Q, x) + c)
+
+        if x0.shape[0] == 0:
+            return OptimizeResult(x=x0, fun=v0, success=True, message="No free materials", nit=0)
+        return minimize(fun, x0, jac=jac, bounds=bounds, constraints=constraints, method="SLSQP",
+                        options={"maxiter": 200, "ftol": 1e-12})
+
+    def _set_thicknesses(self, material_list, free_ind, x):
+        material_list = list(material_list)
+        for ind, thickness in zip(free_ind, x):
+            material_list[ind] = (material_list[ind][0], float(thickness) * 1e-3)
+        return material_list
+
+    def optimize_duration(self, material_list, fixed=None, bounds=None, max_total_thickness=None):
+        """
+        Find the material thicknesses that minimize the RMS duration of the current pulse after
+        propagation through a material stack.
+
+        The RMS duration squared is the transform limited RMS duration squared plus the
+        spectrally weighted variance of the group delay d(phase_w_out)/dw + sum_i L_i*dk_i/dw,
+        where phase_w_out includes the spectral phase of the input pulse (e.g. a measured
+        spectrum with phase, see set_pulse_spectrum).
+        This is quadratic in the thicknesses L_i, so it is reduced once to a small matrix
+        problem and the iterations need no FFT and no operations on the N point grid.
+        The pulse is not propagated, use propagate_stack with the returned material list.
+
+        :param material_list: List of (name, thickness) tuples. The thicknesses are the starting point.
+                              Unknown materials raise a ValueError, since the fixed indices and
+                              bounds refer to this list.
+        :param fixed: Indices into material_list or material names that are kept at their thickness
+        :param bounds: List of (min, max) thickness per material, None for no limit. Thicknesses
+                       are never negative.
+        :param max_total_thickness: Upper limit of the total stack thickness, fixed materials included
+        :return: Dict with material_list (optimized), duration_rms (s), duration_rms_tl (transform
+                 limited RMS duration, s), success, message and iterations
+        """
+        logger.debug("Entering optimize_duration {0}".format(material_list))
+        material_list, free_ind, x0, free_bounds, constraints = self._get_thickness_problem(
+            material_list, fixed, bounds, max_total_thickness)
+        w = self.w
+        # The input field is E_w = A_w * exp(1j * phi_w) and the materials add -k*L, so phi_w counts
+        # as -phi_w in phase_w_out. phi_w is summed from the phase steps between samples relative to
+        # their mean, which removes the linear phase and needs no unwrapping.
+        prod = self.E_w[1:] * np.conj(self.E_w[:-1])
+        z = np.sum(prod)
+        if np.abs(z) > 0:
+            prod *= np.conj(z) / np.abs(z)
+        phi_w = np.concatenate(([0.0], np.cumsum(np.angle(prod).astype(np.double))))
+        ph_w = self.phase_w_out - phi_w
+        for ind, (name, thickness) in enumerate(material_list):
+            if ind not in free_ind:
+                ph_w += self.get_k_w(name) * thickness
+        gd_mat = np.zeros((len(free_ind), w.shape[0]))
+        for row, ind in enumerate(free_ind):
+            k_w = self.get_k_w(material_list[ind][0])
+            gd_mat[row, :] = np.gradient(k_w, w) * 1e-3
+        # Frequencies blocked by any material (NaN k) carry no energy
+        A_w = np.abs(self.E_w).astype(np.double)
+        good = np.isfinite(ph_w) & np.all(np.isfinite(gd_mat), axis=0)
+        A_w[~good] = 0.0
+        p_w = A_w**2 / np.sum(A_w**2)
+        gd_w = np.where(good, np.gradient(np.where(good, ph_w, 0.0), w), 0.0)
+        gd_mat[:, ~good] = 0.0
+        gd_w -= np.sum(p_w * gd_w)
+        gd_mat -= np.sum(p_w * gd_mat, axis=1)[:, np.newaxis]
+        var_tl = np.sum(np.gradient(A_w, w)**2) / np.sum(A_w**2)
+        # Normalize to the transform limited variance
+        Q = np.dot(gd_mat * p_w, gd_mat.T) / var_tl
+        c = np.dot(gd_mat, p_w * gd_w) / var_tl
+        v0 = np.sum(p_w * gd_w**2) / var_tl
+        res = self._minimize_quadratic(Q, c, v0, x0, free_bounds, constraints)
+        result = {"material_list": self._set_thicknesses(material_list, free_ind, res.x),
+                  "duration_rms": np.sqrt(var_tl * (1 + max(res.fun, 0.0))), "duration_rms_tl": np.sqrt(var_tl),
+                  "success": res.success, "message": res.message, "iterations": res.nit}
+        logger.debug("Optimized stack {0}".format(result))
+        return result
+
+    def optimize_dispersion(self, material_list, target=(0.0, 0.0), orders=(2, 3), fixed=None, bounds=None,
+                            max_total_thickness=None, include_propagated=True):
+        """
+        Find the material thicknesses that give a target dispersion, e.g. GDD and TOD, in the least
+        squares sense. The dispersion is linear in the thicknesses (see get_dispersion), so no pulse
+        is propagated.
+
+        :param material_list: List of (name, thickness) tuples. The thicknesses are the starting point.
+                              Unknown materials raise a ValueError, since the fixed indices and
+                              bounds refer to this list.
+        :param target: Target dispersion for each of orders (s^n)
+        :param orders: Dispersion orders to match, 1 = GD, 2 = GDD, 3 = TOD, 4 = FOD
+        :param fixed: Indices into material_list or material names that are kept at their thickness
+        :param bounds: List of (min, max) thickness per material, None for no limit. Thicknesses
+                       are never negative.
+        :param max_total_thickness: Upper limit of the total stack thickness, fixed materials included
+        :param include_propagated: If True the dispersion of the materials already propagated is included,
+                                   so the target is the total dispersion of the pulse
+        :return: Dict with material_list (optimized), dispersion ([GD, GDD, TOD, FOD] of the result),
+                 success, message and iterations
+        """
+        logger.debug("Entering optimize_dispersion {0}".format(material_list))
+        material_list, free_ind, x0, free_bounds, constraints = self._get_thickness_problem(
+            material_list, fixed, bounds, max_total_thickness)
+        max_order = max(orders)
+        ord_ind = np.array(orders) - 1
+        unit_list = [(name, 1e-3) for name, thickness in material_list]
+        disp_mat = self.get_dispersion(unit_list, orders=max_order, per_material=True)[:, ord_ind].T
+        fixed_list = [material_list[ind] for ind in range(len(material_list)) if ind not in free_ind]
+        if include_propagated is True:
+            fixed_list = self.propagation_list + fixed_list
+        b = np.array(target, dtype=np.double) - self.get_dispersion(fixed_list, orders=max_order)[ord_ind]
+        A = disp_mat[:, free_ind]
+        # Scale each order to its target or to the dispersion of 1 mm of material
+        scale = np.maximum(np.abs(b), np.abs(disp_mat).max(axis=1, initial=0.0))
+        scale[scale == 0] = 1.0
+        A = A / scale[:, np.newaxis]
+        b = b / scale
+        res = self._minimize_quadratic(np.dot(A.T, A), -np.dot(A.T, b), np.dot(b, b), x0, free_bounds, constraints)
+        result_list = self._set_thicknesses(material_list, free_ind, res.x)
+        full_list = self.propagation_list + result_list if include_propagated is True else result_list
+        result = {"material_list": result_list, "dispersion": self.get_dispersion(full_list),
+                  "success": res.success, "message": res.message, "iterations": res.nit}
+        logger.debug("Optimized stack {0}".format(result))
+        return result
+
+    def get_k_derivatives(self, name, w, orders=4, use_tables=True):
+        """
+        Wavenumber derivatives d^n k / dw^n of a material, from the dispersion table if possible.
+
+        :param name: Material name
+        :param w: Angular frequency vector (rad/s)
+        :param orders: Highest derivative order
+        :param use_tables: If True use the dispersion table for orders up to 4
+        :return: Array (len(w) x orders+1) of d^n k / dw^n (s^n/m), n = 0..orders
+        """
+        if use_tables is True and orders <= DispersionTable.orders:
+            try:
+                return self.materials.get_dispersion_table(name).get_k_derivatives(w, orders)
+            except ValueError:
+                logger.debug("No dispersion table for {0}".format(name))
+        return self.materials[name].get_k_derivatives(w, orders)
+
+    def get_material_dispersion(self, name, l=None):
+        """
+        Dispersion curves of a material from its dispersion table, e.g. for plotting.
+
+        :param name: Material name
+        :param l: Wavelength vector (m). If None l_mat is used.
+        :return: Dict with n, n_g (group index), gvd (s^2/m), tod (s^3/m) and fod (s^4/m)
+        """
+        if l is None:
+            l = self.l_mat
+        return self.materials.get_dispersion_table(name).get_dispersion_curves(l)
+
+    def get_pulse_duration(self, domain='temporal', zoom_points=None):
+        """
+        Calculate pulse parameters such as intensity FWHM. The half maximum crossings are
+        interpolated between the samples.
         :param domain: 'temporal' for time domain parameters,
                      'spectral' for frequency domain parameters
+        :param zoom_points: If set, the temporal FWHM is found on a zoomed window around the pulse
+                            with this number of points (see get_temporal_field_zoom) instead of E_t_out.
+                            Falls back to E_t_out if the pulse does not fit in the window.
         :return:
         trace_fwhm: full width at half maximum of the intensity trace (E-field squared)
         delta_ph: phase difference (max-min) of the phase trace
         """
         logger.debug("Entering get_pulse_duration")
+        # FWHM with the half maximum crossings interpolated between samples
         if domain == 'temporal':
-            I = self.get_temporal_intensity(True)
-            x = self.get_t()
-        else:
-            I = self.get_spectral_intensity(True)
-            x = self.get_w()
-
-        # Calculate FWHM
-        x_ind = np.where(np.diff(np.sign(I - 0.5)))[0]
-        if x_ind.shape[0] > 1:
-            trace_fwhm = x[x_ind[-1]] - x[x_ind[0]]
-        else:
             trace_fwhm = np.nan
+            if zoom_points is not None:
+                t, E_t = self.get_temporal_field_zoom(n=zoom_points)
+                trace_fwhm = get_fwhm(np.abs(E_t)**2, t)
+            if not np.isfinite(trace_fwhm):
+                trace_fwhm = get_fwhm(np.abs(self.E_t_out)**2, self.get_t(), periodic=True)
+        else:
+            trace_fwhm = get_fwhm(np.abs(self.E_w_out)**2, self.get_w())
         logger.debug("t_fwhm: {0}".format(trace_fwhm))
         return trace_fwhm
 
+    def get_pulse_metrics(self, temporal=True):
+        """
+        Calculate pulse metrics of the propagated pulse, see dispersion_metrics.get_pulse_metrics.
+        The RMS duration and the spectral metrics are calculated from E_w_out only, so with
+        temporal=False and lazy propagation no inverse FFT is done.
+
+        :param temporal: If True also calculate the FWHM duration and Strehl ratio from E_t_out
+        :return: Dict of metrics
+        """
+        logger.debug("Entering get_pulse_metrics")
+        if temporal is True:
+            return get_pulse_metrics(self.E_w_out, self.get_w(), self.E_t_out, self.get_t())
+        return get_pulse_metrics(self.E_w_out, self.get_w())
+
     def get_t(self):
         return self.t
 
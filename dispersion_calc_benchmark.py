@@ -0,0 +1,339 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Benchmarks for the dispersion calculator.
+
+The benchmark suite times the hot paths of DispersionCalculator over a range of grid sizes and
+records the memory high-water mark of each call. Results are saved as JSON so runs on two commits
+can be compared:
+
+    python dispersion_calc_benchmark.py suite -o base.json
+    (change the code)
+    python dispersion_calc_benchmark.py suite -o new.json
+    python dispersion_calc_benchmark.py compare base.json new.json
+
+Without arguments the unwrapping, batch propagation and precision checks are run.
+"""
+
+from dispersion_calc import DispersionCalculator, unwrap_phase
+from dispersion_materials import MaterialRegistry
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+suite_stack = [("fs", 2e-3), ("bk7", 2e-3), ("sf10", 1e-3), ("caf2", 2e-3), ("sapphire_o", 1e-3),
+               ("sf11", 1e-3), ("baf10", 1e-3), ("bak4", 1e-3), ("k5", 1e-3), ("sf5", 1e-3)]
+
+
+def unwrap_phase_loop(ph, threshold=5.0):
+    """
+    Reference phase unwrapping, stepping through the 2*pi jumps one at a time.
+
+    :param ph: Phase vector (rad)
+    :param threshold: Phase difference between samples that is taken as a 2*pi jump
+    :return: Unwrapped phase vector
+    """
+    ph = ph.copy()
+    ph_diff = np.diff(ph)
+    ph_ind = np.where(np.abs(ph_diff) > threshold)
+    for ind in ph_ind[0]:
+        if ph_diff[ind] < 0:
+            ph[ind + 1:] += 2 * np.pi
+        else:
+            ph[ind + 1:] -= 2 * np.pi
+    return ph
+
+
+def time_function(f, repeats=5, setup=None):
+    """
+    Best of repeats wall time for calling f.
+
+    :param f: Function without arguments
+    :param repeats: Number of calls
+    :param setup: Function without arguments called before each call of f, not timed
+    :return: Minimum time (s)
+    """
+    t_min = np.inf
+    for r in range(repeats):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        f()
+        t_min = min(t_min, time.perf_counter() - t0)
+    return t_min
+
+
+def benchmark_unwrap(n=65536, material="bk7", thickness=100e-3, t_fwhm=50e-15, l_0=800e-9, t_span=20e-12,
+                     repeats=5):
+    """
+    Compare the loop and cumulative sum phase unwrapping on the temporal and spectral phase of
+    a pulse propagated through a thick material.
+
+    :return: Dict of domain: (number of jumps, loop time, cumsum time)
+    """
+    dc = DispersionCalculator(t_fwhm, l_0, t_span)
+    dc.generate_pulse(t_fwhm, l_0, t_span, n)
+    dc.propagate_material(material, thickness)
+    E_t = dc.E_t_out
+    fields = {"temporal": E_t,
+              "spectral": np.fft.fftshift(np.fft.fft(np.roll(E_t, -np.argmax(np.abs(E_t)))))}
+    result = {}
+    for domain, field in fields.items():
+        ph = np.angle(field)
+        n_jumps = np.sum(np.abs(np.diff(ph)) > 5.0)
+        t_loop = time_function(lambda: unwrap_phase_loop(ph), repeats)
+        t_cumsum = time_function(lambda: unwrap_phase(ph), repeats)
+        if not np.allclose(unwrap_phase_loop(ph), unwrap_phase(ph)):
+            raise ValueError("Unwrapped phases differ in the {0} domain".format(domain))
+        result[domain] = (n_jumps, t_loop, t_cumsum)
+        print("{0} mm {1}, N={2}, {3} phase: {4} jumps, loop {5:.2f} ms, cumsum {6:.2f} ms, "
+              "speedup {7:.1f}".format(thickness * 1e3, material, n, domain, n_jumps, t_loop * 1e3,
+                                       t_cumsum * 1e3, t_loop / t_cumsum))
+    return result
+
+
+def benchmark_batch(n=16384, n_configs=200, names=("fs", "bk7", "sf10"), max_thickness=10e-3, t_fwhm=50e-15,
+                    l_0=800e-9, t_span=20e-12, repeats=3):
+    """
+    Compare propagate_material_batch to a loop of propagate_material calls over the same
+    thickness configurations.
+
+    :return: Tuple (loop time, batch time) (s)
+    """
+    dc = DispersionCalculator(t_fwhm, l_0, t_span)
+    dc.generate_pulse(t_fwhm, l_0, t_span, n)
+    thicknesses = np.random.RandomState(0).uniform(0, max_thickness, (n_configs, len(names)))
+
+    def loop():
+        for row in thicknesses:
+            dc.reset_propagation()
+            for name, thickness in zip(names, row):
+                dc.propagate_material(name, thickness)
+    t_loop = time_function(loop, repeats)
+    t_batch = time_function(lambda: dc.propagate_material_batch(names, thicknesses), repeats)
+    print("{0} configs x {1} materials, N={2}: loop {3:.1f} ms, batch {4:.1f} ms, speedup {5:.1f}".format(
+        n_configs, len(names), n, t_loop * 1e3, t_batch * 1e3, t_loop / t_batch))
+    return t_loop, t_batch
+
+
+def compare_precision(n=65536, thickness=10e-3, t_fwhm=50e-15, l_0=800e-9, t_span=20e-12, tolerance=1e-3,
+                      repeats=5):
+    """
+    Propagate a pulse through each shipped material in double and single precision and compare
+    the temporal intensity and FWHM duration. Raises ValueError if the single precision
+    result differs by more than tolerance (relative to the peak intensity and to the duration).
+
+    :return: Dict of material: (intensity error, duration error)
+    """
+    dc64 = DispersionCalculator(t_fwhm, l_0, t_span)
+    dc64.generate_pulse(t_fwhm, l_0, t_span, n)
+    dc32 = DispersionCalculator(t_fwhm, l_0, t_span, dtype=np.complex64)
+    dc32.generate_pulse(t_fwhm, l_0, t_span, n)
+    result = {}
+    for material in sorted(dc64.materials.keys()):
+        timings = []
+        for dc in (dc64, dc32):
+            dc.reset_propagation()
+            dc.propagate_material(material, thickness)
+
+            def propagate():
+                dc.reset_propagation()
+                dc.propagate_material(material, thickness)
+            timings.append(time_function(propagate, repeats))
+        I_64 = dc64.get_temporal_intensity(True)
+        I_32 = dc32.get_temporal_intensity(True)
+        i_error = np.abs(I_64 - I_32).max()
+        t_64 = dc64.get_pulse_duration()
+        t_32 = dc32.get_pulse_duration()
+        t_error = np.abs(t_64 - t_32) / t_64
+        if not (i_error <= tolerance and t_error <= tolerance):
+            raise ValueError("Single precision error too large for {0}: intensity {1:.2e}, "
+                             "duration {2:.2e}".format(material, i_error, t_error))
+        result[material] = (i_error, t_error)
+        print("{0} mm {1}, N={2}: intensity error {3:.2e}, duration error {4:.2e}, "
+              "complex128 {5:.2f} ms, complex64 {6:.2f} ms".format(thickness * 1e3, material, n, i_error, t_error,
+                                                                  timings[0] * 1e3, timings[1] * 1e3))
+    return result
+
+
+def measure(f, setup=None, repeats=5):
+    """
+    Best of repeats wall time and memory high-water mark of calling f. The memory is the peak of
+    the memory allocated during the call (traced with tracemalloc, which includes numpy arrays),
+    measured in a separate call since tracing slows down the call.
+
+    :param f: Function without arguments
+    :param setup: Function without arguments called before each call of f, not timed
+    :param repeats: Number of timed calls
+    :return: Tuple (minimum time (s), peak memory (bytes))
+    """
+    t_min = time_function(f, repeats, setup)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        f()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return t_min, peak
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_suite(n_list=None, repeats=5, t_fwhm=50e-15, l_0=800e-9, t_span=20e-12, stack=None):
+    """
+    Time the DispersionCalculator hot paths: construction (including indexing the materials),
+    material loading (a new registry with every material looked up, from the binary catalogue and
+    from the xml files), generate_pulse, propagate_material through one material (with an empty and
+    a filled k(w) cache), propagate_stack through a 10 material stack, propagate_material_batch
+    and the equivalent propagate_material loop (2**20 / N configurations of the first three stack
+    materials), get_spectral_phase, get_spectral_phase_expansion and get_pulse_duration, for each
+    grid size in n_list.
+
+    :param n_list: Grid sizes, default 2**12 to 2**20
+    :param repeats: Number of timed calls per benchmark, the best time is kept
+    :param stack: Material stack, list of (name, thickness), default suite_stack
+    :return: Dict with meta (commit, versions, parameters) and benchmarks, a dict of
+             'name[N=n]': {name, n, time (s), peak_memory (bytes)}
+    """
+    if n_list is None:
+        n_list = [2**p for p in range(12, 21)]
+    if stack is None:
+        stack = suite_stack
+    results = {"meta": {"commit": get_git_commit(), "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                        "python": platform.python_version(), "numpy": np.__version__,
+                        "platform": platform.platform(), "repeats": repeats, "stack": [list(s) for s in stack]},
+               "benchmarks": {}}
+
+    def add(name, n, f, setup=None):
+        t_min, peak = measure(f, setup, repeats)
+        key = "{0}[N={1}]".format(name, n) if n is not None else name
+        results["benchmarks"][key] = {"name": name, "n": n, "time": t_min, "peak_memory": peak}
+        print("{0:45s} {1:10.3f} ms {2:10.2f} MB".format(key, t_min * 1e3, peak * 1e-6))
+
+    dc = DispersionCalculator(t_fwhm, l_0, t_span)
+    add("init", None, lambda: DispersionCalculator(t_fwhm, l_0, t_span))
+
+    def load_materials(use_catalogue):
+        # A cold registry with every material looked up, so the files or catalogue records are parsed
+        dc.materials = MaterialRegistry(use_catalogue=use_catalogue)
+        dc.generate_materials_dict()
+        for name in list(dc.materials.keys()):
+            dc.materials[name]
+    add("load_materials", None, lambda: load_materials(True))
+    add("load_materials_xml", None, lambda: load_materials(False))
+    dc.k_cache.clear()
+    material = stack[0]
+
+    def reset_cold():
+        dc.reset_propagation()
+        dc.k_cache.clear()
+
+    for n in n_list:
+        add("generate_pulse", n, lambda: dc.generate_pulse(t_fwhm, l_0, t_span, n))
+        add("propagate_material", n, lambda: dc.propagate_material(*material), reset_cold)
+        add("propagate_material_cached", n, lambda: dc.propagate_material(*material), dc.reset_propagation)
+        add("propagate_stack", n, lambda: dc.propagate_stack(stack), reset_cold)
+        # The same configurations in a propagate_material loop and in one batch call, 2**20 points in total
+        batch_names = [name for name, thickness in stack[:3]]
+        batch_thicknesses = np.outer(np.linspace(0.5, 1.5, max(2**20 // n, 1)),
+                                     [thickness for name, thickness in stack[:3]])
+
+        def propagate_loop():
+            for row in batch_thicknesses:
+                dc.reset_propagation()
+                for name, thickness in zip(batch_names, row):
+                    dc.propagate_material(name, thickness)
+        add("propagate_material_loop", n, propagate_loop)
+        add("propagate_material_batch", n, lambda: dc.propagate_material_batch(batch_names, batch_thicknesses))
+        dc.reset_propagation()
+        dc.propagate_stack(stack)
+        add("get_spectral_phase", n, dc.get_spectral_phase)
+        add("get_spectral_phase_expansion", n, dc.get_spectral_phase_expansion)
+        add("get_pulse_duration", n, dc.get_pulse_duration)
+    return results
+
+
+def save_results(results, filename):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=1)
+
+
+def load_results(filename):
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+def compare_results(base, new, threshold=0.2, memory_threshold=0.1):
+    """
+    Compare two benchmark suite results and flag regressions, benchmarks where the new time or
+    peak memory exceeds the base by more than the relative threshold.
+
+    :param base: Base results, from benchmark_suite or load_results
+    :param new: New results
+    :param threshold: Relative time increase flagged as a regression
+    :param memory_threshold: Relative peak memory increase flagged as a regression
+    :return: List of (benchmark, quantity, base value, new value) for the regressions
+    """
+    regressions = []
+    print("Comparing {0} to {1}".format(base["meta"].get("commit"), new["meta"].get("commit")))
+    print("{0:45s} {1:>12s} {2:>12s} {3:>8s} {4:>10s}".format("benchmark", "base (ms)", "new (ms)", "ratio",
+                                                                "memory"))
+    for key, b in base["benchmarks"].items():
+        r = new["benchmarks"].get(key)
+        if r is None:
+            continue
+        time_ratio = r["time"] / b["time"]
+        memory_ratio = r["peak_memory"] / b["peak_memory"] if b["peak_memory"] > 0 else 1.0
+        flag = ""
+        if time_ratio > 1 + threshold:
+            regressions.append((key, "time", b["time"], r["time"]))
+            flag += " SLOWER"
+        if memory_ratio > 1 + memory_threshold:
+            regressions.append((key, "peak_memory", b["peak_memory"], r["peak_memory"]))
+            flag += " MORE MEMORY"
+        print("{0:45s} {1:12.3f} {2:12.3f} {3:8.2f} {4:10.2f}{5}".format(key, b["time"] * 1e3, r["time"] * 1e3,
+                                                                          time_ratio, memory_ratio, flag))
+    print("{0} regressions".format(len(regressions)))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dispersion calculator benchmarks")
+    subparsers = parser.add_subparsers(dest="command")
+    suite_parser = subparsers.add_parser("suite", help="Run the benchmark suite")
+    suite_parser.add_argument("-o", "--output", default="benchmark.json", help="Results file")
+    suite_parser.add_argument("--n-min", type=int, default=12, help="Smallest grid size, log2(N)")
+    suite_parser.add_argument("--n-max", type=int, default=20, help="Largest grid size, log2(N)")
+    suite_parser.add_argument("--repeats", type=int, default=5, help="Timed calls per benchmark")
+    compare_parser = subparsers.add_parser("compare", help="Compare two suite results")
+    compare_parser.add_argument("base", help="Base results file")
+    compare_parser.add_argument("new", help="New results file")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Relative time regression threshold")
+    args = parser.parse_args()
+
+    if args.command == "suite":
+        suite_results = benchmark_suite([2**p for p in range(args.n_min, args.n_max + 1)], args.repeats)
+        save_results(suite_results, args.output)
+    elif args.command == "compare":
+        found = compare_results(load_results(args.base), load_results(args.new), args.threshold)
+        sys.exit(1 if len(found) > 0 else 0)
+    else:
+        benchmark_unwrap()
+        benchmark_batch()
+        compare_precision()
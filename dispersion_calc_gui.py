@@ -5,7 +5,8 @@ Created on 03 Apr 2017
 """
 
 from dispersion_calc import DispersionCalculator
-from PyQt5 import QtGui, QtCore, QtWidgets
+from dispersion_worker import LatestRequest, PropagationRunner, zoom_points
+from PyQt5 import QtCore, QtWidgets
 import pyqtgraph as pq
 import numpy as np
 import sys
@@ -106,6 +107,42 @@ class MyTableModel(QtCore.QAbstractTableModel):
                 return QtCore.QVariant()
 
 
+class PropagationWorker(QtCore.QObject):
+    """
+    Calculates pulse propagations for the GUI in a separate thread, with its own
+    PropagationRunner. Requests are coalesced in a LatestRequest: submit only stores the latest
+    request, and when the worker gets to run it takes the most recent one, dropping those it
+    replaced. The result is sent with the result_ready signal.
+    """
+    result_ready = QtCore.pyqtSignal(object)
+    request_pending = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self.requests = LatestRequest()
+        self.runner = PropagationRunner()
+        self.request_pending.connect(self.run_pending)
+
+    def submit(self, request):
+        """
+        Submit a request, replacing any request that has not been started. Called from the GUI thread.
+        """
+        self.requests.submit(request)
+        self.request_pending.emit()
+
+    @QtCore.pyqtSlot()
+    def run_pending(self):
+        request = self.requests.take()
+        if request is None:
+            return
+        try:
+            result = self.runner.propagate(request)
+        except Exception as e:
+            root.error("Propagation failed: {0}".format(e))
+            return
+        self.result_ready.emit(result)
+
+
 class DispersionCalculatorGui(QtWidgets.QWidget):
     def __init__(self, parent=None):
         QtWidgets.QWidget.__init__(self, parent)
@@ -120,9 +157,11 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.material_table_model = MyTableModel("fs", 1)
         self.tableview_selected_indexes = None
         self.material_completer_model = QtCore.QStringListModel()
-        self.material_completer_model.setStringList(self.dc.materials.keys())
+        self.material_completer_model.setStringList(list(self.dc.materials.keys()))
         self.material_plotwidget = None
         self.material_plot = None
+        self.material_gvd_plotwidget = None
+        self.material_gvd_plot = None
         self.pulse_temporal_plotwidget = None
         self.pulse_temporal_plot = None
         self.pulse_spectral_plotwidget = None
@@ -132,15 +171,31 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.pulse_initial_spectral_width = None
         self.pulse_time_window = None
         self.pulse_number_points = None
+        self.pulse_auto_grid = None
+        self.pulse_zoom = None
         self.pulse_central_wavelength = None
         self.pulse_result_duration = None
         self.pulse_result_expansion2 = None
         self.pulse_result_expansion3 = None
         self.pulse_result_expansion4 = None
+        self.pulse_duration_domain = 'temporal'
+
+        # Propagation runs in a worker thread. Parameter changes restart update_timer, and only
+        # the result of the latest request is shown.
+        self.request_id = 0
+        self.update_timer = QtCore.QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(50)
+        self.update_timer.timeout.connect(self.propagate_material_list)
+        self.propagation_thread = QtCore.QThread(self)
+        self.propagation_worker = PropagationWorker()
+        self.propagation_worker.moveToThread(self.propagation_thread)
+        self.propagation_worker.result_ready.connect(self.set_propagation_result)
+        self.propagation_thread.start()
+
         self.setup_layout()
 
-        self.setup_pulse()
-        self.propagate_material_list()
+        self.request_propagation()
 
     def set_combobox_material(self, material_name=None):
         if material_name is None:
@@ -159,6 +214,10 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.material_plot.setData(x=l, y=n)
         self.material_plot.update()
         self.material_plotwidget.setTitle(name)
+        gvd = self.dc.get_material_dispersion(name, l)["gvd"] * 1e27
+        good_ind = np.isfinite(gvd)
+        self.material_gvd_plot.setData(x=l[good_ind], y=gvd[good_ind])
+        self.material_gvd_plot.update()
 
     def add_material(self):
         root.debug("Entering add_material")
@@ -166,98 +225,94 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
                                            self.material_thickness.value(),
                                            0.7])
         root.debug("Now propagating:")
-        self.propagate_material_list()
+        self.request_propagation()
 
-    def propagate_material_list(self):
-        root.debug("Entering propagate_material_list")
-        t_fwhm = self.pulse_initial_duration.value() * 1e-15
-        t_span = self.pulse_time_window.value() * 1e-12
-        n_pulse = self.pulse_number_points.value()
-        l_0 = self.pulse_central_wavelength.value() * 1e-9
-        self.dc.N = n_pulse
-        self.dc.generate_pulse(t_fwhm, l_0, t_span, n_pulse, duration_domain='temporal')
-        root.debug("Pulse generated")
-        self.dc.reset_propagation()
+    def get_material_list(self):
+        material_list = []
         for row in range(self.material_table_model.rowCount()):
             ind = self.material_table_model.index(row, 0, QtCore.QModelIndex())
             mat = str(self.material_table_model.data(ind, QtCore.Qt.DisplayRole))
-            root.debug("Propagating {0}".format(mat))
             ind = self.material_table_model.index(row, 1, QtCore.QModelIndex())
             # thickness = self.material_table_model.data(ind, QtCore.Qt.DisplayRole).toReal()[0]
             thickness = np.double(self.material_table_model.data(ind, QtCore.Qt.DisplayRole).value())
             root.debug("Thickness {0}: {1}".format(mat, thickness))
-            self.dc.propagate_material(mat, thickness*1e-3)
-        root.debug("Propagation complete")
-        # self.material_table_model.reset()
-        x = self.dc.get_t()
-        y = self.dc.get_temporal_intensity(True)
-        self.pulse_temporal_plot.setData(x=x, y=y)
-        x = 2*np.pi*self.dc.c/self.dc.get_w()
-        y = self.dc.get_spectral_intensity(True)
+            material_list.append((mat, thickness*1e-3))
+        return material_list
+
+    def get_pulse_request(self):
+        """
+        Collect the pulse and material stack parameters for a propagation request.
+        """
+        if self.pulse_duration_domain == 'temporal':
+            fwhm = self.pulse_initial_duration.value() * 1e-15
+        else:
+            fwhm = self.pulse_initial_spectral_width.value() * 1e-9
+        request = {"id": self.request_id,
+                   "fwhm": fwhm,
+                   "duration_domain": self.pulse_duration_domain,
+                   "l_0": self.pulse_central_wavelength.value() * 1e-9,
+                   "t_span": self.pulse_time_window.value() * 1e-12,
+                   "n": int(self.pulse_number_points.value()),
+                   "auto_grid": self.pulse_auto_grid.isChecked(),
+                   "zoom": self.pulse_zoom.isChecked(),
+                   "material_list": self.get_material_list()}
+        return request
+
+    def request_propagation(self):
+        """
+        Schedule a propagation with the current parameters. The request is sent to the worker
+        when no parameter has changed for the debounce interval.
+        """
+        self.update_timer.start()
+
+    def propagate_material_list(self):
+        root.debug("Entering propagate_material_list")
+        self.request_id += 1
+        self.propagation_worker.submit(self.get_pulse_request())
+
+    def set_propagation_result(self, result):
+        root.debug("Entering set_propagation_result {0}".format(result["id"]))
+        if result["id"] != self.request_id:
+            root.debug("Discarding stale result")
+            return
+        if result["auto_grid"] is True:
+            self.set_value_silent(self.pulse_time_window, result["t_span"] * 1e12)
+            self.set_value_silent(self.pulse_number_points, result["n"])
+        if result["duration_domain"] == 'temporal':
+            self.set_value_silent(self.pulse_initial_spectral_width, result["initial_spectral_width"] * 1e9)
+        else:
+            self.set_value_silent(self.pulse_initial_duration, result["initial_duration"] * 1e15)
+
+        self.pulse_temporal_plot.setData(x=result["t"], y=result["I_t"])
         self.pulse_spectral_plotwidget.disableAutoRange()
-        self.pulse_spectral_plot.setData(x=x, y=y)
+        self.pulse_spectral_plot.setData(x=result["l"], y=result["I_w"])
         self.pulse_spectral_plotwidget.setXRange(200e-9, 1000e-9)
+        self.pulse_phase_plot.setData(x=result["w_phase"], y=result["phase"])
 
-        x = self.dc.get_w()
-        y = self.dc.get_spectral_phase(True)
-        good_ind = np.isfinite(y)
-
-        self.pulse_phase_plot.setData(x=x[good_ind], y=y[good_ind])
-
-        t_fwhm = self.dc.get_pulse_duration("temporal") * 1e15
-        self.pulse_result_duration.setText("{0:.2f}".format(t_fwhm))
-
-        # Re-calculate pulse with larger bandwidth if necessary to avoid a bad phase expansion
-        if self.pulse_initial_spectral_width.value() < 5:
-            l_fwhm = 10e-9
-            t_span = self.pulse_time_window.value() * 1e-12
-            n_pulse = self.pulse_number_points.value()
-            l_0 = self.pulse_central_wavelength.value() * 1e-9
-            self.dc.N = n_pulse
-            self.dc.generate_pulse(l_fwhm, l_0, t_span, n_pulse, duration_domain='spectral')
-            for row in range(self.material_table_model.rowCount()):
-                ind = self.material_table_model.index(row, 0, QtCore.QModelIndex())
-                mat = str(self.material_table_model.data(ind, QtCore.Qt.DisplayRole))
-                ind = self.material_table_model.index(row, 1, QtCore.QModelIndex())
-                # thickness = self.material_table_model.data(ind, QtCore.Qt.DisplayRole).toReal()[0]
-                thickness = np.double(self.material_table_model.data(ind, QtCore.Qt.DisplayRole).value())
-                root.debug("Thickness {0}: {1}".format(mat, thickness))
-                self.dc.propagate_material(mat, thickness*1e-3)
-        root.debug("Re-Propagation complete")
-        poly = self.dc.get_spectral_phase_expansion(4, 1e15)
-        root.debug("Spectral expansion complete")
-        self.pulse_result_expansion2.setText("{0:.2f}".format(poly[-3]))
-        self.pulse_result_expansion3.setText("{0:.2f}".format(poly[-4]))
-        self.pulse_result_expansion4.setText("{0:.2f}".format(poly[-5]))
+        self.pulse_result_duration.setText("{0:.2f}".format(result["duration"] * 1e15))
+        disp = result["dispersion"]
+        self.pulse_result_expansion2.setText("{0:.2f}".format(disp[1] * 1e30))
+        self.pulse_result_expansion3.setText("{0:.2f}".format(disp[2] * 1e45))
+        self.pulse_result_expansion4.setText("{0:.2f}".format(disp[3] * 1e60))
+
+    @staticmethod
+    def set_value_silent(spinbox, value):
+        spinbox.blockSignals(True)
+        spinbox.setValue(value)
+        spinbox.blockSignals(False)
 
     def setup_pulse(self):
-        t_fwhm = self.pulse_initial_duration.value() * 1e-15
-        t_span = self.pulse_time_window.value() * 1e-12
-        n_pulse = self.pulse_number_points.value()
-        l_0 = self.pulse_central_wavelength.value() * 1e-9
-        print("New pulse: t_fwhm {0:.2e}, l_0 {1:.2e}".format(t_fwhm, l_0))
-        self.dc.N = n_pulse
-        self.dc.generate_pulse(t_fwhm, l_0, t_span, n_pulse, duration_domain='temporal')
-        root.debug("Pulse generated")
-        dw = self.dc.get_pulse_duration('spectral')
-        root.debug("dw {0}".format(dw))
-        dl = dw*l_0**2/(2*np.pi*self.dc.c) * 1e9
-        root.debug("dl {0}".format(dl))
-        self.pulse_initial_spectral_width.setValue(dl)
-        root.debug("Initial spectral width {0}".format(dl))
-        self.propagate_material_list()
-        root.debug("Propagation finished")
+        self.pulse_duration_domain = 'temporal'
+        self.request_propagation()
 
     def setup_pulse_spectral(self):
-        fwhm = self.pulse_initial_spectral_width.value() * 1e-9
-        t_span = self.pulse_time_window.value() * 1e-12
-        n_pulse = self.pulse_number_points.value()
-        l_0 = self.pulse_central_wavelength.value() * 1e-9
-        self.dc.N = n_pulse
-        self.dc.generate_pulse(fwhm, l_0, t_span, n_pulse, duration_domain='spectral')
-        dt = self.dc.get_pulse_duration('temporal')
-        self.pulse_initial_duration.setValue(dt*1e15)
-        self.propagate_material_list()
+        self.pulse_duration_domain = 'spectral'
+        self.request_propagation()
+
+    def closeEvent(self, event):
+        self.propagation_thread.quit()
+        self.propagation_thread.wait()
+        QtWidgets.QWidget.closeEvent(self, event)
 
     def store_model_selection(self):
         root.debug("Entring store_model_selection")
@@ -319,7 +374,8 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.material_tableview.setModel(self.material_table_model)
         self.material_tableview.verticalHeader().hide()
         self.material_tableview.horizontalHeader().show()
-        self.material_table_model.dataChanged.connect(self.propagate_material_list)
+        self.material_table_model.dataChanged.connect(self.request_propagation)
+        self.material_table_model.rowsRemoved.connect(self.request_propagation)
         self.material_tableview.installEventFilter(self)
         self.material_tableview.setEditTriggers(QtWidgets.QAbstractItemView.DoubleClicked |
                                                 QtWidgets.QAbstractItemView.SelectedClicked |
@@ -345,6 +401,20 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         sp.setVerticalStretch(1)
         self.material_plotwidget.setSizePolicy(sp)
         self.material_plotwidget.setToolTip("Material refractive index")
+
+        self.material_gvd_plotwidget = pq.PlotWidget(useOpenGL=True,
+                                                     labels={'bottom': ('Wavelength', 'm'),
+                                                             'left': ('GVD', 'fs^2/mm')})
+        self.material_gvd_plot = self.material_gvd_plotwidget.plot()
+        self.material_gvd_plot.setPen((200, 150, 50))
+        self.material_gvd_plotwidget.showGrid(x=True, y=True)
+        self.material_gvd_plotwidget.setMaximumWidth(400)
+        self.material_gvd_plotwidget.setYRange(-100, 400)
+        self.material_gvd_plotwidget.setXLink(self.material_plotwidget)
+        sp = self.material_gvd_plotwidget.sizePolicy()
+        sp.setVerticalStretch(1)
+        self.material_gvd_plotwidget.setSizePolicy(sp)
+        self.material_gvd_plotwidget.setToolTip("Material group velocity dispersion")
         # self.material_plotwidget.setSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.MinimumExpanding)
 
         material_select_layout = QtWidgets.QHBoxLayout()
@@ -358,6 +428,7 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         material_layout.addLayout(material_select_layout)
         material_layout.addWidget(self.material_tableview)
         material_layout.addWidget(self.material_plotwidget)
+        material_layout.addWidget(self.material_gvd_plotwidget)
 
         self.pulse_temporal_plotwidget = pq.PlotWidget(useOpenGL=True,
                                                        labels={'bottom': ('Time', 's'),
@@ -389,7 +460,7 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.pulse_initial_duration.setMaximum(1e6)
         self.pulse_initial_duration.setValue(50)
         self.pulse_initial_duration.setSuffix(" fs")
-        self.pulse_initial_duration.editingFinished.connect(self.setup_pulse)
+        self.pulse_initial_duration.valueChanged.connect(self.setup_pulse)
         self.pulse_initial_duration.setToolTip("Initial full width at half max pulse duration for the generated gaussian pulse")
 
         self.pulse_initial_spectral_width = QtWidgets.QDoubleSpinBox()
@@ -397,7 +468,7 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.pulse_initial_spectral_width.setMaximum(1e6)
         self.pulse_initial_spectral_width.setValue(19)
         self.pulse_initial_spectral_width.setSuffix(" nm")
-        self.pulse_initial_spectral_width.editingFinished.connect(self.setup_pulse_spectral)
+        self.pulse_initial_spectral_width.valueChanged.connect(self.setup_pulse_spectral)
         self.pulse_initial_spectral_width.setToolTip("Initial full width at half max pulse spectral width for the generated gaussian pulse")
 
         self.pulse_central_wavelength = QtWidgets.QDoubleSpinBox()
@@ -405,7 +476,7 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.pulse_central_wavelength.setMaximum(1e6)
         self.pulse_central_wavelength.setValue(800)
         self.pulse_central_wavelength.setSuffix(" nm")
-        self.pulse_central_wavelength.editingFinished.connect(self.setup_pulse)
+        self.pulse_central_wavelength.valueChanged.connect(self.request_propagation)
         self.pulse_central_wavelength.setToolTip("Central wavelength of the generated pulse, 200-2000 nm")
 
         self.pulse_time_window = QtWidgets.QDoubleSpinBox()
@@ -413,7 +484,7 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.pulse_time_window.setMaximum(1e6)
         self.pulse_time_window.setValue(20)
         self.pulse_time_window.setSuffix(" ps")
-        self.pulse_time_window.editingFinished.connect(self.setup_pulse)
+        self.pulse_time_window.valueChanged.connect(self.request_propagation)
         self.pulse_time_window.setToolTip("<nobr>The propagated pulse is calculated in this time window.<\nobr> "
                                           "If the resulting pulse is too long, there will be aliasing effects.")
 
@@ -421,10 +492,22 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         self.pulse_number_points.setMinimum(0.0)
         self.pulse_number_points.setMaximum(1e6)
         self.pulse_number_points.setValue(16384)
-        self.pulse_number_points.editingFinished.connect(self.setup_pulse)
+        self.pulse_number_points.valueChanged.connect(self.request_propagation)
         self.pulse_number_points.setToolTip("Number of points in the generated pulse. "
                                             "If too low, the pulse can't resolve field oscillations")
 
+        self.pulse_auto_grid = QtWidgets.QCheckBox("Auto")
+        self.pulse_auto_grid.setChecked(False)
+        self.pulse_auto_grid.stateChanged.connect(self.request_propagation)
+        self.pulse_auto_grid.setToolTip("Choose time span and number of points automatically from the "
+                                        "dispersion of the material stack to avoid aliasing")
+
+        self.pulse_zoom = QtWidgets.QCheckBox("Zoom")
+        self.pulse_zoom.setChecked(False)
+        self.pulse_zoom.stateChanged.connect(self.request_propagation)
+        self.pulse_zoom.setToolTip("Calculate the temporal intensity and duration in a window around the pulse "
+                                   "with {0} points, independent of the number of points".format(zoom_points))
+
         self.pulse_result_duration = QtWidgets.QLabel()
         self.pulse_result_expansion2 = QtWidgets.QLabel()
         self.pulse_result_expansion3 = QtWidgets.QLabel()
@@ -439,8 +522,10 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         pulse_setup_layout.addWidget(self.pulse_initial_spectral_width, 2, 1)
         pulse_setup_layout.addWidget(QtWidgets.QLabel("Time span"), 3, 0)
         pulse_setup_layout.addWidget(self.pulse_time_window, 3, 1)
+        pulse_setup_layout.addWidget(self.pulse_auto_grid, 3, 2)
         pulse_setup_layout.addWidget(QtWidgets.QLabel("Number of points"), 4, 0)
         pulse_setup_layout.addWidget(self.pulse_number_points, 4, 1)
+        pulse_setup_layout.addWidget(self.pulse_zoom, 4, 2)
         pulse_setup_layout.addItem(QtWidgets.QSpacerItem(20, 20, QtWidgets.QSizePolicy.MinimumExpanding,
                                    QtWidgets.QSizePolicy.MinimumExpanding), 5, 3)
 
@@ -450,11 +535,13 @@ class DispersionCalculatorGui(QtWidgets.QWidget):
         pulse_result_layout.addWidget(QtWidgets.QLabel("fs"), 0, 2)
         pulse_result_layout.addItem(QtWidgets.QSpacerItem(20, 20, QtWidgets.QSizePolicy.MinimumExpanding,
                                     QtWidgets.QSizePolicy.Minimum), 1, 3)
-        pulse_result_layout.addWidget(QtWidgets.QLabel("Result expansion"), 2, 0)
+        pulse_result_layout.addWidget(QtWidgets.QLabel("Result GDD"), 2, 0)
         pulse_result_layout.addWidget(self.pulse_result_expansion2, 2, 1)
         pulse_result_layout.addWidget(QtWidgets.QLabel("fs^2"), 2, 2)
+        pulse_result_layout.addWidget(QtWidgets.QLabel("Result TOD"), 3, 0)
         pulse_result_layout.addWidget(self.pulse_result_expansion3, 3, 1)
         pulse_result_layout.addWidget(QtWidgets.QLabel("fs^3"), 3, 2)
+        pulse_result_layout.addWidget(QtWidgets.QLabel("Result FOD"), 4, 0)
         pulse_result_layout.addWidget(self.pulse_result_expansion4, 4, 1)
         pulse_result_layout.addWidget(QtWidgets.QLabel("fs^4"), 4, 2)
 
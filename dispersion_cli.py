@@ -0,0 +1,273 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Command line tool running material stacks from a file through the dispersion calculator,
+for batch jobs without the GUI:
+
+    python dispersion_cli.py stacks.yaml -o results.csv --mode process --workers 8
+
+The input is a JSON, YAML or CSV file of jobs. In JSON and YAML the file is a list of jobs, or a
+dict with a list of jobs under "jobs" and default pulse parameters under "defaults":
+
+    defaults: {fwhm: 50.0e-15, l_0: 800.0e-9, t_span: 4.0e-12, n: 8192}
+    jobs:
+      - name: compressor
+        stack: [[fs, 10.0e-3], [sapphire_o, 2.0e-3]]
+      - {name: long, fwhm: 20.0e-15, stack: [{material: bk7, thickness: 50.0e-3}]}
+
+In CSV each row is a job with the columns name, fwhm, l_0, t_span, n, duration_domain (all optional)
+and stack, written as "fs:10e-3;sapphire_o:2e-3". All values are in SI units. A material name
+that is not in the materials directory or the built-in materials is an error, reported with
+the job name before any job is run.
+
+The results (pulse duration and spectral width FWHM, GD, GDD, TOD, FOD of the stack, and optionally
+the intensity traces) are written to CSV, Parquet (requires pyarrow) or NPZ depending on the
+output file extension.
+"""
+
+import numpy as np
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import logging
+
+from dispersion_cache import content_key
+from dispersion_calc import DispersionCalculator
+from dispersion_sweep import SweepRunner, print_progress
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+default_pulse = {"fwhm": 50e-15, "l_0": 800e-9, "t_span": 2e-12, "n": 8192, "duration_domain": "temporal"}
+dispersion_names = ["gd", "gdd", "tod", "fod"]
+trace_names = ["t", "I_t", "w", "I_w"]
+
+
+def parse_stack(stack):
+    """
+    Parse a material stack given as a list of [name, thickness] pairs, a list of dicts with
+    material and thickness, or a string "name:thickness;name:thickness".
+
+    :param stack: Stack definition
+    :return: List of [name, thickness]
+    """
+    if isinstance(stack, str):
+        stack = [row.split(":") for row in stack.split(";") if row.strip() != ""]
+    material_list = []
+    for row in stack:
+        if isinstance(row, dict):
+            name, thickness = row["material"], row["thickness"]
+        else:
+            name, thickness = row
+        material_list.append([str(name).strip(), float(thickness)])
+    return material_list
+
+
+def read_jobs(filename, materials=None):
+    """
+    Read a job file, see the module description for the formats.
+
+    :param filename: .json, .yaml, .yml or .csv file
+    :param materials: Materials dict (e.g. DispersionCalculator.materials) to check the stacks against.
+                      The propagation skips unknown materials, so a misspelled name would silently
+                      change the stack. Optional.
+    :return: List of sweep points (dicts with index, name, pulse, stack and key)
+    :raises ValueError: If a stack contains a material that is not in materials
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    defaults = {}
+    if ext == ".csv":
+        with open(filename, "r") as f:
+            jobs = [dict((k, v) for k, v in row.items() if v not in (None, "")) for row in csv.DictReader(f)]
+    else:
+        with open(filename, "r") as f:
+            if ext == ".json":
+                data = json.load(f)
+            elif ext in (".yaml", ".yml"):
+                if yaml is None:
+                    raise ImportError("Reading YAML job files requires the PyYAML package")
+                data = yaml.safe_load(f)
+            else:
+                raise ValueError("Unknown job file type {0}, use .json, .yaml or .csv".format(ext))
+        if isinstance(data, dict):
+            defaults = data.get("defaults", {})
+            jobs = data["jobs"]
+        else:
+            jobs = data
+    points = []
+    for ind, job in enumerate(jobs):
+        pulse = dict(default_pulse)
+        for name in default_pulse:
+            if name in job:
+                pulse[name] = job[name]
+            elif name in defaults:
+                pulse[name] = defaults[name]
+        for name in ["fwhm", "l_0", "t_span"]:
+            pulse[name] = float(pulse[name])
+        pulse["n"] = int(float(pulse["n"]))
+        stack = parse_stack(job.get("stack", []))
+        job_name = str(job.get("name", ind))
+        if materials is not None:
+            unknown = [row[0] for row in stack if row[0] not in materials]
+            if len(unknown) > 0:
+                raise ValueError("Unknown material {0} in job {1} ({2})".format(", ".join(unknown), job_name,
+                                                                             filename))
+        points.append({"index": ind, "name": job_name, "pulse": pulse, "stack": stack,
+                       "key": content_key(pulse, stack)})
+    return points
+
+
+def flatten_result(result):
+    """
+    Flatten a sweep result to a record of output columns.
+
+    :param result: Result dict from SweepRunner
+    :return: Dict of column name: value
+    """
+    record = {"index": result["index"], "name": result["name"]}
+    record.update(result["pulse"])
+    record["stack"] = ";".join(["{0}:{1!r}".format(name, thickness) for name, thickness in result["stack"]])
+    record["duration"] = result["duration"]
+    record["bandwidth"] = result["bandwidth"]
+    for name, value in zip(dispersion_names, result["dispersion"]):
+        record[name] = value
+    for name in trace_names:
+        if name in result:
+            record[name] = result[name]
+    return record
+
+
+def write_csv(records, filename):
+    columns = [name for name in records[0].keys() if name not in trace_names]
+    if len(columns) < len(records[0]):
+        logger.warning("Traces are not written to CSV, use Parquet or NPZ")
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def write_parquet(records, filename):
+    if pyarrow is None:
+        raise ImportError("Writing Parquet files requires the pyarrow package")
+    pyarrow.parquet.write_table(pyarrow.Table.from_pylist(records), filename)
+
+
+def write_npz(records, filename):
+    """
+    Write records to an npz file with one array per column. Traces are stacked to 2-D arrays if
+    all jobs have the same number of points, otherwise they are stored per job as e.g. I_t_12.
+    """
+    arrays = {}
+    for name in records[0].keys():
+        values = [record[name] for record in records]
+        if name not in trace_names:
+            arrays[name] = np.array(values)
+        elif len(set([len(v) for v in values])) == 1:
+            arrays[name] = np.array(values)
+        else:
+            for record, value in zip(records, values):
+                arrays["{0}_{1}".format(name, record["index"])] = np.array(value)
+    np.savez(filename, **arrays)
+
+
+writers = {".csv": write_csv, ".parquet": write_parquet, ".npz": write_npz}
+
+
+def write_results(records, filename):
+    """
+    Write result records to CSV, Parquet or NPZ, chosen from the file extension.
+
+    :param records: List of records, see flatten_result
+    :param filename: Output file
+    :return:
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        writer = writers[ext]
+    except KeyError:
+        raise ValueError("Unknown output file type {0}, use one of {1}".format(ext, list(writers.keys())))
+    if len(records) > 0:
+        writer(records, filename)
+
+
+def run_jobs(points, mode="process", workers=None, chunk_size=16, traces=False, progress=None, calc_kwargs=None):
+    """
+    Run sweep points with SweepRunner.
+
+    :param points: List of sweep points, see read_jobs
+    :param mode: 'serial', 'thread' or 'process'
+    :param workers: Number of workers, default the number of cores
+    :param chunk_size: Number of jobs sent to a worker at a time
+    :param traces: If True include intensity traces
+    :param progress: Progress callback progress(done, total)
+    :param calc_kwargs: DispersionCalculator constructor arguments
+    :return: List of records in job order
+    """
+    if mode == "serial":
+        runner = SweepRunner(0, chunk_size, calc_kwargs=calc_kwargs, traces=traces, progress=progress)
+    else:
+        runner = SweepRunner(workers, chunk_size, calc_kwargs=calc_kwargs, traces=traces, progress=progress,
+                             executor=mode)
+    records = [flatten_result(result) for result in runner.run(points)]
+    records.sort(key=lambda record: record["index"])
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Propagate pulses through material stacks from a job file")
+    parser.add_argument("jobs", help="Job file (.json, .yaml or .csv)")
+    parser.add_argument("-o", "--output", default="results.csv", help="Output file (.csv, .parquet or .npz)")
+    parser.add_argument("--mode", choices=["serial", "thread", "process"], default="process",
+                        help="Execution mode")
+    parser.add_argument("--workers", type=int, default=None, help="Number of workers, default number of cores")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Jobs sent to a worker at a time")
+    parser.add_argument("--traces", action="store_true", help="Include temporal and spectral intensity traces")
+    parser.add_argument("--lazy", action="store_true", help="Use lazy propagation")
+    parser.add_argument("--fft-backend", default="numpy", help="FFT backend: numpy, scipy or pyfftw")
+    parser.add_argument("--materials", default=None,
+                        help="Materials directory, default the materials directory next to this file")
+    parser.add_argument("--progress", action="store_true", help="Print progress")
+    args = parser.parse_args(argv)
+
+    try:
+        points = read_jobs(args.jobs, DispersionCalculator(materials_path=args.materials).materials)
+    except ValueError as e:
+        parser.error(str(e))
+    calc_kwargs = {"lazy_propagation": args.lazy, "fft_backend": args.fft_backend, "materials_path": args.materials}
+    progress = print_progress if args.progress else None
+    t0 = time.perf_counter()
+    records = run_jobs(points, args.mode, args.workers, args.chunk_size, args.traces, progress, calc_kwargs)
+    t_run = time.perf_counter() - t0
+    write_results(records, args.output)
+    t_total = time.perf_counter() - t0
+
+    n_jobs = len(records)
+    n_samples = sum([record["n"] for record in records])
+    workers = 1 if args.mode == "serial" else (args.workers or os.cpu_count() or 1)
+    print("Processed {0} stacks in {1:.2f} s ({2} mode, {3} workers)".format(n_jobs, t_run, args.mode, workers))
+    if n_jobs > 0:
+        print("Throughput {0:.1f} stacks/s, {1:.2f} ms per stack, {2:.2f} Msamples/s".format(
+            n_jobs / t_run, t_run / n_jobs * 1e3, n_samples / t_run * 1e-6))
+    print("Results written to {0} in {1:.2f} s".format(args.output, t_total - t_run))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+FFT backends for the dispersion calculator. All backends transform along the last axis
+with numpy normalization (unnormalized forward, 1/N inverse). The fft and ifft methods accept
+an out array to write the result to, avoiding an allocation where the library supports it.
+"""
+
+import numpy as np
+import scipy.fft
+import os
+import logging
+
+try:
+    import pyfftw
+except ImportError:
+    pyfftw = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+# numpy.fft supports the out argument from numpy 2.0
+numpy_fft_out = np.lib.NumpyVersion(np.__version__) >= "2.0.0"
+
+
+class FFTBackend(object):
+    """
+    Base class for FFT backends. Subclasses implement fft, ifft and rfft along the last axis.
+    """
+    name = None
+
+    def fft(self, x, out=None):
+        raise NotImplementedError
+
+    def ifft(self, x, out=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def _to_out(x_f, out):
+        if out is None:
+            return x_f
+        out[...] = x_f
+        return out
+
+    def rfft(self, x):
+        raise NotImplementedError
+
+    def fft_real(self, x):
+        """
+        Full length FFT of real input, calculated with a real-to-complex transform and
+        filling in the negative frequencies from the hermitian symmetry.
+
+        :param x: Real array
+        :return: Complex array, same as fft(x)
+        """
+        n = x.shape[-1]
+        r = self.rfft(x)
+        m = r.shape[-1]
+        x_f = np.empty(r.shape[:-1] + (n,), dtype=r.dtype)
+        x_f[..., :m] = r
+        x_f[..., m:] = np.conj(r[..., 1:n - m + 1][..., ::-1])
+        return x_f
+
+
+class NumpyFFTBackend(FFTBackend):
+    """
+    Transforms with numpy.fft.
+    """
+    name = "numpy"
+
+    def fft(self, x, out=None):
+        if out is not None and numpy_fft_out:
+            return np.fft.fft(x, axis=-1, out=out)
+        return self._to_out(np.fft.fft(x, axis=-1), out)
+
+    def ifft(self, x, out=None):
+        if out is not None and numpy_fft_out:
+            return np.fft.ifft(x, axis=-1, out=out)
+        return self._to_out(np.fft.ifft(x, axis=-1), out)
+
+    def rfft(self, x):
+        return np.fft.rfft(x, axis=-1)
+
+
+class ScipyFFTBackend(FFTBackend):
+    """
+    Transforms with scipy.fft, multithreaded over the batch axes with workers threads
+    (negative values count from the number of cores, -1 uses all cores). scipy.fft splits
+    the work by transform, so a single 1-D transform (propagate_material, the lazy fields)
+    runs on one core whatever workers is. Stacked transforms, e.g. in
+    propagate_material_batch, are spread over the workers. Use the pyfftw backend with threads
+    to parallelize single large transforms.
+    """
+    name = "scipy"
+
+    def __init__(self, workers=-1):
+        self.workers = workers
+
+    def fft(self, x, out=None):
+        return self._to_out(scipy.fft.fft(x, axis=-1, workers=self.workers), out)
+
+    def ifft(self, x, out=None):
+        return self._to_out(scipy.fft.ifft(x, axis=-1, workers=self.workers), out)
+
+    def rfft(self, x):
+        return scipy.fft.rfft(x, axis=-1, workers=self.workers)
+
+
+class PyFFTWBackend(FFTBackend):
+    """
+    Transforms with pyFFTW. A plan with aligned input and output buffers is created the first
+    time a shape and dtype is transformed, and reused for later calls on the same grid.
+    The transform is multithreaded with threads threads.
+    """
+    name = "pyfftw"
+
+    def __init__(self, threads=None, planner_effort="FFTW_MEASURE"):
+        if pyfftw is None:
+            raise ImportError("The pyfftw FFT backend requires the pyFFTW package")
+        if threads is None:
+            threads = os.cpu_count() or 1
+        self.threads = threads
+        self.planner_effort = planner_effort
+        self.plans = {}
+
+    def get_plan(self, kind, shape, dtype):
+        """
+        Get a cached FFTW plan, creating it if needed.
+
+        :param kind: 'fft', 'ifft' or 'rfft'
+        :param shape: Input array shape
+        :param dtype: Input array dtype
+        :return: pyfftw.FFTW object
+        """
+        key = (kind, shape, np.dtype(dtype))
+        plan = self.plans.get(key)
+        if plan is None:
+            logger.debug("Creating FFTW plan {0}".format(key))
+            if kind == "rfft":
+                real_dtype = np.dtype(dtype)
+                complex_dtype = np.result_type(real_dtype, np.complex64)
+                a = pyfftw.empty_aligned(shape, dtype=real_dtype)
+                b = pyfftw.empty_aligned(shape[:-1] + (shape[-1] // 2 + 1,), dtype=complex_dtype)
+                direction = "FFTW_FORWARD"
+            else:
+                complex_dtype = np.result_type(dtype, np.complex64)
+                a = pyfftw.empty_aligned(shape, dtype=complex_dtype)
+                b = pyfftw.empty_aligned(shape, dtype=complex_dtype)
+                direction = "FFTW_FORWARD" if kind == "fft" else "FFTW_BACKWARD"
+            plan = pyfftw.FFTW(a, b, axes=(-1,), direction=direction, flags=(self.planner_effort,),
+                               threads=self.threads)
+            self.plans[key] = plan
+        return plan
+
+    def _execute(self, kind, x, out=None):
+        plan = self.get_plan(kind, x.shape, x.dtype)
+        plan.input_array[...] = x
+        plan()
+        if out is None:
+            return plan.output_array.copy()
+        out[...] = plan.output_array
+        return out
+
+    def fft(self, x, out=None):
+        return self._execute("fft", x, out)
+
+    def ifft(self, x, out=None):
+        return self._execute("ifft", x, out)
+
+    def rfft(self, x):
+        return self._execute("rfft", x)
+
+
+fft_backends = {"numpy": NumpyFFTBackend, "scipy": ScipyFFTBackend, "pyfftw": PyFFTWBackend}
+
+
+def get_fft_backend(backend="numpy", **kwargs):
+    """
+    Create an FFT backend from its name.
+
+    :param backend: 'numpy', 'scipy' or 'pyfftw', or an FFTBackend instance that is returned as is
+    :param kwargs: Arguments for the backend, e.g. workers for scipy and threads for pyfftw
+    :return: FFTBackend instance
+    """
+    if isinstance(backend, FFTBackend):
+        return backend
+    try:
+        return fft_backends[backend](**kwargs)
+    except KeyError:
+        raise ValueError("Unknown FFT backend {0}, use one of {1}".format(backend, list(fft_backends.keys())))
@@ -0,0 +1,138 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Timing instrumentation for the dispersion calculator. InstrumentationStats collects call counts,
+wall times and array sizes per calculation stage. DispersionCalculator.enable_instrumentation
+installs timed wrappers around its hot paths (material evaluation, phase multiply, FFTs,
+phase unwrapping and polynomial fits) that report to it:
+
+    dc.enable_instrumentation(hook=lambda stage, elapsed, size: metrics.observe(stage, elapsed))
+    dc.propagate_stack(material_list)
+    print(dc.stats.report())
+
+The wrappers are only installed while the instrumentation is enabled, so the calculator runs
+without timing overhead otherwise.
+"""
+
+import functools
+import time
+import logging
+
+import numpy as np
+
+from dispersion_fft import FFTBackend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+
+class StageStats(object):
+    """
+    Accumulated statistics for one calculation stage.
+    """
+    __slots__ = ("count", "total_time", "min_time", "max_time", "total_size")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.min_time = np.inf
+        self.max_time = 0.0
+        self.total_size = 0
+
+    def add(self, elapsed, size):
+        self.count += 1
+        self.total_time += elapsed
+        self.min_time = min(self.min_time, elapsed)
+        self.max_time = max(self.max_time, elapsed)
+        self.total_size += size
+
+    def as_dict(self):
+        return {"count": self.count, "total_time": self.total_time, "mean_time": self.total_time / self.count,
+                "min_time": self.min_time, "max_time": self.max_time, "mean_size": self.total_size / self.count}
+
+
+class InstrumentationStats(object):
+    """
+    Call statistics per stage. If a hook is given it is called as hook(stage, elapsed, size) for
+    every recorded call, e.g. to export the timings to a metrics system.
+    """
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.stages = {}
+
+    def record(self, stage, elapsed, size=0):
+        """
+        Record a call.
+
+        :param stage: Stage name
+        :param elapsed: Wall time of the call (s)
+        :param size: Number of elements of the array processed
+        :return:
+        """
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.add(elapsed, size)
+        if self.hook is not None:
+            self.hook(stage, elapsed, size)
+
+    def wrap(self, stage, f):
+        """
+        Wrap a function so each call is recorded under stage. The array size recorded is that of
+        the first array argument.
+
+        :param stage: Stage name
+        :param f: Function to time
+        :return: Timed function
+        """
+        @functools.wraps(f)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            result = f(*args, **kwargs)
+            elapsed = time.perf_counter() - t0
+            size = 0
+            for arg in args:
+                if isinstance(arg, np.ndarray):
+                    size = arg.size
+                    break
+            self.record(stage, elapsed, size)
+            return result
+        timed.__wrapped__ = f
+        return timed
+
+    def get_stats(self):
+        """
+        :return: Dict of stage: dict with count, total_time, mean_time, min_time, max_time (s) and
+                 mean_size (elements)
+        """
+        return dict((stage, stats.as_dict()) for stage, stats in self.stages.items())
+
+    def reset(self):
+        self.stages = {}
+
+    def report(self):
+        """
+        :return: Table of the stage statistics as a string, sorted by total time
+        """
+        lines = ["{0:20s} {1:>8s} {2:>12s} {3:>12s} {4:>12s}".format("stage", "calls", "total (ms)", "mean (ms)",
+                                                                       "mean size")]
+        stats = sorted(self.get_stats().items(), key=lambda item: -item[1]["total_time"])
+        for stage, s in stats:
+            lines.append("{0:20s} {1:8d} {2:12.3f} {3:12.4f} {4:12.0f}".format(stage, s["count"], s["total_time"] * 1e3,
+                                                                             s["mean_time"] * 1e3, s["mean_size"]))
+        return "\n".join(lines)
+
+
+class InstrumentedFFTBackend(FFTBackend):
+    """
+    FFT backend recording the time of each transform of another backend under the stages
+    fft, ifft and rfft.
+    """
+    def __init__(self, backend, stats):
+        self.backend = backend
+        self.name = backend.name
+        self.fft = stats.wrap("fft", backend.fft)
+        self.ifft = stats.wrap("ifft", backend.ifft)
+        self.rfft = stats.wrap("rfft", backend.rfft)
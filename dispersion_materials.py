@@ -0,0 +1,616 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Material models for the dispersion calculator. Each material stores its dispersion formula
+coefficients and evaluates the refractive index directly at the requested angular frequencies.
+"""
+
+import numpy as np
+from scipy.interpolate import interp1d, make_interp_spline
+from xml.etree import cElementTree as ElementTree
+from collections.abc import MutableMapping
+from functools import lru_cache
+import hashlib
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+
+@lru_cache(maxsize=None)
+def _derivative_stencil(n_points, orders):
+    """
+    Weights for derivatives at x=0 from samples at integer points x = -(n_points-1)/2 .. (n_points-1)/2,
+    found by differentiating the interpolating polynomial through the samples.
+
+    :param n_points: Number of sample points (odd)
+    :param orders: Highest derivative order
+    :return: Array (orders+1 x n_points) of weights for unit step size
+    """
+    x = np.arange(n_points) - (n_points - 1) / 2
+    v_inv = np.linalg.inv(np.vander(x, increasing=True))
+    fact = np.array([np.prod(np.arange(1, n + 1)) for n in range(orders + 1)], dtype=np.double)
+    return fact[:, np.newaxis] * v_inv[:orders + 1, :]
+
+
+class Material(object):
+    """
+    Base class for materials. A material is called with a vector of angular frequencies
+    and returns the refractive index. Outside the wavelength range l_min - l_max where the
+    formula is valid NaN is returned.
+
+    Subclasses implement refractive_index_l2, the refractive index as function of the squared
+    wavelength in um**2 as customary in Sellmeier equations.
+    """
+    c = 299792458.0
+    formula = None
+
+    def __init__(self, name, l_min=200e-9, l_max=2000e-9):
+        self.name = name
+        self.l_min = l_min
+        self.l_max = l_max
+
+    def __call__(self, w):
+        return self.refractive_index(w)
+
+    def __repr__(self):
+        return "{0}({1})".format(self.__class__.__name__, self.name)
+
+    def refractive_index(self, w):
+        """
+        Calculate the refractive index at angular frequencies w.
+
+        :param w: Angular frequency vector (rad/s)
+        :return: Refractive index vector, NaN outside the valid wavelength range
+        """
+        w = np.asarray(w, dtype=np.double)
+        n = np.full(w.shape, np.nan)
+        with np.errstate(divide='ignore'):
+            l = 2 * np.pi * self.c / w
+        good = (l >= self.l_min) & (l <= self.l_max)
+        n[good] = self.refractive_index_l2((l[good] * 1e6) ** 2)
+        return n
+
+    def refractive_index_l2(self, l2):
+        raise NotImplementedError
+
+    def get_k_derivatives(self, w, orders=4, dw_rel=1e-2):
+        """
+        Calculate the derivatives of the wavenumber k(w) = w * n(w) / c with respect to angular
+        frequency, for use as group delay (order 1), GDD (2), TOD (3) and FOD (4) per unit length.
+
+        The derivatives are found from a 9 point stencil of the dispersion formula around each
+        frequency, so they are independent of any propagation grid. The stencil extends
+        4 * dw_rel * w on each side, NaN is returned if that is outside the valid wavelength range.
+
+        :param w: Angular frequency or vector of angular frequencies (rad/s)
+        :param orders: Highest derivative order (max 8)
+        :param dw_rel: Stencil step relative to w
+        :return: Array (len(w) x orders+1) of d^n k / dw^n (s^n/m), n = 0..orders
+        """
+        w = np.atleast_1d(np.asarray(w, dtype=np.double))
+        stencil = _derivative_stencil(9, orders)
+        h = dw_rel * w
+        w_s = w[:, np.newaxis] + h[:, np.newaxis] * (np.arange(9) - 4)
+        k_s = w_s * self.refractive_index(w_s) / self.c
+        return np.dot(k_s, stencil.T) / h[:, np.newaxis] ** np.arange(orders + 1)
+
+    def get_coefficients(self):
+        """
+        Coefficient arrays defining the material, used for fingerprinting.
+
+        :return: List of arrays
+        """
+        raise NotImplementedError
+
+    def fingerprint(self):
+        """
+        Hash of the formula type, coefficients and validity range. Two materials with the same
+        fingerprint give the same refractive index.
+
+        :return: Hex digest string
+        """
+        h = hashlib.sha1(str(self.formula).encode("utf-8"))
+        for coeff in self.get_coefficients() + [self.l_min, self.l_max]:
+            h.update(np.ascontiguousarray(coeff, dtype=np.double).tobytes())
+        return h.hexdigest()
+
+
+class SellmeierMaterial(Material):
+    """
+    Material specified with Sellmeier coefficients:
+    n = sqrt(1 + sum(A + B * l**2 / (l**2 - C)))
+
+    The wavelengths are in um as customary in Sellmeier equations.
+    """
+    formula = "sellmeier"
+
+    def __init__(self, name, a_coeff=None, b_coeff=None, c_coeff=None, l_min=200e-9, l_max=2000e-9):
+        Material.__init__(self, name, l_min, l_max)
+        n_terms = max([len(x) for x in (a_coeff, b_coeff, c_coeff) if x is not None] + [0])
+        self.a_coeff = self._coeff_array(a_coeff, n_terms)
+        self.b_coeff = self._coeff_array(b_coeff, n_terms)
+        self.c_coeff = self._coeff_array(c_coeff, n_terms)
+
+    @staticmethod
+    def _coeff_array(coeff, n_terms):
+        if coeff is None:
+            return np.zeros(n_terms)
+        return np.asarray(coeff, dtype=np.double)
+
+    def refractive_index_l2(self, l2):
+        n2 = np.ones_like(l2)
+        for a, b, c in zip(self.a_coeff, self.b_coeff, self.c_coeff):
+            n2 += a + b * l2 / (l2 - c)
+        return np.sqrt(n2)
+
+    def get_coefficients(self):
+        return [self.a_coeff, self.b_coeff, self.c_coeff]
+
+
+class AirMaterial(Material):
+    """
+    Refractive index of air (Ciddor):
+    n = 1 + sum(B * l**2 / (C * l**2 - 1))
+
+    The wavelengths are in um.
+    """
+    formula = "air"
+
+    def __init__(self, name, b_coeff, c_coeff, l_min=200e-9, l_max=2000e-9):
+        Material.__init__(self, name, l_min, l_max)
+        self.b_coeff = np.asarray(b_coeff, dtype=np.double)
+        self.c_coeff = np.asarray(c_coeff, dtype=np.double)
+
+    def refractive_index_l2(self, l2):
+        n = np.ones_like(l2)
+        for b, c in zip(self.b_coeff, self.c_coeff):
+            n += b * l2 / (c * l2 - 1)
+        return n
+
+    def get_coefficients(self):
+        return [self.b_coeff, self.c_coeff]
+
+
+class BBOMaterial(Material):
+    """
+    Material specified with the Sellmeier form used for BBO and similar crystals:
+    n = sqrt(A + B / (l**2 - C) - D * l**2)
+
+    The wavelengths are in um.
+    """
+    formula = "bbo"
+
+    def __init__(self, name, a, b, c, d, l_min=200e-9, l_max=2000e-9):
+        Material.__init__(self, name, l_min, l_max)
+        self.a_coeff = np.double(a)
+        self.b_coeff = np.double(b)
+        self.c_coeff = np.double(c)
+        self.d_coeff = np.double(d)
+
+    def refractive_index_l2(self, l2):
+        return np.sqrt(self.a_coeff + self.b_coeff / (l2 - self.c_coeff) - self.d_coeff * l2)
+
+    def get_coefficients(self):
+        return [self.a_coeff, self.b_coeff, self.c_coeff, self.d_coeff]
+
+
+class TabulatedMaterial(Material):
+    """
+    Material specified with a table of refractive index versus wavelength. The refractive index
+    is interpolated with scipy interp1d in angular frequency. Use this only for measured data
+    without a dispersion formula.
+    """
+    formula = "table"
+
+    def __init__(self, name, l, n, kind="quadratic"):
+        l = np.asarray(l, dtype=np.double)
+        Material.__init__(self, name, l.min(), l.max())
+        self.l = l
+        self.n = np.asarray(n, dtype=np.double)
+        self.kind = kind
+        self.n_ip = interp1d(2 * np.pi * self.c / l, self.n, bounds_error=False, fill_value=np.nan, kind=kind)
+
+    def refractive_index(self, w):
+        return self.n_ip(w)
+
+    def get_coefficients(self):
+        return [self.l, self.n]
+
+
+class DispersionTable(object):
+    """
+    Spline table of the wavenumber derivatives d^n k / dw^n (n = 0..4) of a material versus
+    wavelength, for fast lookup of the dispersion at any central wavelength. The derivatives
+    are evaluated with Material.get_k_derivatives on n_points wavelengths spaced geometrically
+    between l_min and l_max, and interpolated with a cubic B-spline (n_points x 5 coefficients).
+
+    The table covers the part of the range where the derivatives are defined, i.e. where the
+    derivative stencil is inside the valid range of the material. NaN is returned outside it.
+    """
+    orders = 4
+
+    def __init__(self, material, l_min=200e-9, l_max=2000e-9, n_points=512):
+        self.name = material.name
+        self.c = material.c
+        l = np.geomspace(l_min, l_max, n_points)
+        k_d = material.get_k_derivatives(2 * np.pi * self.c / l, self.orders)
+        # Use the longest run of wavelengths where all derivatives are defined
+        good = np.concatenate(([0], np.all(np.isfinite(k_d), axis=1).astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(good))
+        runs = edges.reshape(-1, 2)
+        if runs.shape[0] == 0 or np.max(runs[:, 1] - runs[:, 0]) < 4:
+            raise ValueError("Material {0} is not defined in {1}-{2} m".format(self.name, l_min, l_max))
+        i0, i1 = runs[np.argmax(runs[:, 1] - runs[:, 0])]
+        self.l_min = l[i0]
+        self.l_max = l[i1 - 1]
+        self.spline = make_interp_spline(l[i0:i1], k_d[i0:i1], k=3, axis=0)
+
+    def __repr__(self):
+        return "DispersionTable({0}, {1:.0f}-{2:.0f} nm)".format(self.name, self.l_min * 1e9, self.l_max * 1e9)
+
+    def get_k_derivatives_l(self, l):
+        """
+        Look up the wavenumber derivatives at wavelengths l.
+
+        :param l: Wavelength or vector of wavelengths (m)
+        :return: Array (len(l) x 5) of d^n k / dw^n (s^n/m), n = 0..4, NaN outside the table
+        """
+        l = np.atleast_1d(np.asarray(l, dtype=np.double))
+        k_d = self.spline(l)
+        k_d[(l < self.l_min) | (l > self.l_max)] = np.nan
+        return k_d
+
+    def get_k_derivatives(self, w, orders=4):
+        """
+        Look up the wavenumber derivatives at angular frequencies w, a drop in replacement for
+        Material.get_k_derivatives up to order 4.
+
+        :param w: Angular frequency or vector of angular frequencies (rad/s)
+        :param orders: Highest derivative order (max 4)
+        :return: Array (len(w) x orders+1) of d^n k / dw^n (s^n/m), n = 0..orders
+        """
+        if orders > self.orders:
+            raise ValueError("Dispersion tables hold derivatives up to order {0}".format(self.orders))
+        w = np.atleast_1d(np.asarray(w, dtype=np.double))
+        return self.get_k_derivatives_l(2 * np.pi * self.c / w)[:, :orders + 1]
+
+    def get_dispersion_curves(self, l):
+        """
+        Dispersion quantities at wavelengths l.
+
+        :param l: Wavelength vector (m)
+        :return: Dict with n (refractive index), n_g (group index), gvd (s^2/m), tod (s^3/m)
+                 and fod (s^4/m)
+        """
+        l = np.atleast_1d(np.asarray(l, dtype=np.double))
+        k_d = self.get_k_derivatives_l(l)
+        w = 2 * np.pi * self.c / l
+        return {"n": k_d[:, 0] * self.c / w, "n_g": k_d[:, 1] * self.c, "gvd": k_d[:, 2],
+                "tod": k_d[:, 3], "fod": k_d[:, 4]}
+
+
+def read_material_file(filename, name=None):
+    """
+    Read an xml file and extract the sellmeier coeffients from it. The file should have
+    elements called sellmeier with tags called A, B, and C. The refractive index is then
+    calculated as:
+    n = sqrt(1 + sum(A + B * l**2 / (l**2 - C))
+
+    :param filename: String containing the filename
+    :param name: Material name. If None the name attribute of the material element is used
+    :return: SellmeierMaterial
+    """
+    e = ElementTree.parse(filename)
+    mat = e.getroot()
+    if name is None:
+        name = mat.get('name')
+    a_coeff = []
+    b_coeff = []
+    c_coeff = []
+    for s in mat.findall('sellmeier'):
+        for tag, coeff in (('A', a_coeff), ('B', b_coeff), ('C', c_coeff)):
+            t = s.find(tag)
+            if t is not None:
+                coeff.append(np.double(t.text))
+            else:
+                coeff.append(0.0)
+    return SellmeierMaterial(name, a_coeff, b_coeff, c_coeff)
+
+
+def write_material_index(path, index_filename="index.json"):
+    """
+    Write an index file for a materials directory, mapping material names (from the name
+    attribute of each xml file) to filenames. With an index file the MaterialRegistry does
+    not need to list the directory at startup, and names can differ from the filenames.
+
+    :param path: Materials directory
+    :param index_filename: Name of the index file in the directory
+    :return: Dict of name: filename that was written
+    """
+    index = {}
+    for mat_file in sorted(os.listdir(path)):
+        if mat_file.endswith(".xml"):
+            root = ElementTree.parse(os.path.join(path, mat_file)).getroot()
+            index[root.get('name')] = mat_file
+    with open(os.path.join(path, index_filename), "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return index
+
+
+def read_material_index(path, index_filename="index.json"):
+    """
+    Get the material name to filename mapping for a materials directory, from the index
+    file if present, otherwise from the xml filenames.
+
+    :param path: Materials directory
+    :param index_filename: Name of the index file in the directory
+    :return: Dict of name: filename
+    """
+    index_file = os.path.join(path, index_filename)
+    if os.path.isfile(index_file):
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        logger.info("Read index {0} with {1:d} materials".format(index_file, len(index)))
+    else:
+        index = dict((os.path.splitext(mat_file)[0], mat_file) for mat_file in os.listdir(path)
+                     if mat_file.endswith(".xml"))
+        logger.info("Found {0:d} material files".format(len(index)))
+    return index
+
+
+def material_to_record(material, n_terms):
+    """
+    Convert a material object to a tuple matching the catalogue dtype.
+
+    :param material: SellmeierMaterial, AirMaterial or BBOMaterial
+    :param n_terms: Length of the coefficient fields in the catalogue
+    :return: Tuple (name, formula, n_terms, a, b, c, d, l_min, l_max)
+    """
+    def pad(x):
+        x = np.atleast_1d(np.asarray(x, dtype=np.double))
+        return np.concatenate((x, np.zeros(n_terms - x.shape[0])))
+
+    if material.formula == "sellmeier":
+        a, b, c, d = material.a_coeff, material.b_coeff, material.c_coeff, 0.0
+    elif material.formula == "air":
+        a, b, c, d = [], material.b_coeff, material.c_coeff, 0.0
+    elif material.formula == "bbo":
+        a, b, c, d = material.a_coeff, material.b_coeff, material.c_coeff, material.d_coeff
+    else:
+        raise ValueError("Material formula {0} can not be stored in a catalogue".format(material.formula))
+    return (material.name, material.formula, np.atleast_1d(b).shape[0], pad(a), pad(b), pad(c), d,
+            material.l_min, material.l_max)
+
+
+def material_from_record(rec):
+    """
+    Build a material object from a catalogue record.
+
+    :param rec: Record (row) of a material catalogue array
+    :return: Material object
+    """
+    n = int(rec["n_terms"])
+    name = str(rec["name"])
+    formula = str(rec["formula"])
+    l_min = float(rec["l_min"])
+    l_max = float(rec["l_max"])
+    if formula == "sellmeier":
+        return SellmeierMaterial(name, np.array(rec["a"][:n]), np.array(rec["b"][:n]), np.array(rec["c"][:n]),
+                                 l_min=l_min, l_max=l_max)
+    elif formula == "air":
+        return AirMaterial(name, np.array(rec["b"][:n]), np.array(rec["c"][:n]), l_min=l_min, l_max=l_max)
+    elif formula == "bbo":
+        return BBOMaterial(name, rec["a"][0], rec["b"][0], rec["c"][0], rec["d"], l_min=l_min, l_max=l_max)
+    raise ValueError("Unknown material formula {0} in catalogue".format(formula))
+
+
+def compile_material_catalogue(path, catalogue_filename="catalogue.npy", index_filename="index.json"):
+    """
+    Compile all xml files in a materials directory to a single binary catalogue. The catalogue
+    is a numpy structured array with one record per material holding the name, formula type,
+    coefficient arrays and validity range. It is saved as a .npy file so that it can be loaded
+    memory-mapped and shared between processes.
+
+    The file is written to a temporary name and then moved in place, so processes compiling
+    concurrently never see a partial catalogue.
+
+    :param path: Materials directory
+    :param catalogue_filename: Name of the catalogue file in the directory
+    :param index_filename: Name of the optional index file in the directory
+    :return: Full path of the catalogue file
+    """
+    index = read_material_index(path, index_filename)
+    materials = [read_material_file(os.path.join(path, mat_file), name) for name, mat_file in sorted(index.items())]
+    n_terms = max([m.b_coeff.shape[0] for m in materials] + [1])
+    name_len = max([len(m.name) for m in materials] + [1])
+    dtype = np.dtype([("name", "U{0}".format(name_len)), ("formula", "U16"), ("n_terms", np.int32),
+                      ("a", np.double, (n_terms,)), ("b", np.double, (n_terms,)), ("c", np.double, (n_terms,)),
+                      ("d", np.double), ("l_min", np.double), ("l_max", np.double)])
+    catalogue = np.array([material_to_record(m, n_terms) for m in materials], dtype=dtype)
+    filename = os.path.join(path, catalogue_filename)
+    tmp_filename = "{0}.{1}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, "wb") as f:
+        np.save(f, catalogue)
+    os.replace(tmp_filename, filename)
+    logger.info("Compiled {0:d} materials to {1}".format(len(materials), filename))
+    return filename
+
+
+def material_catalogue_is_stale(path, catalogue_filename="catalogue.npy", index_filename="index.json"):
+    """
+    Check if the catalogue in a materials directory is missing, older than any of the xml files
+    or the index file, or does not contain the same set of materials as the directory.
+
+    :param path: Materials directory
+    :param catalogue_filename: Name of the catalogue file in the directory
+    :param index_filename: Name of the optional index file in the directory
+    :return: True if the catalogue needs to be compiled
+    """
+    filename = os.path.join(path, catalogue_filename)
+    try:
+        cat_mtime = os.path.getmtime(filename)
+    except OSError:
+        return True
+    index = read_material_index(path, index_filename)
+    index_file = os.path.join(path, index_filename)
+    if os.path.isfile(index_file) and os.path.getmtime(index_file) > cat_mtime:
+        return True
+    for mat_file in index.values():
+        if os.path.getmtime(os.path.join(path, mat_file)) > cat_mtime:
+            return True
+    names = set(str(name) for name in load_material_catalogue(filename)["name"])
+    return names != set(index.keys())
+
+
+def load_material_catalogue(filename):
+    """
+    Load a compiled material catalogue memory-mapped (read only).
+
+    :param filename: Catalogue .npy file
+    :return: Structured numpy array (memmap) with one record per material
+    """
+    return np.load(filename, mmap_mode="r")
+
+
+class MaterialRegistry(MutableMapping):
+    """
+    Dict-like collection of materials that parses material files on demand. Scanning a
+    directory only indexes the material names, either from a prebuilt index file
+    (see write_material_index) or from the xml filenames. The file is parsed and the material
+    object built the first time the material is looked up.
+
+    If use_catalogue is set, the directory is instead compiled to a binary catalogue
+    (see compile_material_catalogue) which is loaded memory-mapped, so processes share the pages
+    and no xml is parsed. The catalogue is recompiled when any source file is newer than it.
+    If the catalogue can not be written the xml files are used directly.
+
+    Iterating and listing the names does not load any materials.
+
+    Dispersion tables (see DispersionTable) are built on first use by get_dispersion_table, or
+    for all materials by build_dispersion_tables, over table_l_min - table_l_max.
+    """
+    index_filename = "index.json"
+    catalogue_filename = "catalogue.npy"
+
+    table_l_min = 200e-9
+    table_l_max = 2000e-9
+
+    def __init__(self, path=None, use_catalogue=True):
+        self.use_catalogue = use_catalogue
+        self._materials = {}
+        self._tables = {}
+        self._sources = {}
+        self._names = {}
+        if path is not None:
+            self.scan(path)
+
+    def scan(self, path):
+        """
+        Index the materials in a directory without parsing them. Materials with the same name
+        as an already registered material replace it.
+
+        :param path: Materials directory
+        :return: Number of indexed materials
+        """
+        if self.use_catalogue is True:
+            catalogue = None
+            try:
+                if material_catalogue_is_stale(path, self.catalogue_filename, self.index_filename):
+                    compile_material_catalogue(path, self.catalogue_filename, self.index_filename)
+                catalogue = load_material_catalogue(os.path.join(path, self.catalogue_filename))
+            except (IOError, OSError, ValueError) as e:
+                logger.warning("Could not use material catalogue in {0}: {1}".format(path, e))
+            if catalogue is not None:
+                for ind, name in enumerate(catalogue["name"]):
+                    self.register(str(name), catalogue[ind])
+                return catalogue.shape[0]
+        index = read_material_index(path, self.index_filename)
+        for name, mat_file in index.items():
+            self.register(name, os.path.join(path, mat_file))
+        return len(index)
+
+    def register(self, name, filename):
+        """
+        Register a material file to be parsed when the material is first used.
+
+        :param name: Material name
+        :param filename: xml file with the sellmeier coefficients, or a catalogue record
+        :return:
+        """
+        self._materials.pop(name, None)
+        self._tables.pop(name, None)
+        self._sources[name] = filename
+        self._names[name] = None
+
+    def is_loaded(self, name):
+        return name in self._materials
+
+    def get_dispersion_table(self, name):
+        """
+        Get the dispersion table of a material, building it if needed.
+
+        :param name: Material name
+        :return: DispersionTable
+        """
+        try:
+            return self._tables[name]
+        except KeyError:
+            pass
+        logger.debug("Building dispersion table for {0}".format(name))
+        table = DispersionTable(self[name], self.table_l_min, self.table_l_max)
+        self._tables[name] = table
+        return table
+
+    def build_dispersion_tables(self):
+        """
+        Build the dispersion tables of all materials. Materials that are not defined in the
+        table range are skipped.
+
+        :return: Number of tables
+        """
+        for name in self:
+            try:
+                self.get_dispersion_table(name)
+            except ValueError as e:
+                logger.warning(str(e))
+        return len(self._tables)
+
+    def __getitem__(self, name):
+        try:
+            return self._materials[name]
+        except KeyError:
+            pass
+        source = self._sources[name]
+        logger.debug("Loading material {0}".format(name))
+        if isinstance(source, str):
+            mat = read_material_file(source, name)
+        else:
+            mat = material_from_record(source)
+        self._materials[name] = mat
+        return mat
+
+    def __setitem__(self, name, material):
+        self._sources.pop(name, None)
+        self._tables.pop(name, None)
+        self._materials[name] = material
+        self._names[name] = None
+
+    def __delitem__(self, name):
+        del self._names[name]
+        self._materials.pop(name, None)
+        self._tables.pop(name, None)
+        self._sources.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
@@ -0,0 +1,156 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Pulse metrics calculated from sampled fields and intensities. All functions work along the last
+axis, so a stack of fields (e.g. from propagate_material_batch) is handled in one call and the
+results have the shape of the leading axes.
+
+The RMS duration is calculated from the spectral field alone (see get_rms_duration_spectral),
+so no inverse FFT is needed. Widths are in the units of the x vector, e.g. s or rad/s.
+"""
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+
+def _take_last(a, ind):
+    return np.take_along_axis(a, ind[..., np.newaxis], axis=-1)[..., 0]
+
+
+def _interpolate_crossing(x_a, x_b, I_a, I_b, level):
+    """
+    Position where the line through (x_a, I_a) and (x_b, I_b) crosses level. On a flat segment
+    (I_a == I_b, e.g. at the end of a trace) x_a is returned.
+    """
+    dI = np.asarray(I_b - I_a, dtype=np.double)
+    frac = np.divide(level - I_a, dI, out=np.zeros(dI.shape), where=dI != 0)
+    return x_a + frac * (x_b - x_a)
+
+
+def get_fwhm(I, x, periodic=False):
+    """
+    Full width at half maximum of intensity traces, with the half maximum crossings found by linear
+    interpolation between the samples. The outermost crossings are used, as for a trace with
+    several peaks.
+
+    :param I: Intensity array (... x N), not necessarily normalized
+    :param x: Sample positions (N), increasing
+    :param periodic: If True the trace is taken as periodic (e.g. the time window of an FFT), so a
+                     pulse wrapped around the ends is measured correctly. Otherwise NaN is returned
+                     when the half maximum level is not crossed before the ends.
+    :return: FWHM array with the leading shape of I
+    """
+    I = np.asarray(I)
+    x = np.asarray(x, dtype=np.double)
+    n = I.shape[-1]
+    half = I.max(axis=-1, keepdims=True) / 2
+    above = I >= half
+    if periodic is True and (np.any(above[..., 0]) or np.any(above[..., -1])):
+        # Move the peak to the center
+        shift = n // 2 - np.argmax(I, axis=-1)
+        ind = (np.arange(n) - shift[..., np.newaxis]) % n
+        I = np.take_along_axis(I, ind, axis=-1)
+        above = np.take_along_axis(above, ind, axis=-1)
+    first = np.argmax(above, axis=-1)
+    last = n - 1 - np.argmax(above[..., ::-1], axis=-1)
+    half = half[..., 0]
+    i0 = np.maximum(first - 1, 0)
+    i1 = np.minimum(last + 1, n - 1)
+    x_left = _interpolate_crossing(x[i0], x[first], _take_last(I, i0), _take_last(I, first), half)
+    x_right = _interpolate_crossing(x[last], x[i1], _take_last(I, last), _take_last(I, i1), half)
+    fwhm = np.where((first == 0) | (last == n - 1), np.nan, x_right - x_left)
+    return fwhm[()]
+
+
+def get_rms_width(I, x):
+    """
+    RMS width (standard deviation) of intensity traces, sqrt(<x**2> - <x>**2) with I as weight.
+
+    :param I: Intensity array (... x N)
+    :param x: Sample positions (N)
+    :return: RMS width array with the leading shape of I
+    """
+    I = np.asarray(I, dtype=np.double)
+    x = np.asarray(x, dtype=np.double)
+    norm = I.sum(axis=-1)
+    x_mean = np.dot(I, x) / norm
+    x2_mean = np.dot(I, x**2) / norm
+    return np.sqrt(np.maximum(x2_mean - x_mean**2, 0.0))
+
+
+def get_rms_duration_spectral(E_w, w):
+    """
+    RMS duration of the temporal intensity |E(t)|**2, calculated from the spectral field without
+    transforming to the time domain. The squared duration is the transform limited part
+    sum(|dA/dw|**2) / sum(A**2) plus the variance of the group delay dphi/dw weighted by the
+    spectral intensity, for E_w = A * exp(i*phi).
+
+    The group delay between samples is taken from the angle of E_w[k+1] * conj(E_w[k]), relative
+    to its weighted circular mean, so no phase unwrapping is needed and the result does not depend
+    on where the pulse is in the time window, as long as it fits in the window.
+
+    :param E_w: Spectral field (... x N) on the frequency grid w
+    :param w: Angular frequency vector (N), equidistant
+    :return: RMS duration array with the leading shape of E_w (s if w is in rad/s)
+    """
+    E_w = np.asarray(E_w)
+    dw = np.abs(w[1] - w[0])
+    A_w = np.abs(E_w).astype(np.double)
+    norm = np.sum(A_w**2, axis=-1)
+    var_tl = np.sum(np.diff(A_w, axis=-1)**2, axis=-1) / dw**2 / norm
+    prod = E_w[..., 1:] * np.conj(E_w[..., :-1])
+    p_w = np.abs(prod).astype(np.double)
+    # Rotate to the mean group delay, so the angles wrap half a window away from the pulse
+    z = np.sum(prod, axis=-1, keepdims=True)
+    gd_w = np.angle(prod * (np.conj(z) / np.abs(z))).astype(np.double) / dw
+    p_norm = p_w.sum(axis=-1, keepdims=True)
+    gd_mean = np.sum(p_w * gd_w, axis=-1, keepdims=True) / p_norm
+    var_gd = np.sum(p_w * (gd_w - gd_mean)**2, axis=-1) / p_norm[..., 0]
+    return np.sqrt(var_tl + var_gd)
+
+
+def get_strehl_ratio(E_t, E_w):
+    """
+    Peak intensity of the pulse relative to the transform limited pulse with the same spectrum.
+    With numpy FFT normalization (E_t = ifft(E_w)) the transform limited peak field is
+    sum(|E_w|) / N.
+
+    :param E_t: Temporal field (... x N)
+    :param E_w: Spectral field (... x N)
+    :return: Peak intensity ratio (<= 1) with the leading shape of the fields
+    """
+    n = E_w.shape[-1]
+    I_peak = np.max(np.abs(E_t)**2, axis=-1)
+    I_tl = (np.sum(np.abs(E_w), axis=-1) / n)**2
+    return I_peak / I_tl
+
+
+def get_pulse_metrics(E_w, w, E_t=None, t=None):
+    """
+    Calculate a set of pulse metrics. The spectral metrics and the RMS duration only need the
+    spectral field. FWHM duration and Strehl ratio are added if the temporal field is given.
+
+    :param E_w: Spectral field (... x N)
+    :param w: Angular frequency vector (N)
+    :param E_t: Temporal field (... x N), optional
+    :param t: Time vector (N), required with E_t
+    :return: Dict with rms_duration (s), rms_bandwidth (rad/s), fwhm_bandwidth (rad/s) and
+             tbp_rms (product of the RMS widths of the intensities, 0.5 for a gaussian).
+             With E_t also fwhm_duration (s), tbp_fwhm (fwhm_duration * fwhm_bandwidth / 2pi,
+             0.441 for a gaussian) and strehl.
+    """
+    I_w = np.abs(E_w)**2
+    metrics = {"rms_duration": get_rms_duration_spectral(E_w, w),
+               "rms_bandwidth": get_rms_width(I_w, w),
+               "fwhm_bandwidth": get_fwhm(I_w, w)}
+    metrics["tbp_rms"] = metrics["rms_duration"] * metrics["rms_bandwidth"]
+    if E_t is not None:
+        metrics["fwhm_duration"] = get_fwhm(np.abs(E_t)**2, t, periodic=True)
+        metrics["tbp_fwhm"] = metrics["fwhm_duration"] * metrics["fwhm_bandwidth"] / (2 * np.pi)
+        metrics["strehl"] = get_strehl_ratio(E_t, E_w)
+    return metrics
@@ -0,0 +1,158 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Measured spectra as input pulses. Spectra are given as intensity (and optionally spectral phase)
+versus wavelength, from arrays, CSV files or binary files, and are resampled onto the angular
+frequency grid of a DispersionCalculator with set_pulse_spectrum.
+
+Files with many acquisitions are read one spectrum at a time:
+
+    l, spectra = iter_spectra_binary("scan.npy", l)     # or iter_spectra_csv("scan.csv")
+    for result in dc.propagate_spectra(l, spectra, [("fs", 5e-3)]):
+        print(result["index"], result["duration"])
+
+Binary files are memory-mapped, so only the spectra that are read are loaded into memory.
+"""
+
+import numpy as np
+import csv
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+c = 299792458.0
+
+
+def resample_spectrum(l, I_l, w, phase=None):
+    """
+    Resample a spectrum measured versus wavelength onto an angular frequency grid. The intensity
+    per unit wavelength is converted to intensity per unit angular frequency with the Jacobian
+    |dl/dw| = l**2 / (2*pi*c), so the energy of the spectrum is kept. Points outside the measured
+    range are zero, and negative intensities (measurement noise) are clipped to zero.
+
+    :param l: Wavelength vector (m)
+    :param I_l: Spectral intensity per unit wavelength, same size as l
+    :param w: Absolute angular frequency vector (rad/s)
+    :param phase: Spectral phase (rad) versus wavelength, same size as l. Optional.
+    :return: Complex spectral field sqrt(I_w) * exp(1j * phase) on the w grid
+    """
+    l = np.asarray(l, dtype=np.double)
+    I_l = np.asarray(I_l, dtype=np.double)
+    order = np.argsort(l)
+    l = l[order]
+    # Wavelengths of the positive frequencies, the rest of the grid has no spectrum
+    pos = w > 0
+    l_w = 2 * np.pi * c / w[pos]
+    I_w = np.zeros(w.shape)
+    I_w[pos] = np.maximum(np.interp(l_w, l, I_l[order], left=0.0, right=0.0), 0.0) * l_w**2 / (2 * np.pi * c)
+    I_w = np.nan_to_num(I_w, nan=0.0)
+    if I_w[0] > 0 or I_w[-1] > 0:
+        logger.warning("The spectrum extends outside the frequency grid")
+    E_w = np.sqrt(I_w).astype(np.complex128)
+    if phase is not None:
+        E_w[pos] *= np.exp(1j * np.interp(l_w, l, np.asarray(phase, dtype=np.double)[order], left=0.0, right=0.0))
+    return E_w
+
+
+def spectrum_key(l, I_l, phase=None):
+    """
+    Content address of a measured spectrum, for the pulse parameters of the disk cache key.
+
+    :return: Hex digest string
+    """
+    h = hashlib.sha1()
+    for a in (l, I_l, phase):
+        if a is not None:
+            h.update(np.ascontiguousarray(a, dtype=np.double).tobytes())
+        h.update(b"|")
+    return h.hexdigest()
+
+
+def read_spectrum_csv(filename, l_unit=1e-9, delimiter=","):
+    """
+    Read a single spectrum from a CSV file with the columns wavelength, intensity and optionally
+    phase (rad). Lines that do not start with a number (headers, comments) are skipped.
+
+    :param filename: CSV file
+    :param l_unit: Unit of the wavelength column, e.g. 1e-9 for nm
+    :param delimiter: Column delimiter
+    :return: Tuple (l (m), I_l, phase or None)
+    """
+    rows = []
+    with open(filename, "r") as f:
+        for row in csv.reader(f, delimiter=delimiter):
+            try:
+                rows.append([float(value) for value in row if value.strip() != ""])
+            except ValueError:
+                continue
+    data = np.array(rows)
+    phase = data[:, 2] if data.shape[1] > 2 else None
+    return data[:, 0] * l_unit, data[:, 1], phase
+
+
+def iter_spectra_csv(filename, l_unit=1e-9, delimiter=","):
+    """
+    Read a multi-spectrum CSV file lazily. The first numeric row holds the wavelengths and each
+    following row one spectrum (intensity per wavelength). Lines that do not start with a number
+    are skipped.
+
+    :param filename: CSV file
+    :param l_unit: Unit of the wavelength row, e.g. 1e-9 for nm
+    :param delimiter: Column delimiter
+    :return: Tuple (l (m), generator of intensity arrays)
+    """
+    f = open(filename, "r")
+    reader = csv.reader(f, delimiter=delimiter)
+    l = None
+    for row in reader:
+        try:
+            l = np.array([float(value) for value in row if value.strip() != ""]) * l_unit
+            break
+        except ValueError:
+            continue
+    if l is None:
+        f.close()
+        raise ValueError("No wavelength row found in {0}".format(filename))
+
+    def spectra():
+        with f:
+            for row in reader:
+                try:
+                    I_l = np.array([float(value) for value in row if value.strip() != ""])
+                except ValueError:
+                    continue
+                if I_l.shape[0] != l.shape[0]:
+                    raise ValueError("Spectrum with {0} points, expected {1}".format(I_l.shape[0], l.shape[0]))
+                yield I_l
+    return l, spectra()
+
+
+def iter_spectra_binary(filename, l, dtype=np.float32, offset=0):
+    """
+    Read a binary multi-spectrum file lazily through a memory map. The file is either a 2-D
+    .npy array (spectra x wavelengths) or raw values of dtype, one spectrum of len(l) values after
+    the other, starting at offset bytes.
+
+    :param filename: .npy or raw binary file
+    :param l: Wavelength vector (m) of the spectra
+    :param dtype: Value type of a raw file
+    :param offset: Header size of a raw file (bytes)
+    :return: Tuple (l (m), generator of intensity arrays)
+    """
+    l = np.asarray(l, dtype=np.double)
+    if filename.endswith(".npy"):
+        data = np.load(filename, mmap_mode="r")
+    else:
+        data = np.memmap(filename, dtype=dtype, mode="r", offset=offset)
+        data = data[:data.shape[0] - data.shape[0] % l.shape[0]].reshape(-1, l.shape[0])
+    if data.shape[-1] != l.shape[0]:
+        raise ValueError("Spectra with {0} points, expected {1}".format(data.shape[-1], l.shape[0]))
+
+    def spectra():
+        for ind in range(data.shape[0]):
+            yield np.array(data[ind], dtype=np.double)
+    return l, spectra()
@@ -0,0 +1,249 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Parameter sweeps over pulse parameters and material stack thicknesses, run in parallel over
+a process or thread pool with one DispersionCalculator per worker.
+
+Example, finding the fs + sapphire_o thicknesses giving the shortest pulse:
+
+    points = make_sweep_grid({"fwhm": 50e-15, "l_0": 800e-9, "t_span": 4e-12, "n": 8192},
+                             [("fs", np.linspace(0, 10e-3, 21)), ("sapphire_o", np.linspace(0, 5e-3, 11))])
+    runner = SweepRunner(results_file="sweep.jsonl", progress=print_progress)
+    best = min(runner.run(points), key=lambda r: r["duration"])
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import itertools
+import threading
+import json
+import os
+import logging
+
+from dispersion_cache import content_key
+from dispersion_calc import DispersionCalculator
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+# Calculator of the current worker (process or thread), created by _init_worker
+_worker_state = threading.local()
+
+
+def make_sweep_grid(pulse_grid, stack_grid):
+    """
+    Build the list of sweep points as the cartesian product of pulse parameters and material
+    thicknesses.
+
+    :param pulse_grid: Dict of generate_pulse arguments (fwhm, l_0, t_span, n, duration_domain)
+                       to a value or a list of values
+    :param stack_grid: List of (name, thicknesses) tuples, the stack order is kept. thicknesses is
+                       a value or a list of values (SI units)
+    :return: List of dicts with pulse (generate_pulse arguments), stack (list of [name, thickness])
+             and key (content key of the point, used for resuming)
+    """
+    pulse_names = list(pulse_grid.keys())
+    pulse_values = [np.atleast_1d(pulse_grid[name]).tolist() for name in pulse_names]
+    names = [name for name, thicknesses in stack_grid]
+    thickness_values = [np.atleast_1d(thicknesses).tolist() for name, thicknesses in stack_grid]
+    points = []
+    for pulse_point in itertools.product(*pulse_values):
+        pulse = dict(zip(pulse_names, pulse_point))
+        if "n" in pulse:
+            pulse["n"] = int(pulse["n"])
+        for stack_point in itertools.product(*thickness_values):
+            stack = [[name, thickness] for name, thickness in zip(names, stack_point)]
+            points.append({"pulse": pulse, "stack": stack, "key": content_key(pulse, stack)})
+    return points
+
+
+def _init_worker(calc_kwargs):
+    """
+    Pool initializer, creating the calculator used for all chunks in this worker.
+    The materials are read from the catalogue, which is memory-mapped and so shared between
+    the workers.
+
+    :param calc_kwargs: DispersionCalculator constructor arguments
+    :return:
+    """
+    logger.debug("Initializing sweep worker {0}".format(os.getpid()))
+    _worker_state.calculator = DispersionCalculator(**calc_kwargs)
+
+
+def _run_chunk(points, orders=4, traces=False):
+    """
+    Calculate a chunk of sweep points with the worker calculator. The pulse is only regenerated
+    when the pulse parameters change, so consecutive points reuse the cached k(w).
+
+    :param points: List of sweep points, see make_sweep_grid
+    :param orders: Number of orders in the spectral phase expansion
+    :param traces: If True, include the temporal and spectral intensity traces
+    :return: List of result dicts, the point with the results added
+    """
+    dc = _worker_state.calculator
+    results = []
+    pulse = None
+    for point in points:
+        if point["pulse"] != pulse:
+            pulse = point["pulse"]
+            dc.generate_pulse(**pulse)
+        else:
+            dc.reset_propagation()
+        dc.propagate_stack(point["stack"])
+        result = dict(point)
+        result["duration"] = float(dc.get_pulse_duration("temporal"))
+        result["bandwidth"] = float(dc.get_pulse_duration("spectral"))
+        result["dispersion"] = dc.get_dispersion(point["stack"], orders=orders).tolist()
+        try:
+            result["phase_expansion"] = dc.get_spectral_phase_expansion(orders).tolist()
+        except (TypeError, ValueError, np.linalg.LinAlgError):
+            result["phase_expansion"] = None
+        if traces is True:
+            result["t"] = dc.get_t().tolist()
+            result["I_t"] = dc.get_temporal_intensity(True).tolist()
+            result["w"] = dc.get_w().tolist()
+            result["I_w"] = dc.get_spectral_intensity(True).tolist()
+        results.append(result)
+    return results
+
+
+def read_results(filename):
+    """
+    Read a results file written by SweepRunner (one json result per line). An incomplete last
+    line, e.g. from an interrupted sweep, is skipped.
+
+    :param filename: Results file
+    :return: List of result dicts, empty if the file does not exist
+    """
+    results = []
+    if not os.path.isfile(filename):
+        return results
+    with open(filename, "r") as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping incomplete line in {0}".format(filename))
+    return results
+
+
+def print_progress(done, total):
+    print("{0}/{1} points done".format(done, total))
+
+
+class SweepRunner(object):
+    """
+    Run sweep points (see make_sweep_grid) over a process pool, or a thread pool with
+    executor='thread'. The points are split in chunks
+    of chunk_size that are calculated in turn by the workers, each worker holding one
+    DispersionCalculator created with calc_kwargs. Results are yielded as the chunks finish,
+    so the order is not that of the points.
+
+    If results_file is set, each finished result is appended to it as a json line. Points
+    already in the file are skipped when the sweep is run again, so an interrupted sweep
+    can be resumed.
+
+    The progress callback is called as progress(done, total) after each chunk, counting
+    the points resumed from the file as done.
+
+    With workers=0 the sweep is run in the calling process, which is useful for debugging.
+    """
+    def __init__(self, workers=None, chunk_size=16, results_file=None, calc_kwargs=None, orders=4, traces=False,
+                 progress=None, executor="process"):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.results_file = results_file
+        self.calc_kwargs = dict(calc_kwargs or {})
+        self.orders = orders
+        self.traces = traces
+        self.progress = progress
+        if executor not in ("process", "thread"):
+            raise ValueError("Unknown executor {0}, use 'process' or 'thread'".format(executor))
+        self.executor = executor
+
+    def get_pending(self, points):
+        """
+        Remove the points that already have results in the results file.
+
+        :param points: List of sweep points
+        :return: Tuple (pending points, number of done points)
+        """
+        if self.results_file is None:
+            return list(points), 0
+        done_keys = set(result["key"] for result in read_results(self.results_file))
+        pending = [point for point in points if point["key"] not in done_keys]
+        return pending, len(points) - len(pending)
+
+    def _chunks(self, points):
+        for ind in range(0, len(points), self.chunk_size):
+            yield points[ind:ind + self.chunk_size]
+
+    def _store(self, results, f, done, total):
+        if f is not None:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def run(self, points):
+        """
+        Run the sweep, yielding result dicts as they are calculated. Each result holds the
+        point (key, pulse, stack and any other fields), the temporal duration and spectral width
+        (FWHM, see get_pulse_duration), the stack dispersion [GD, GDD, TOD, FOD] (see
+        get_dispersion), the spectral phase expansion and optionally the intensity traces.
+
+        :param points: List of sweep points, see make_sweep_grid
+        :return: Generator of result dicts
+        """
+        logger.debug("Entering run, {0} points".format(len(points)))
+        total = len(points)
+        pending, done = self.get_pending(points)
+        if done > 0:
+            logger.info("Resuming sweep, {0} of {1} points already done".format(done, total))
+        # The calculator in this process compiles the material catalogue before the workers load it
+        _init_worker(self.calc_kwargs)
+        f = None
+        if self.results_file is not None:
+            f = open(self.results_file, "a+")
+            # Start on a new line after an incomplete last line of an interrupted sweep
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                if f.read(1) != "\n":
+                    f.write("\n")
+        try:
+            if self.workers == 0:
+                for chunk in self._chunks(pending):
+                    results = _run_chunk(chunk, self.orders, self.traces)
+                    done += len(results)
+                    self._store(results, f, done, total)
+                    for result in results:
+                        yield result
+                return
+            if self.executor == "thread":
+                pool = ThreadPoolExecutor
+            else:
+                pool = ProcessPoolExecutor
+            with pool(max_workers=self.workers, initializer=_init_worker, initargs=(self.calc_kwargs,)) as executor:
+                chunks = self._chunks(pending)
+                running = set()
+                # Keep a bounded number of chunks in flight
+                for chunk in itertools.islice(chunks, 2 * self.workers):
+                    running.add(executor.submit(_run_chunk, chunk, self.orders, self.traces))
+                while running:
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        results = future.result()
+                        done += len(results)
+                        self._store(results, f, done, total)
+                        for result in results:
+                            yield result
+                        for chunk in itertools.islice(chunks, 1):
+                            running.add(executor.submit(_run_chunk, chunk, self.orders, self.traces))
+        finally:
+            if f is not None:
+                f.close()
@@ -0,0 +1,111 @@
+"""
+Created on 18 Oct 2026
+
+@author: Filip Lindau
+
+Qt independent parts of the GUI propagation worker. LatestRequest coalesces requests between
+the GUI thread and the worker thread, and PropagationRunner calculates the result of a request
+with its own DispersionCalculator. The GUI wraps them in a QObject living in a worker thread
+(PropagationWorker in dispersion_calc_gui.py).
+"""
+
+import numpy as np
+import threading
+import logging
+
+from dispersion_calc import DispersionCalculator
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.CRITICAL)
+
+# Number of points in the zoomed temporal view
+zoom_points = 2048
+
+
+class LatestRequest(object):
+    """
+    Thread safe slot holding the latest request. submit stores a request, replacing one that
+    has not been taken yet, and take returns the most recent request (or None) and clears the
+    slot. Replaced requests are counted in dropped.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = None
+        self.dropped = 0
+
+    def submit(self, request):
+        """
+        Store a request, replacing any request that has not been taken.
+
+        :param request: Request dict
+        :return: True if a pending request was replaced
+        """
+        with self.lock:
+            replaced = self.pending is not None
+            if replaced is True:
+                self.dropped += 1
+            self.pending = request
+        return replaced
+
+    def take(self):
+        """
+        Take the latest request.
+
+        :return: Request dict, or None if there is no pending request
+        """
+        with self.lock:
+            request = self.pending
+            self.pending = None
+        return request
+
+
+class PropagationRunner(object):
+    """
+    Calculates GUI propagation requests. The pulse is only regenerated when the pulse parameters
+    change, table edits update the stack incrementally with set_stack.
+
+    A request is a dict with id, fwhm, duration_domain, l_0, t_span, n, auto_grid, zoom and
+    material_list. The result is the request with the plot traces, durations and dispersion added.
+    """
+    def __init__(self, calc_kwargs=None):
+        self.dc = DispersionCalculator(**(calc_kwargs or {}))
+        self.pulse = None
+        self.initial_widths = None
+
+    def propagate(self, request):
+        logger.debug("Entering propagate {0}".format(request["id"]))
+        dc = self.dc
+        result = dict(request)
+        material_list = request["material_list"]
+        l_0 = request["l_0"]
+        if request["auto_grid"] is True:
+            grid = dc.get_auto_grid(request["fwhm"], l_0, material_list, request["duration_domain"])
+            result["t_span"] = grid["t_span"]
+            result["n"] = grid["N"]
+        # Only the pulse parameters force a new pulse. Table edits update the stack incrementally.
+        pulse = (request["fwhm"], l_0, result["t_span"], result["n"], request["duration_domain"])
+        if pulse != self.pulse:
+            dc.generate_pulse(*pulse)
+            self.pulse = pulse
+            self.initial_widths = (dc.get_pulse_duration('temporal'),
+                                   dc.get_pulse_duration('spectral') * l_0**2 / (2 * np.pi * dc.c))
+        result["initial_duration"], result["initial_spectral_width"] = self.initial_widths
+        dc.set_stack(material_list)
+        logger.debug("Propagation complete")
+        if request["zoom"] is True:
+            result["t"], result["I_t"] = dc.get_temporal_intensity_zoom(n=zoom_points)
+            result["duration"] = dc.get_pulse_duration("temporal", zoom_points=zoom_points)
+        else:
+            result["t"] = dc.get_t()
+            result["I_t"] = dc.get_temporal_intensity(True)
+            result["duration"] = dc.get_pulse_duration("temporal")
+        result["l"] = 2 * np.pi * dc.c / dc.get_w()
+        result["I_w"] = dc.get_spectral_intensity(True)
+        w = dc.get_w()
+        ph = dc.get_spectral_phase(True)
+        good_ind = np.isfinite(ph)
+        result["w_phase"] = w[good_ind]
+        result["phase"] = ph[good_ind]
+        # Dispersion orders from the material derivatives at the central wavelength
+        result["dispersion"] = dc.get_dispersion(material_list, l_0)
+        return result
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispersion_calc import DispersionCalculator  # noqa: E402
+
+
+@pytest.fixture
+def make_calculator():
+    """
+    Factory for calculators with a gaussian pulse. fwhm, l_0, t_span and n are the pulse
+    parameters, the other keyword arguments are passed to DispersionCalculator.
+    """
+    def make(fwhm=30e-15, l_0=800e-9, t_span=4e-12, n=4096, **kwargs):
+        dc = DispersionCalculator(fwhm, l_0, t_span, **kwargs)
+        dc.generate_pulse(fwhm, l_0, t_span, n)
+        return dc
+    return make
@@ -0,0 +1,28 @@
+from dispersion_calc import DispersionCalculator
+
+
+def reference_duration(fwhm, stack):
+    dc = DispersionCalculator(fwhm, 800e-9, 20e-12)
+    dc.generate_pulse(fwhm, 800e-9, 20e-12, 2**16)
+    dc.propagate_stack(stack)
+    return dc.get_pulse_duration()
+
+
+def test_auto_grid_duration_within_error():
+    for fwhm, stack in [(30e-15, []), (30e-15, [("fs", 0.1e-3)]), (30e-15, [("bk7", 10e-3)]),
+                        (10e-15, [("sf10", 5e-3)])]:
+        dc = DispersionCalculator(fwhm, 800e-9, 2e-12)
+        grid = dc.generate_pulse_auto_grid(fwhm, 800e-9, stack)
+        assert grid["duration"] / grid["dt"] >= 16
+        assert grid["error"] == grid["truncation_error"] + grid["sampling_error"]
+        dc.propagate_stack(stack)
+        t_ref = reference_duration(fwhm, stack)
+        assert abs(dc.get_pulse_duration() / t_ref - 1) <= grid["error"] + 1e-4
+
+
+def test_auto_grid_samples_per_fwhm():
+    dc = DispersionCalculator(30e-15, 800e-9, 2e-12)
+    coarse = dc.get_auto_grid(30e-15, 800e-9, [], samples_per_fwhm=4)
+    fine = dc.get_auto_grid(30e-15, 800e-9, [], samples_per_fwhm=64)
+    assert fine["N"] > coarse["N"]
+    assert fine["sampling_error"] < coarse["sampling_error"] < 0.05
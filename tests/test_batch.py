@@ -0,0 +1,28 @@
+import numpy as np
+
+names = ["fs", "bk7", "sf10"]
+
+
+def test_batch_matches_propagate_stack(make_calculator):
+    thicknesses = np.random.default_rng(0).uniform(0, 3e-3, (10, len(names)))
+    for n, kwargs in [(4096, {}), (4097, {}), (4096, {"support_threshold": 1e-12})]:
+        dc = make_calculator(n=n, **kwargs)
+        E_t_batch, E_w_batch = dc.propagate_material_batch(names, thicknesses)
+        E_t_chunk, E_w_chunk = dc.propagate_material_batch(names, thicknesses, chunk_size=3)
+        assert np.abs(E_w_chunk - E_w_batch).max() < 1e-9 * np.abs(E_w_batch).max()
+        assert np.abs(E_t_chunk - E_t_batch).max() < 1e-9 * np.abs(E_t_batch).max()
+        for row, E_t in zip(thicknesses, E_t_batch):
+            dc.reset_propagation()
+            dc.propagate_stack(list(zip(names, row)))
+            assert np.abs(E_t - dc.E_t_out).max() < 1e-9 * np.abs(dc.E_t_out).max()
+
+
+def test_batch_single_precision(make_calculator):
+    thicknesses = np.random.default_rng(1).uniform(0, 10e-3, (5, len(names)))
+    dc = make_calculator(dtype=np.complex64)
+    E_t_batch, E_w_batch = dc.propagate_material_batch(names, thicknesses)
+    assert E_t_batch.dtype == np.complex64 and E_w_batch.dtype == np.complex64
+    for row, E_t in zip(thicknesses, E_t_batch):
+        dc.reset_propagation()
+        dc.propagate_stack(list(zip(names, row)))
+        assert np.abs(E_t - dc.E_t_out).max() < 1e-4 * np.abs(dc.E_t_out).max()
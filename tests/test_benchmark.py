@@ -0,0 +1,35 @@
+import time
+
+import numpy as np
+
+from dispersion_calc_benchmark import time_function, measure, benchmark_suite, compare_results
+
+
+def test_time_function_setup():
+    calls = []
+    t_min = time_function(lambda: (calls.append("f"), time.sleep(0.01)), 3, lambda: calls.append("setup"))
+    assert calls == ["setup", "f"] * 3
+    assert 0.01 <= t_min < 0.1
+
+
+def test_measure():
+    calls = []
+
+    def f():
+        calls.append("f")
+        return np.ones(1000000)
+    t_min, peak = measure(f, lambda: calls.append("setup"), 2)
+    # Two timed calls and one traced call, each after the setup
+    assert calls == ["setup", "f"] * 3
+    assert t_min > 0
+    assert peak >= 8e6
+
+
+def test_compare_results():
+    base = benchmark_suite([2**10], repeats=1, stack=[("fs", 1e-3)])
+    new = {"meta": base["meta"], "benchmarks": dict((key, dict(b)) for key, b in base["benchmarks"].items())}
+    assert "load_materials" in base["benchmarks"] and "load_materials_xml" in base["benchmarks"]
+    assert compare_results(base, new) == []
+    new["benchmarks"]["propagate_stack[N=1024]"]["time"] *= 2
+    regressions = compare_results(base, new)
+    assert [(key, quantity) for key, quantity, b, r in regressions] == [("propagate_stack[N=1024]", "time")]
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from dispersion_cache import WavenumberCache
+from dispersion_calc import DispersionCalculator
+
+
+def test_lru_eviction_and_counters():
+    a = np.zeros(100)
+    cache = WavenumberCache(max_bytes=2.5 * a.nbytes)
+    cache.put(("a", 1), a.copy())
+    cache.put(("b", 1), a.copy())
+    assert cache.get(("a", 1)) is not None
+    cache.put(("c", 1), a.copy())
+    assert ("b", 1) not in cache
+    assert ("a", 1) in cache and ("c", 1) in cache
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 0, 1)
+    assert cache.get(("b", 1)) is None
+    assert cache.misses == 1
+    assert cache.nbytes == 2 * a.nbytes
+    with pytest.raises(ValueError):
+        cache.get(("a", 1))[0] = 1.0
+
+
+def test_calculator_reuses_and_invalidates_k():
+    dc = DispersionCalculator(30e-15, 800e-9, 4e-12)
+    dc.generate_pulse(30e-15, 800e-9, 4e-12, 4096)
+    dc.propagate_material("bk7", 1e-3)
+    dc.propagate_material("bk7", 1e-3)
+    assert (dc.k_cache.misses, dc.k_cache.hits) == (1, 1)
+    k_w = dc.get_k_w("bk7")
+    assert np.array_equal(k_w, (dc.w + dc.w_0) * dc.evaluate_material("bk7", dc.w + dc.w_0) / dc.c,
+                          equal_nan=True)
+
+    # A new grid drops the entries of the old grid
+    dc.generate_pulse(30e-15, 800e-9, 4e-12, 2048)
+    assert len(dc.k_cache) == 0
+    # Changing a material drops its entries
+    dc.propagate_material("bk7", 1e-3)
+    dc.propagate_material("fs", 1e-3)
+    dc.add_material("bk7", [1.0, 0.2, 1.0], [0.006, 0.02, 100.0])
+    assert len(dc.k_cache) == 1
+    dc.reset_propagation()
+    dc.propagate_material("bk7", 1e-3)
+    n = np.sqrt(1 + sum([b * l**2 / (l**2 - c) for b, c, l in
+                         zip([1.0, 0.2, 1.0], [0.006, 0.02, 100.0], [0.8] * 3)]))
+    assert abs(dc.get_k_w("bk7")[dc.N // 2] - dc.w_0 * n / dc.c) < 1e-9 * dc.w_0 * n / dc.c
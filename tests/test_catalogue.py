@@ -0,0 +1,49 @@
+import os
+import shutil
+
+import numpy as np
+
+from dispersion_materials import MaterialRegistry, compile_material_catalogue, load_material_catalogue, \
+    material_catalogue_is_stale, read_material_file
+
+materials_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "materials")
+
+
+def copy_materials(path):
+    for mat_file in os.listdir(materials_path):
+        if mat_file.endswith(".xml"):
+            shutil.copy(os.path.join(materials_path, mat_file), str(path))
+
+
+def test_catalogue_matches_xml(tmp_path):
+    copy_materials(tmp_path)
+    assert material_catalogue_is_stale(str(tmp_path))
+    filename = compile_material_catalogue(str(tmp_path))
+    assert not material_catalogue_is_stale(str(tmp_path))
+    catalogue = load_material_catalogue(filename)
+    assert isinstance(catalogue, np.memmap)
+    registry = MaterialRegistry(str(tmp_path))
+    w = 2 * np.pi * 299792458.0 / np.linspace(300e-9, 1900e-9, 50)
+    for name in registry:
+        n_xml = read_material_file(str(tmp_path / (name + ".xml")), name)(w)
+        assert np.array_equal(registry[name](w), n_xml, equal_nan=True), name
+
+
+def test_catalogue_rebuilt_when_stale(tmp_path):
+    copy_materials(tmp_path)
+    filename = compile_material_catalogue(str(tmp_path))
+    mtime = os.path.getmtime(filename)
+    xml_file = str(tmp_path / "bk7.xml")
+    with open(xml_file, "r") as f:
+        text = f.read()
+    with open(xml_file, "w") as f:
+        f.write(text.replace("1.03961212", "1.1"))
+    os.utime(filename, (mtime - 10, mtime - 10))
+    assert material_catalogue_is_stale(str(tmp_path))
+    registry = MaterialRegistry(str(tmp_path))
+    assert not material_catalogue_is_stale(str(tmp_path))
+    assert registry["bk7"].b_coeff[0] == 1.1
+    # A new xml file is picked up as well
+    shutil.copy(xml_file, str(tmp_path / "bk7_copy.xml"))
+    os.utime(str(tmp_path / "bk7_copy.xml"), (mtime - 20, mtime - 20))
+    assert "bk7_copy" in MaterialRegistry(str(tmp_path))
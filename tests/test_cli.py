@@ -0,0 +1,62 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import dispersion_cli
+
+
+def write_jobs(path):
+    jobs = {"defaults": {"fwhm": 50e-15, "l_0": 800e-9, "t_span": 4e-12, "n": 4096},
+            "jobs": [{"name": "fs", "stack": [["fs", 5e-3]]},
+                     {"name": "pair", "stack": [{"material": "bk7", "thickness": 2e-3}, ["fs", 1e-3]]},
+                     {"name": "empty", "stack": []}]}
+    filename = str(path / "jobs.json")
+    with open(filename, "w") as f:
+        json.dump(jobs, f)
+    return filename
+
+
+def test_cli_outside_repo_directory(tmp_path, monkeypatch):
+    jobs = write_jobs(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    output = str(tmp_path / "out.npz")
+    assert dispersion_cli.main([jobs, "-o", output, "--mode", "serial", "--traces"]) == 0
+    data = np.load(output)
+    assert list(data["name"]) == ["fs", "pair", "empty"]
+    assert data["I_t"].shape == (3, 4096)
+    # The empty stack keeps the transform limited duration and has no dispersion
+    assert abs(data["duration"][2] - 50e-15) < 0.5e-15
+    assert data["gdd"][2] == 0
+    assert data["duration"][0] > data["duration"][2]
+
+
+def test_cli_modes_agree(tmp_path):
+    jobs = write_jobs(tmp_path)
+    results = {}
+    for mode in ("serial", "thread"):
+        output = str(tmp_path / "{0}.csv".format(mode))
+        dispersion_cli.main([jobs, "-o", output, "--mode", mode, "--workers", "2"])
+        with open(output) as f:
+            results[mode] = f.read()
+    assert results["serial"] == results["thread"]
+
+
+def test_parse_stack_string():
+    assert dispersion_cli.parse_stack("bk7:10e-3; fs:5e-3") == [["bk7", 10e-3], ["fs", 5e-3]]
+
+
+def test_cli_unknown_material(tmp_path, capsys):
+    filename = str(tmp_path / "jobs.csv")
+    with open(filename, "w") as f:
+        f.write("name,stack\ngood,fs:1e-3\ntypo,fs:1e-3;bk77:2e-3\n")
+    output = str(tmp_path / "out.csv")
+    with pytest.raises(SystemExit) as e:
+        dispersion_cli.main([filename, "-o", output, "--mode", "serial"])
+    assert e.value.code != 0
+    err = capsys.readouterr().err
+    assert "bk77" in err and "typo" in err
+    assert not os.path.exists(output)
+    # Without a materials dict the job file is read unchecked
+    assert len(dispersion_cli.read_jobs(filename)) == 2
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from dispersion_cache import DiskCache
+
+stack = [("fs", 5e-3), ("bk7", 10e-3)]
+
+
+def test_disk_cache_restores_fields(tmp_path, make_calculator):
+    dc_ref = make_calculator()
+    dc_ref.propagate_stack(stack)
+    cache = DiskCache(str(tmp_path))
+    make_calculator(disk_cache=cache).propagate_stack(stack)
+    assert cache.get_stats()["entries"] == 1 and cache.misses == 1
+    for kwargs in [{}, {"lazy_propagation": True}, {"workspace": True}]:
+        dc = make_calculator(disk_cache=cache, **kwargs)
+        dc.propagate_stack(stack)
+        assert np.abs(dc.E_w_out - dc_ref.E_w_out).max() < 1e-9 * np.abs(dc_ref.E_w_out).max()
+        assert np.abs(dc.E_t_out - dc_ref.E_t_out).max() < 1e-9 * np.abs(dc_ref.E_t_out).max()
+        assert dc.propagation_list == stack
+    assert cache.hits == 3
+
+
+def test_disk_cache_stores_phase_only(tmp_path, make_calculator):
+    cache = DiskCache(str(tmp_path))
+    dc = make_calculator(disk_cache=cache, support_threshold=1e-12)
+    dc.propagate_stack(stack)
+    data = cache.get(dc.get_state_key())
+    assert list(data.keys()) == ["phase_w_out"]
+    assert np.array_equal(data["phase_w_out"], dc.phase_w_out)
+    # Zero phase outside the support compresses well
+    assert cache.nbytes < dc.N * 8 / 4
+
+
+def test_disk_cache_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=2500, compress=False)
+    for ind in range(4):
+        cache.put("key{0}".format(ind), x=np.zeros(100))
+        os.utime(cache._filename("key{0}".format(ind)), (ind, ind))
+    assert cache.evictions == 2
+    assert cache.get("key0") is None and cache.get("key3") is not None
+    assert cache.nbytes <= 2500
@@ -0,0 +1,45 @@
+import numpy as np
+
+from dispersion_calc import DispersionCalculator
+from dispersion_materials import _derivative_stencil
+
+# Dispersion per mm at 800 nm: GD (fs), GDD (fs^2), TOD (fs^3), from the Sellmeier formulas
+# (Schott N-BK7 and Malitson fused silica)
+reference = {"bk7": (5092.4, 44.652, 32.10), "fs": (4893.9, 36.162, 27.50)}
+
+
+def test_stencil_is_exact_for_polynomials():
+    stencil = _derivative_stencil(9, 4)
+    x = np.arange(9) - 4.0
+    for n in range(9):
+        d = np.dot(stencil, x**n)
+        expected = np.zeros(5)
+        if n <= 4:
+            expected[n] = np.prod(np.arange(1, n + 1))
+        assert np.abs(d - expected).max() < 1e-9 * max(1, np.abs(x**n).max())
+
+
+def test_material_dispersion_reference():
+    dc = DispersionCalculator(30e-15, 800e-9, 4e-12)
+    for use_tables in (True, False):
+        for name, (gd, gdd, tod) in reference.items():
+            disp = dc.get_dispersion([(name, 1e-3)], 800e-9, use_tables=use_tables)
+            assert abs(disp[0] * 1e15 / gd - 1) < 1e-4
+            assert abs(disp[1] * 1e30 / gdd - 1) < 1e-4
+            assert abs(disp[2] * 1e45 / tod - 1) < 1e-3
+
+
+def test_dispersion_matches_propagated_phase():
+    dc = DispersionCalculator(30e-15, 800e-9, 4e-12)
+    dc.generate_pulse(30e-15, 800e-9, 4e-12, 8192)
+    stack = [("bk7", 10e-3), ("fs", 5e-3), ("sf10", 2e-3)]
+    dc.propagate_stack(stack)
+    disp = dc.get_dispersion()
+    assert np.array_equal(disp, dc.get_dispersion(stack))
+    assert np.allclose(dc.get_dispersion(stack, per_material=True).sum(axis=0), disp, rtol=1e-12, atol=0)
+    # Taylor coefficients of the accumulated phase k(w)*L around w_0
+    good = np.abs(dc.w) < 0.1e15
+    p = np.polyfit(dc.w[good] * 1e-15, dc.phase_w_out[good], 8)[::-1]
+    assert abs(p[1] * 1e-15 / disp[0] - 1) < 1e-6
+    assert abs(2 * p[2] * 1e-30 / disp[1] - 1) < 1e-4
+    assert abs(6 * p[3] * 1e-45 / disp[2] - 1) < 1e-2
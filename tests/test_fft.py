@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from dispersion_calc import DispersionCalculator
+from dispersion_fft import FFTBackend, get_fft_backend, numpy_fft_out, pyfftw
+
+
+def backends():
+    names = ["numpy", "scipy"]
+    if pyfftw is not None:
+        names.append("pyfftw")
+    return names
+
+
+@pytest.mark.parametrize("name", backends())
+def test_backend_matches_numpy(name):
+    rng = np.random.default_rng(0)
+    backend = get_fft_backend(name)
+    for shape in [(4096,), (4097,), (8, 1024)]:
+        x = rng.standard_normal(shape) + 1j * rng.standard_normal(shape)
+        assert np.allclose(backend.fft(x), np.fft.fft(x), rtol=0, atol=1e-9)
+        out = np.empty_like(x)
+        assert backend.ifft(x, out=out) is out
+        assert np.allclose(out, np.fft.ifft(x), rtol=0, atol=1e-12)
+        x_r = x.real.copy()
+        assert np.allclose(backend.fft_real(x_r), np.fft.fft(x_r), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("name", backends())
+def test_backend_propagation(name):
+    stack = [("bk7", 10e-3), ("fs", 5e-3)]
+    results = []
+    for backend in ("numpy", name):
+        dc = DispersionCalculator(30e-15, 800e-9, 4e-12, fft_backend=backend)
+        dc.generate_pulse(30e-15, 800e-9, 4e-12, 8192)
+        dc.propagate_stack(stack)
+        results.append(dc.get_temporal_intensity())
+    assert np.abs(results[0] - results[1]).max() < 1e-12
+
+
+def test_backend_selection():
+    dc = DispersionCalculator(fft_backend="scipy", workers=2)
+    assert dc.fft_backend.name == "scipy" and dc.fft_backend.workers == 2
+    backend = get_fft_backend("numpy")
+    assert get_fft_backend(backend) is backend
+    assert isinstance(backend, FFTBackend)
+    with pytest.raises(ValueError):
+        get_fft_backend("fftpack")
+    assert numpy_fft_out == (np.lib.NumpyVersion(np.__version__) >= "2.0.0")
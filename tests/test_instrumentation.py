@@ -0,0 +1,77 @@
+import numpy as np
+
+from dispersion_calc import DispersionCalculator
+from dispersion_instrumentation import InstrumentationStats, InstrumentedFFTBackend
+
+stack = [("fs", 1e-3), ("bk7", 1e-3), ("fs", 2e-3)]
+
+
+def counts(stats):
+    return dict((stage, s["count"]) for stage, s in stats.get_stats().items())
+
+
+def test_stage_counts(make_calculator):
+    dc = make_calculator()
+    stats = dc.enable_instrumentation()
+    dc.propagate_stack(stack)
+    # fs is evaluated once and then read from the k cache, each material is one phase multiply and one ifft
+    assert counts(stats) == {"material": 2, "phase": 3, "ifft": 3}
+    assert stats.get_stats()["ifft"]["mean_size"] == 4096
+    dc.get_spectral_phase()
+    dc.get_spectral_phase_expansion()
+    assert counts(stats)["unwrap"] == 2
+    assert counts(stats)["polyfit"] >= 1
+    report = stats.report()
+    for stage in ["material", "phase", "ifft", "unwrap", "polyfit"]:
+        assert stage in report
+
+
+def test_hook(make_calculator):
+    calls = []
+    dc = make_calculator()
+    stats = dc.enable_instrumentation(hook=lambda stage, elapsed, size: calls.append((stage, elapsed, size)))
+    dc.propagate_stack(stack)
+    assert len(calls) == sum(counts(stats).values())
+    assert [stage for stage, elapsed, size in calls].count("ifft") == 3
+    assert all([elapsed >= 0 for stage, elapsed, size in calls])
+    assert abs(sum([elapsed for stage, elapsed, size in calls]) -
+               sum([s["total_time"] for s in stats.get_stats().values()])) < 1e-12
+
+
+def test_disable_removes_wrappers(make_calculator):
+    dc = make_calculator()
+    backend = dc.fft_backend
+    stats = dc.enable_instrumentation()
+    assert isinstance(dc.fft_backend, InstrumentedFFTBackend)
+    assert "evaluate_material" in vars(dc)
+    assert dc.disable_instrumentation() is stats
+    assert dc.stats is None
+    assert dc.fft_backend is backend
+    for name in DispersionCalculator.instrumented_methods:
+        assert name not in vars(dc)
+    dc.propagate_stack(stack)
+    assert stats.get_stats() == {}
+    assert dc.disable_instrumentation() is None
+
+
+def test_instrumented_results_unchanged(make_calculator):
+    dc = make_calculator()
+    dc_timed = make_calculator()
+    dc_timed.enable_instrumentation()
+    dc.propagate_stack(stack)
+    dc_timed.propagate_stack(stack)
+    assert np.array_equal(dc.E_t_out, dc_timed.E_t_out)
+    assert np.array_equal(dc.get_spectral_phase_expansion(), dc_timed.get_spectral_phase_expansion())
+
+
+def test_wrap_size():
+    stats = InstrumentationStats()
+    f = stats.wrap("sum", np.sum)
+    assert f(np.ones(10)) == 10
+    f(np.ones(30))
+    s = stats.get_stats()["sum"]
+    assert s["count"] == 2
+    assert s["mean_size"] == 20
+    assert s["min_time"] <= s["mean_time"] <= s["max_time"]
+    stats.reset()
+    assert stats.get_stats() == {}
@@ -0,0 +1,26 @@
+import numpy as np
+
+stack = [("fs", 1e-3), ("bk7", 1e-3), ("sf10", 0.5e-3), ("sapphire_o", 1e-3), ("bbo_o", 0.5e-3)] * 2
+
+
+def test_lazy_matches_eager(make_calculator):
+    dc = make_calculator()
+    dc_lazy = make_calculator(lazy_propagation=True)
+    dc.propagate_stack(stack)
+    dc_lazy.propagate_stack(stack)
+    assert np.abs(dc_lazy.E_w_out - dc.E_w_out).max() < 1e-9 * np.abs(dc.E_w_out).max()
+    assert np.abs(dc_lazy.get_temporal_intensity(True) - dc.get_temporal_intensity(True)).max() < 1e-9
+    assert abs(dc_lazy.get_pulse_duration() / dc.get_pulse_duration() - 1) < 1e-9
+
+
+def test_lazy_transforms_once(make_calculator):
+    dc_lazy = make_calculator(lazy_propagation=True)
+    stats = dc_lazy.enable_instrumentation()
+    dc_lazy.propagate_stack(stack)
+    assert "ifft" not in stats.get_stats()
+    assert "phase" not in stats.get_stats()
+    dc_lazy.get_temporal_intensity()
+    dc_lazy.get_pulse_duration()
+    dc_lazy.get_temporal_phase()
+    assert stats.get_stats()["ifft"]["count"] == 1
+    assert stats.get_stats()["phase"]["count"] == 1
@@ -0,0 +1,32 @@
+import numpy as np
+
+from dispersion_calc import DispersionCalculator
+from dispersion_materials import SellmeierMaterial, TabulatedMaterial
+
+c = 299792458.0
+
+
+def w_l(l):
+    return 2 * np.pi * c / np.atleast_1d(l)
+
+
+def test_reference_refractive_index():
+    dc = DispersionCalculator()
+    # Catalogue values: Schott N-BK7 nd, Malitson fused silica, Eimerl BBO, Ciddor air, Malitson sapphire
+    for name, l, n in [("bk7", 587.56e-9, 1.5168), ("fs", 800e-9, 1.4533), ("bbo_o", 800e-9, 1.6614),
+                       ("air", 800e-9, 1.000275), ("sapphire_o", 800e-9, 1.7601)]:
+        assert abs(dc.materials[name](w_l(l))[0] - n) < 2e-4, name
+
+
+def test_sellmeier_formula_and_range():
+    b, c_coeff = [1.03961212, 0.231792344, 1.01046945], [0.00600069867, 0.0200179144, 103.560653]
+    mat = SellmeierMaterial("bk7", b_coeff=b, c_coeff=c_coeff)
+    l = np.linspace(300e-9, 1900e-9, 101)
+    l2 = (l * 1e6)**2
+    n = np.sqrt(1 + sum([bi * l2 / (l2 - ci) for bi, ci in zip(b, c_coeff)]))
+    assert np.abs(mat(w_l(l)) - n).max() < 1e-12
+    assert np.all(np.isnan(mat(w_l([150e-9, 2500e-9]))))
+    # The interpolated table is only a fallback and less accurate than the formula
+    l_tab = np.linspace(200e-9, 2000e-9, 5000)
+    table = TabulatedMaterial("bk7_table", l_tab, mat(w_l(l_tab)))
+    assert np.abs(table(w_l(l)) - n).max() < 1e-6
@@ -0,0 +1,58 @@
+import numpy as np
+
+from dispersion_calc import DispersionCalculator
+from dispersion_metrics import get_fwhm, get_pulse_metrics, get_rms_width
+
+
+def test_fwhm_interpolated():
+    x = np.linspace(-10, 10, 201)
+    I = np.exp(-4 * np.log(2) * (x - 0.37)**2 / 3.0**2)
+    assert abs(get_fwhm(I, x) / 3.0 - 1) < 1e-3
+    # Stacked traces and a pulse wrapped around the ends of a periodic window
+    I_stack = np.array([I, np.roll(I, 100)])
+    fwhm = get_fwhm(I_stack, x, periodic=True)
+    assert fwhm.shape == (2,) and abs(fwhm[1] / fwhm[0] - 1) < 1e-12
+    assert np.isnan(get_fwhm(np.roll(I, 100), x))
+
+
+def test_fwhm_flat_segments():
+    x = np.linspace(-10, 10, 201)
+    I = np.exp(-4 * np.log(2) * x**2 / 3.0**2)
+    with np.errstate(all="raise"):
+        # Pulses touching the ends and flat tops give NaN or the sample positions, without warnings
+        assert np.isnan(get_fwhm(np.roll(I, 100), x))
+        assert np.isnan(get_fwhm(np.ones(201), x))
+        box = np.where(np.abs(x) <= 2.0, 1.0, 0.0)
+        assert abs(get_fwhm(box, x) - 4.1) < 1e-12
+        assert abs(get_fwhm(I, x) / 3.0 - 1) < 1e-3
+
+
+def test_gaussian_metrics():
+    dc = DispersionCalculator(30e-15, 800e-9, 4e-12)
+    dc.generate_pulse(30e-15, 800e-9, 4e-12, 8192)
+    m = dc.get_pulse_metrics()
+    assert abs(m["tbp_rms"] - 0.5) < 1e-4
+    assert abs(m["tbp_fwhm"] - 2 * np.log(2) / np.pi) < 1e-3
+    assert abs(m["strehl"] - 1) < 1e-9
+    assert abs(m["fwhm_duration"] / 30e-15 - 1) < 1e-3
+    assert abs(m["rms_duration"] / get_rms_width(np.abs(dc.E_t_out)**2, dc.get_t()) - 1) < 1e-4
+
+
+def test_spectral_rms_duration_of_chirped_pulse():
+    dc = DispersionCalculator(30e-15, 800e-9, 8e-12)
+    dc.generate_pulse(30e-15, 800e-9, 8e-12, 2**14)
+    dc.propagate_stack([("bk7", 10e-3), ("sf10", 5e-3)])
+    m = dc.get_pulse_metrics()
+    I_t = np.abs(dc.E_t_out)**2
+    t = dc.get_t()
+    # Centre the pulse in the window before the time domain RMS width
+    I_t = np.roll(I_t, dc.N // 2 - np.argmax(I_t))
+    assert abs(m["rms_duration"] / get_rms_width(I_t, t) - 1) < 1e-4
+    assert m["strehl"] < 0.5
+    # Spectral metrics of a stack of fields
+    E_t, E_w = dc.propagate_material_batch(["bk7"], [[0.0], [10e-3]])
+    stack = get_pulse_metrics(E_w, dc.get_w(), E_t, t)
+    assert stack["rms_duration"].shape == (2,)
+    # The amplitudes agree to a few ulp, the variance about the carrier frequency amplifies that
+    assert abs(stack["rms_bandwidth"][0] / stack["rms_bandwidth"][1] - 1) < 1e-10
+    assert stack["rms_duration"][1] > stack["rms_duration"][0]
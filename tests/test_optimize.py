@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from dispersion_calc import DispersionCalculator
+
+
+def make_chirped_calculator():
+    # Negative chirp from a negative bk7 thickness, compressed by positive dispersion
+    dc = DispersionCalculator(30e-15, 800e-9, 8e-12)
+    dc.generate_pulse(30e-15, 800e-9, 8e-12, 2**14)
+    dc.propagate_material("bk7", -10e-3)
+    return dc
+
+
+def rms_duration(dc, material_list):
+    dc.reset_propagation()
+    dc.propagate_material("bk7", -10e-3)
+    dc.propagate_stack(material_list)
+    return dc.get_pulse_metrics(temporal=False)["rms_duration"]
+
+
+def test_optimize_duration_finds_minimum():
+    dc = make_chirped_calculator()
+    result = dc.optimize_duration([("fs", 1e-3)])
+    assert result["success"]
+    thickness = result["material_list"][0][1]
+    scan = [(rms_duration(dc, [("fs", L)]), L) for L in np.linspace(11e-3, 14e-3, 301)]
+    assert abs(thickness - min(scan)[1]) <= 10e-6
+    duration = rms_duration(dc, result["material_list"])
+    assert abs(result["duration_rms"] / duration - 1) < 1e-3
+    assert abs(result["duration_rms"] / result["duration_rms_tl"] - 1) < 1e-3
+
+
+def test_optimize_duration_constraints():
+    dc = make_chirped_calculator()
+    result = dc.optimize_duration([("fs", 1e-3), ("sf10", 1e-3)], max_total_thickness=5e-3)
+    thicknesses = np.array([thickness for name, thickness in result["material_list"]])
+    assert np.all(thicknesses >= 0) and thicknesses.sum() <= 5e-3 * (1 + 1e-6)
+    result = dc.optimize_duration([("fs", 1e-3), ("bk7", 4e-3)], fixed=["bk7"])
+    assert result["material_list"][1] == ("bk7", 4e-3)
+    # The fixed bk7 leaves 6 mm bk7 of negative chirp, compensated by fs
+    gdd = dc.get_dispersion([("bk7", 6e-3)])[1]
+    assert abs(result["material_list"][0][1] - gdd / dc.get_dispersion([("fs", 1.0)])[1]) < 0.2e-3
+    result = dc.optimize_duration([("fs", 1e-3)], bounds=[(0, 5e-3)])
+    assert abs(result["material_list"][0][1] - 5e-3) < 1e-9
+
+
+def test_optimize_dispersion_hits_target():
+    dc = make_chirped_calculator()
+    target = (2000e-30, 1500e-45)
+    result = dc.optimize_dispersion([("fs", 1e-3), ("sf10", 1e-3)], target=target, include_propagated=False)
+    assert result["success"]
+    disp = dc.get_dispersion(result["material_list"])
+    assert np.allclose(disp[1:3], target, rtol=1e-6, atol=0)
+    # Including the propagated -10 mm bk7 the total dispersion hits the target
+    result = dc.optimize_dispersion([("fs", 1e-3), ("sf10", 1e-3)], target=target)
+    disp = dc.get_dispersion(dc.propagation_list + result["material_list"])
+    assert np.allclose(disp[1:3], target, rtol=1e-6, atol=0)
+
+
+def test_optimize_unknown_material():
+    dc = make_chirped_calculator()
+    # The fixed index and bounds refer to the given list, so an unknown material is an error
+    with pytest.raises(ValueError):
+        dc.optimize_duration([("bk77", 1e-3), ("fs", 1e-3), ("sf10", 2e-3)], fixed=[2])
+    with pytest.raises(ValueError):
+        dc.optimize_dispersion([("fs", 1e-3), ("bk77", 1e-3)], bounds=[(0, 5e-3), (0, 5e-3)])
+    with pytest.raises(ValueError):
+        dc.optimize_duration([("fs", 1e-3), ("sf10", 2e-3)], bounds=[(0, 5e-3)])
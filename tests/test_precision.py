@@ -0,0 +1,31 @@
+import numpy as np
+
+tolerance = 1e-3
+fwhm = 50e-15
+
+
+def test_complex64_matches_complex128(make_calculator):
+    dc64 = make_calculator(fwhm, dtype=np.complex128)
+    dc32 = make_calculator(fwhm, dtype=np.complex64)
+    assert dc32.E_w.dtype == np.complex64
+    for material in sorted(dc64.materials.keys()):
+        for dc in (dc64, dc32):
+            dc.reset_propagation()
+            dc.propagate_material(material, 10e-3)
+        assert dc32.E_t_out.dtype == np.complex64
+        I_64 = dc64.get_temporal_intensity(True)
+        I_32 = dc32.get_temporal_intensity(True)
+        assert np.abs(I_64 - I_32).max() <= tolerance, material
+        t_64 = dc64.get_pulse_duration()
+        assert abs(dc32.get_pulse_duration() - t_64) / t_64 <= tolerance, material
+
+
+def test_complex64_accumulated_phase(make_calculator):
+    # Many thin layers: the accumulated phase is kept in double precision
+    stack = [("bk7", 0.5e-3), ("fs", 0.5e-3)] * 20
+    dc64 = make_calculator(fwhm, dtype=np.complex128)
+    dc32 = make_calculator(fwhm, dtype=np.complex64, lazy_propagation=True)
+    dc64.propagate_stack(stack)
+    dc32.propagate_stack(stack)
+    assert dc32.phase_w_out.dtype == np.double
+    assert np.abs(dc64.get_temporal_intensity(True) - dc32.get_temporal_intensity(True)).max() <= tolerance
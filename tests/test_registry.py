@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import numpy as np
+
+import dispersion_materials
+from dispersion_materials import MaterialRegistry, write_material_index
+
+materials_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "materials")
+c = 299792458.0
+
+
+def make_materials_dir(path, n):
+    with open(os.path.join(materials_path, "bk7.xml"), "r") as f:
+        template = f.read()
+    for ind in range(n):
+        with open(os.path.join(str(path), "glass{0}.xml".format(ind)), "w") as f:
+            f.write(template.replace('name="bk7"', 'name="glass{0}"'.format(ind)))
+
+
+def test_scan_does_not_parse(tmp_path, monkeypatch):
+    make_materials_dir(tmp_path, 500)
+    parsed = []
+    read_material_file = dispersion_materials.read_material_file
+
+    def counting_read(filename, name=None):
+        parsed.append(filename)
+        return read_material_file(filename, name)
+    monkeypatch.setattr(dispersion_materials, "read_material_file", counting_read)
+
+    registry = MaterialRegistry(str(tmp_path), use_catalogue=False)
+    assert len(registry) == 500
+    assert sorted(registry)[:2] == ["glass0", "glass1"]
+    assert parsed == []
+    n = registry["glass42"](np.array([2 * np.pi * c / 587.56e-9]))
+    assert abs(n[0] - 1.5168) < 1e-4
+    assert len(parsed) == 1
+    assert registry.is_loaded("glass42") and not registry.is_loaded("glass43")
+
+
+def test_index_file_names(tmp_path):
+    shutil.copy(os.path.join(materials_path, "bk7.xml"), str(tmp_path / "schott_n-bk7.xml"))
+    write_material_index(str(tmp_path))
+    registry = MaterialRegistry(str(tmp_path), use_catalogue=False)
+    assert list(registry) == ["bk7"]
+    assert registry["bk7"].name == "bk7"
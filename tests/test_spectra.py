@@ -0,0 +1,104 @@
+import numpy as np
+
+from dispersion_spectra import resample_spectrum, read_spectrum_csv, iter_spectra_csv, iter_spectra_binary, c
+
+stack = [("fs", 5e-3), ("bk7", 2e-3)]
+l = np.linspace(740e-9, 870e-9, 600)
+w_l = 2 * np.pi * c / l
+w_0 = 2 * np.pi * c / 800e-9
+pulse = {"t_span": 8e-12, "n": 2**14}
+
+
+def gaussian_spectrum(l_0=800e-9, width=30e-9):
+    return np.exp(-4 * np.log(2) * ((l - l_0) / width)**2)
+
+
+def test_resample_spectrum_energy():
+    w = np.linspace(2.1e15, 2.6e15, 20000)
+    I_l = gaussian_spectrum()
+    E_w = resample_spectrum(l, I_l, w, phase=0.3 * np.ones_like(l))
+    # Energy per unit angular frequency integrates to the energy per unit wavelength
+    assert abs(np.sum(np.abs(E_w)**2) * (w[1] - w[0]) / (np.sum(I_l) * (l[1] - l[0])) - 1) < 1e-3
+    assert np.allclose(np.angle(E_w[np.abs(E_w) > 0]), 0.3)
+    assert np.all(np.abs(E_w[(w < w_l.min()) | (w > w_l.max())]) == 0)
+    # The peak moves from 800 nm in wavelength, by the l**2 Jacobian
+    w_peak = w[np.argmax(np.abs(E_w))]
+    assert 2 * np.pi * c / w_peak > 800e-9
+
+
+def test_read_spectrum_csv(tmp_path):
+    filename = str(tmp_path / "spectrum.csv")
+    phase = np.linspace(-1, 1, l.shape[0])
+    with open(filename, "w") as f:
+        f.write("wavelength (nm),intensity,phase\n")
+        for row in zip(l * 1e9, gaussian_spectrum(), phase):
+            f.write("{0:.17g},{1:.17g},{2:.17g}\n".format(*row))
+    l_r, I_r, phase_r = read_spectrum_csv(filename)
+    assert np.allclose(l_r, l, rtol=1e-12)
+    assert np.array_equal(I_r, gaussian_spectrum())
+    assert np.array_equal(phase_r, phase)
+
+
+def test_iter_spectra_csv(tmp_path):
+    filename = str(tmp_path / "spectra.csv")
+    spectra = [gaussian_spectrum(l_0) for l_0 in [790e-9, 800e-9, 810e-9]]
+    with open(filename, "w") as f:
+        f.write("# scan\n")
+        f.write(",".join(["{0:.17g}".format(x) for x in l * 1e9]) + "\n")
+        for I_l in spectra:
+            f.write(",".join(["{0:.17g}".format(x) for x in I_l]) + "\n")
+    l_r, spectra_r = iter_spectra_csv(filename)
+    assert np.allclose(l_r, l, rtol=1e-12)
+    spectra_r = list(spectra_r)
+    assert len(spectra_r) == 3
+    for I_l, I_r in zip(spectra, spectra_r):
+        assert np.array_equal(I_l, I_r)
+
+
+def test_iter_spectra_binary(tmp_path):
+    spectra = np.array([gaussian_spectrum(l_0) for l_0 in [790e-9, 800e-9, 810e-9]], dtype=np.float32)
+    filename = str(tmp_path / "spectra.npy")
+    np.save(filename, spectra)
+    l_r, spectra_r = iter_spectra_binary(filename, l)
+    assert np.array_equal(np.array(list(spectra_r)), spectra)
+    filename = str(tmp_path / "spectra.raw")
+    with open(filename, "wb") as f:
+        f.write(b"header")
+        f.write(spectra.tobytes())
+    l_r, spectra_r = iter_spectra_binary(filename, l, np.float32, offset=6)
+    spectra_r = list(spectra_r)
+    assert len(spectra_r) == 3
+    assert np.array_equal(np.array(spectra_r), spectra)
+
+
+def test_propagate_spectra(make_calculator):
+    spectra = [gaussian_spectrum(800e-9, width) for width in [20e-9, 30e-9, 40e-9]]
+    dc = make_calculator(**pulse)
+    stats = dc.enable_instrumentation()
+    results = list(dc.propagate_spectra(l, iter(spectra), stack))
+    counts = dict((stage, s["count"]) for stage, s in stats.get_stats().items())
+    # The stack phase is calculated for the first spectrum only, then one exponential per spectrum
+    assert counts["material"] == 2
+    assert counts["phase"] == 3
+    dc_ref = make_calculator(**pulse)
+    for I_l, result in zip(spectra, results):
+        dc_ref.set_pulse_spectrum(l, I_l)
+        dc_ref.propagate_stack(stack)
+        assert abs(result["duration"] / dc_ref.get_pulse_duration() - 1) < 1e-9
+        assert np.abs(result["E_t_out"] - dc_ref.E_t_out).max() < 1e-9
+
+
+def test_optimize_duration_input_phase(make_calculator):
+    # A measured spectrum with positive GDD, compressed by the negative GDD of fs
+    gdd = 450e-30
+    dc = make_calculator(**pulse)
+    dc.set_pulse_spectrum(l, gaussian_spectrum(), 0.5 * gdd * (w_l - w_0)**2)
+    result = dc.optimize_duration([("fs", 1e-3)])
+    thickness = result["material_list"][0][1]
+
+    def rms_duration(thickness):
+        dc.set_stack([("fs", thickness)])
+        return dc.get_pulse_metrics(temporal=False)["rms_duration"]
+    scan = [(rms_duration(L), L) for L in np.linspace(10e-3, 15e-3, 501)]
+    assert abs(thickness - min(scan)[1]) <= 10e-6
+    assert abs(result["duration_rms"] / rms_duration(thickness) - 1) < 1e-3
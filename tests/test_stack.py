@@ -0,0 +1,69 @@
+import numpy as np
+
+stack = [("fs", 1e-3), ("bk7", 1e-3), ("sf10", 0.5e-3), ("sapphire_o", 1e-3), ("bbo_o", 0.5e-3)] * 2
+
+
+def propagated(make_calculator, material_list, **kwargs):
+    dc = make_calculator(**kwargs)
+    dc.propagate_stack(material_list)
+    return dc
+
+
+def count_row_updates(dc):
+    calls = []
+    add_stack_row = dc._add_stack_row
+
+    def counted(name, thickness, count):
+        calls.append((name, thickness, count))
+        add_stack_row(name, thickness, count)
+    dc._add_stack_row = counted
+    return calls
+
+
+def test_set_stack_matches_propagate_stack(make_calculator):
+    dc = make_calculator()
+    edits = [stack,
+             stack[:4] + [("fs", 2e-3)] + stack[5:],
+             stack[:7],
+             list(reversed(stack[:7])),
+             stack[:7] + [("caf2", 3e-3)]]
+    for material_list in edits:
+        dc.set_stack(material_list)
+        ref = propagated(make_calculator, material_list)
+        s = np.isfinite(ref.phase_w_out)
+        assert np.array_equal(s, np.isfinite(dc.phase_w_out))
+        assert np.abs(dc.phase_w_out[s] - ref.phase_w_out[s]).max() < 1e-9 * np.abs(ref.phase_w_out[s]).max()
+        assert np.abs(dc.E_t_out - ref.E_t_out).max() < 1e-9 * np.abs(ref.E_t_out).max()
+        assert abs(dc.get_pulse_duration() / ref.get_pulse_duration() - 1) < 1e-9
+
+
+def test_set_stack_edit_cost(make_calculator):
+    dc = make_calculator()
+    dc.set_stack(stack)
+    calls = count_row_updates(dc)
+    # Changing one thickness subtracts the old row and adds the new one, independent of the stack length
+    dc.set_stack(stack[:3] + [("sapphire_o", 2e-3)] + stack[4:])
+    assert calls == [("sapphire_o", 1e-3, -1), ("sapphire_o", 2e-3, 1)]
+    del calls[:]
+    dc.set_stack(list(reversed(stack[:3] + [("sapphire_o", 2e-3)] + stack[4:])))
+    assert calls == []
+    # The fields are calculated with one complex exponential when read
+    stats = dc.enable_instrumentation()
+    dc.get_temporal_intensity()
+    dc.get_pulse_duration()
+    assert stats.get_stats()["phase"]["count"] == 1
+
+
+def test_set_stack_removed_nan_rows(make_calculator):
+    # On a wide frequency grid sf11 is undefined at more frequencies than fs
+    dc = make_calculator(10e-15, t_span=2e-12)
+    dc.set_stack([("fs", 1e-3)])
+    n_finite = np.isfinite(dc.phase_w_out).sum()
+    dc.set_stack([("fs", 1e-3), ("sf11", 1e-3)])
+    assert np.isfinite(dc.phase_w_out).sum() < n_finite
+    dc.set_stack([("fs", 1e-3)])
+    ref = propagated(make_calculator, [("fs", 1e-3)], fwhm=10e-15, t_span=2e-12)
+    s = np.isfinite(ref.phase_w_out)
+    assert np.isfinite(dc.phase_w_out).sum() == n_finite
+    assert np.array_equal(s, np.isfinite(dc.phase_w_out))
+    assert np.abs(dc.phase_w_out[s] - ref.phase_w_out[s]).max() < 1e-9 * np.abs(ref.phase_w_out[s]).max()
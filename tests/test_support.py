@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from dispersion_cache import DiskCache
+
+stack = [("fs", 5e-3), ("bk7", 10e-3), ("sf10", 2e-3)]
+pulse = {"t_span": 10e-12, "n": 2**14}
+
+
+def test_support_matches_full_grid(make_calculator):
+    dc = make_calculator(**pulse)
+    dc.propagate_stack(stack)
+    for kwargs in [{}, {"lazy_propagation": True}, {"workspace": True}]:
+        dc_s = make_calculator(**pulse, support_threshold=1e-12, **kwargs)
+        assert dc_s.w[dc_s.support].shape[0] < dc.N // 4
+        dc_s.propagate_stack(stack)
+        assert np.abs(dc_s.get_temporal_intensity() - dc.get_temporal_intensity()).max() < 1e-5
+        gdd = dc_s.get_spectral_phase_expansion()[-3]
+        assert abs(gdd / dc.get_spectral_phase_expansion()[-3] - 1) < 1e-4
+
+
+def test_support_is_part_of_disk_cache_key(tmp_path, make_calculator):
+    cache = DiskCache(str(tmp_path))
+    dc = make_calculator(**pulse, disk_cache=cache)
+    dc.propagate_stack(stack)
+    dc_s = make_calculator(**pulse, disk_cache=cache, support_threshold=1e-2)
+    dc_s.propagate_stack(stack)
+    dc_ref = make_calculator(**pulse, support_threshold=1e-2)
+    dc_ref.propagate_stack(stack)
+    assert dc_s.get_state_key() != dc.get_state_key()
+    assert dc_s.get_pulse_duration() == dc_ref.get_pulse_duration()
+    outside = np.ones(dc_s.N, dtype=bool)
+    outside[dc_s.support] = False
+    assert np.all(dc_s.E_w_out[outside] == 0)
+
+
+def test_spectral_phase_on_support(make_calculator):
+    dc = make_calculator(**pulse)
+    dc.propagate_stack(stack)
+    gdd = dc.get_spectral_phase_expansion()[-3]
+    for n, kwargs in [(2**14, {"support_threshold": 1e-12}), (2**14 + 1, {}), (2**14 + 1, {"support_threshold": 1e-12})]:
+        dc_s = make_calculator(t_span=10e-12, n=n, **kwargs)
+        dc_s.propagate_stack(stack)
+        ph = dc_s.get_spectral_phase()
+        outside = np.ones(dc_s.N, dtype=bool)
+        outside[dc_s.support] = False
+        assert np.all(np.isnan(ph[outside]))
+        assert abs(dc_s.get_spectral_phase_expansion()[-3] / gdd - 1) < 1e-4
+
+
+def test_support_rejects_empty_spectrum(make_calculator):
+    dc = make_calculator(**pulse)
+    assert dc.get_spectral_support(1e-12).stop > 0
+    for E_w in [np.zeros_like(dc.E_w), np.full_like(dc.E_w, np.nan)]:
+        dc.E_w = E_w
+        with pytest.raises(ValueError):
+            dc.get_spectral_support(1e-12)
+        assert dc.get_spectral_support() == slice(None)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from dispersion_calc import DispersionCalculator
+from dispersion_sweep import SweepRunner, make_sweep_grid, read_results
+
+pulse_grid = {"fwhm": [30e-15, 50e-15], "l_0": 800e-9, "t_span": 4e-12, "n": 4096}
+stack_grid = [("fs", np.linspace(0, 10e-3, 3)), ("sapphire_o", [0.0, 2e-3])]
+
+
+def reference_durations(points):
+    durations = {}
+    dc = DispersionCalculator()
+    for point in points:
+        dc.generate_pulse(**point["pulse"])
+        dc.propagate_stack(point["stack"])
+        durations[point["key"]] = dc.get_pulse_duration()
+    return durations
+
+
+def test_sweep_results():
+    points = make_sweep_grid(pulse_grid, stack_grid)
+    assert len(points) == 12 and len(set(point["key"] for point in points)) == 12
+    reference = reference_durations(points)
+    for workers, executor in [(0, "process"), (2, "thread"), (2, "process")]:
+        progress = []
+        runner = SweepRunner(workers, chunk_size=5, executor=executor,
+                             progress=lambda done, total: progress.append((done, total)))
+        results = list(runner.run(points))
+        assert sorted(result["key"] for result in results) == sorted(reference.keys())
+        for result in results:
+            assert result["duration"] == reference[result["key"]]
+            assert len(result["dispersion"]) == 4
+        # Chunks of 5, 5 and 2 points, finishing in any order
+        assert len(progress) == 3 and max(progress) == (12, 12)
+
+
+def test_sweep_resume(tmp_path):
+    points = make_sweep_grid(pulse_grid, stack_grid)
+    results_file = str(tmp_path / "sweep.jsonl")
+    run = SweepRunner(0, chunk_size=4, results_file=results_file).run(points)
+    first = [next(run) for ind in range(4)]
+    run.close()
+    # Simulate a sweep killed while writing a result
+    with open(results_file, "a") as f:
+        f.write('{"key": "trunc')
+    assert [result["key"] for result in read_results(results_file)] == [result["key"] for result in first]
+
+    progress = []
+    runner = SweepRunner(0, chunk_size=4, results_file=results_file,
+                         progress=lambda done, total: progress.append(done))
+    rest = list(runner.run(points))
+    assert len(rest) == 8 and progress[-1] == 12
+    keys = [result["key"] for result in read_results(results_file)]
+    assert sorted(keys) == sorted(point["key"] for point in points)
+    assert list(runner.run(points)) == []
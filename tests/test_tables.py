@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from dispersion_calc import DispersionCalculator
+from dispersion_materials import BBOMaterial, DispersionTable
+
+
+def test_table_matches_formula():
+    dc = DispersionCalculator()
+    l = np.linspace(400e-9, 1600e-9, 97)
+    w = 2 * np.pi * dc.c / l
+    for name in ["bk7", "fs", "sapphire_o", "bbo_e", "air"]:
+        table = dc.materials.get_dispersion_table(name)
+        k_table = table.get_k_derivatives(w)
+        k_formula = dc.materials[name].get_k_derivatives(w)
+        rel = np.abs(k_table / k_formula - 1)
+        assert rel[:, :3].max() < 1e-5, name
+        assert rel[:, 3].max() < 1e-3, name
+
+
+def test_table_range_and_curves():
+    table = DispersionTable(BBOMaterial("bbo_test", 2.7405, 0.0184, 0.0179, 0.0155, l_min=400e-9, l_max=1500e-9))
+    # The derivative stencil reaches 4 % of w beyond each table point
+    assert 400e-9 < table.l_min < 430e-9 and 1420e-9 < table.l_max < 1500e-9
+    assert np.all(np.isnan(table.get_k_derivatives_l([300e-9, 1700e-9])))
+    with pytest.raises(ValueError):
+        table.get_k_derivatives(np.array([2e15]), orders=5)
+    dc = DispersionCalculator()
+    curves = dc.get_material_dispersion("bk7", np.array([587.56e-9, 800e-9]))
+    assert abs(curves["n"][0] - 1.5168) < 1e-4
+    assert abs(curves["gvd"][1] * 1e27 - 44.65) < 0.01
@@ -0,0 +1,28 @@
+import numpy as np
+
+from dispersion_calc import unwrap_phase
+from dispersion_calc_benchmark import unwrap_phase_loop
+
+
+def test_unwrap_matches_loop():
+    rng = np.random.default_rng(1)
+    ph = np.angle(np.exp(1j * np.cumsum(rng.uniform(-3, 3, 5000))))
+    assert np.abs(unwrap_phase(ph) - unwrap_phase_loop(ph)).max() < 1e-9
+
+
+def test_unwrap_recovers_smooth_phase():
+    x = np.linspace(-1, 1, 4001)
+    # Steps between samples must stay below 2*pi - 5 rad (the jump threshold)
+    ph_true = 1000 * x**2 + 150 * x**3
+    ph = unwrap_phase(np.angle(np.exp(1j * ph_true)))
+    assert np.abs(ph - ph[2000] - (ph_true - ph_true[2000])).max() < 1e-9
+
+
+def test_unwrap_stack_along_axis():
+    x = np.linspace(-1, 1, 1001)
+    ph_true = np.outer([100.0, 200.0, 300.0], x**2)
+    ph_wrapped = np.angle(np.exp(1j * ph_true))
+    ph = unwrap_phase(ph_wrapped.T, axis=0).T
+    for row in range(3):
+        assert np.array_equal(ph[row], unwrap_phase(ph_wrapped[row]))
+    assert np.abs(ph - ph[:, :1] - (ph_true - ph_true[:, :1])).max() < 1e-9
@@ -0,0 +1,99 @@
+import threading
+
+import numpy as np
+
+from dispersion_calc import DispersionCalculator
+from dispersion_worker import LatestRequest, PropagationRunner
+
+stack = [["fs", 5e-3], ["bk7", 2e-3]]
+
+
+def make_request(request_id=0, material_list=None, **kwargs):
+    request = {"id": request_id, "fwhm": 30e-15, "duration_domain": "temporal", "l_0": 800e-9, "t_span": 4e-12,
+               "n": 4096, "auto_grid": False, "zoom": False,
+               "material_list": stack if material_list is None else material_list}
+    request.update(kwargs)
+    return request
+
+
+def test_latest_request_coalesces():
+    requests = LatestRequest()
+    assert requests.take() is None
+    assert requests.submit(make_request(0)) is False
+    assert requests.submit(make_request(1)) is True
+    assert requests.submit(make_request(2)) is True
+    assert requests.take()["id"] == 2
+    assert requests.dropped == 2
+    assert requests.take() is None
+
+
+def test_latest_request_threads():
+    requests = LatestRequest()
+    n_threads = 4
+    n_requests = 500
+    taken = []
+    done = threading.Event()
+
+    def submit(offset):
+        for ind in range(n_requests):
+            requests.submit(offset + ind)
+
+    def consume():
+        while not done.is_set():
+            request = requests.take()
+            if request is not None:
+                taken.append(request)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    submitters = [threading.Thread(target=submit, args=(k * n_requests,)) for k in range(n_threads)]
+    for thread in submitters:
+        thread.start()
+    for thread in submitters:
+        thread.join()
+    done.set()
+    consumer.join()
+    last = requests.take()
+    if last is not None:
+        taken.append(last)
+    # Every request is either taken exactly once or counted as dropped
+    assert len(taken) == len(set(taken))
+    assert len(taken) + requests.dropped == n_threads * n_requests
+
+
+def test_runner_matches_calculator():
+    runner = PropagationRunner()
+    result = runner.propagate(make_request())
+    dc = DispersionCalculator()
+    dc.generate_pulse(30e-15, 800e-9, 4e-12, 4096)
+    initial_duration = dc.get_pulse_duration("temporal")
+    dc.propagate_stack(stack)
+    assert abs(result["initial_duration"] / initial_duration - 1) < 1e-9
+    assert abs(result["duration"] / dc.get_pulse_duration("temporal") - 1) < 1e-9
+    assert np.allclose(result["dispersion"], dc.get_dispersion(stack, 800e-9), rtol=1e-9, atol=0)
+    assert result["I_t"].shape == result["t"].shape
+    assert result["phase"].shape == result["w_phase"].shape
+    assert np.all(np.isfinite(result["phase"]))
+
+
+def test_runner_keeps_pulse_for_table_edits():
+    runner = PropagationRunner()
+    runner.propagate(make_request())
+    E_w = runner.dc.E_w
+    result = runner.propagate(make_request(1, [["fs", 10e-3]]))
+    assert runner.dc.E_w is E_w
+    dc = DispersionCalculator()
+    dc.generate_pulse(30e-15, 800e-9, 4e-12, 4096)
+    dc.propagate_stack([["fs", 10e-3]])
+    assert abs(result["duration"] / dc.get_pulse_duration("temporal") - 1) < 1e-9
+    runner.propagate(make_request(2, fwhm=40e-15))
+    assert runner.dc.E_w is not E_w
+
+
+def test_runner_auto_grid_and_zoom():
+    runner = PropagationRunner()
+    result = runner.propagate(make_request(auto_grid=True))
+    assert result["t_span"] != 4e-12 or result["n"] != 4096
+    assert result["t"].shape[0] == result["n"]
+    zoom = runner.propagate(make_request(auto_grid=True, zoom=True))
+    assert abs(zoom["duration"] / result["duration"] - 1) < 1e-2
@@ -0,0 +1,46 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import dispersion_fft
+
+n = 65536
+pulse = {"fwhm": 50e-15, "n": n}
+
+
+def propagation_peak_memory(dc):
+    # Warm up the k cache so only the propagation itself is measured
+    dc.propagate_material("bk7", 1e-3)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        dc.propagate_material("bk7", 1e-3)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+@pytest.mark.skipif(np.lib.NumpyVersion(np.__version__) < "2.0.0", reason="numpy.fft out requires numpy 2")
+@pytest.mark.parametrize("dtype", [np.complex128, np.complex64])
+def test_workspace_propagation_allocates_no_arrays(dtype, make_calculator):
+    assert dispersion_fft.numpy_fft_out is True
+    dc = make_calculator(**pulse, workspace=True, dtype=dtype)
+    # Only small Python objects, far below one field array of n points
+    assert propagation_peak_memory(dc) < 4096
+
+
+def test_workspace_fft_without_out_allocates(monkeypatch, make_calculator):
+    monkeypatch.setattr(dispersion_fft, "numpy_fft_out", False)
+    dc = make_calculator(**pulse, workspace=True)
+    assert propagation_peak_memory(dc) >= n * 16
+
+
+def test_workspace_matches_normal_propagation(make_calculator):
+    stack = [("fs", 5e-3), ("bk7", 10e-3)]
+    dc = make_calculator(**pulse)
+    dc.propagate_stack(stack)
+    dc_ws = make_calculator(**pulse, workspace=True)
+    dc_ws.propagate_stack(stack)
+    assert np.abs(dc_ws.E_t_out - dc.E_t_out).max() < 1e-9
@@ -0,0 +1,38 @@
+import numpy as np
+
+stack = [("fs", 5e-3), ("bk7", 2e-3)]
+
+
+def test_zoom_field_at_grid_points(make_calculator):
+    for kwargs in [{}, {"support_threshold": 1e-12}]:
+        dc = make_calculator(**kwargs)
+        dc.propagate_stack(stack)
+        m = np.argmax(np.abs(dc.E_t_out))
+        n = 64
+        # A window of n grid samples centered on sample m
+        t, E_t = dc.get_temporal_field_zoom(n * dc.dt, n, t_center=m * dc.dt)
+        assert np.allclose(np.diff(t), dc.dt, rtol=1e-9)
+        E_ref = dc.E_t_out[m - n // 2:m + n // 2]
+        assert np.abs(E_t - E_ref).max() < 1e-9 * np.abs(dc.E_t_out).max()
+
+
+def test_zoom_duration_low_n(make_calculator):
+    # 256 points over 4 ps is about 16 fs per sample, half the pulse duration
+    for material_list in [[], [("fs", 2e-3)]]:
+        dc_ref = make_calculator(n=65536)
+        dc_ref.propagate_stack(material_list)
+        duration = dc_ref.get_pulse_duration()
+        dc = make_calculator(n=256)
+        dc.propagate_stack(material_list)
+        assert abs(dc.get_pulse_duration(zoom_points=1024) / duration - 1) < 1e-3
+    assert abs(dc.get_pulse_duration() / duration - 1) > 0.1
+
+
+def test_zoom_intensity(make_calculator):
+    dc = make_calculator()
+    dc.propagate_stack(stack)
+    t, I_t = dc.get_temporal_intensity_zoom(n=512)
+    assert t.shape == (512, )
+    assert I_t.max() == 1.0
+    # The default window is centered on the pulse
+    assert abs(np.sum(t * I_t) / np.sum(I_t)) < 2 * (t[1] - t[0])